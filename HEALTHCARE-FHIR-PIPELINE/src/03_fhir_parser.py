@@ -15,8 +15,19 @@ FHIR R4 specs referenced:
 
 Usage:
   python 03_fhir_parser.py
+
+Sharded (multi-machine) usage:
+  Each shard parses a stable subset of the bundles, chosen by hashing the
+  bundle file name, and writes its own fragments under
+  data/processed/fhir_parsed/shards/. The merge step combines, de-duplicates
+  and validates the fragments into the standard *_fhir.parquet files.
+
+  for i in 0 1 2 3; do python 03_fhir_parser.py --shard $i/4 & done; wait
+  python 03_fhir_parser.py --merge
 """
 
+import argparse
+import hashlib
 import json
 import logging
 from pathlib import Path
@@ -27,6 +38,7 @@ import pandas as pd
 # ── Config ─────────────────────────────────────────────────────────────────────
 FHIR_DIR   = Path("data/raw/fhir")
 OUTPUT_DIR = Path("data/processed/fhir_parsed")
+SHARD_DIR  = OUTPUT_DIR / "shards"
 
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s  %(levelname)-8s  %(message)s")
@@ -196,8 +208,149 @@ def process_bundle(bundle_path: Path) -> dict:
     return records
 
 
+# ── Sharding ───────────────────────────────────────────────────────────────────
+def parse_shard_spec(spec: str) -> tuple:
+    """Parse an 'i/N' shard spec into (index, count), e.g. '2/8' -> (2, 8)."""
+    try:
+        index, count = (int(p) for p in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like 'i/N', got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must satisfy 0 <= i < N, got {spec!r}")
+    return index, count
+
+
+def shard_of(bundle_path: Path, shard_count: int) -> int:
+    """Stable shard assignment from the bundle file name.
+
+    Uses SHA-256 rather than hash() so every machine (and every Python
+    process, regardless of PYTHONHASHSEED) agrees on the split.
+    """
+    digest = hashlib.sha256(bundle_path.name.encode("utf-8")).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def shard_path(shard_index: int, shard_count: int) -> Path:
+    return SHARD_DIR / f"shard_{shard_index:04d}_of_{shard_count:04d}"
+
+
+def run_shard(json_files, shard_index, shard_count, batch_size=200):
+    """Parse one shard's bundles, writing one fragment per resource per batch.
+
+    Fragments are append-only (no read-modify-write of a growing Parquet file),
+    so a shard's cost stays linear in its input. A _SUCCESS manifest is written
+    last; the merge step refuses to run until every shard has one.
+    """
+    my_files = [p for p in json_files if shard_of(p, shard_count) == shard_index]
+    out_dir  = shard_path(shard_index, shard_count)
+    log.info(f"Shard {shard_index}/{shard_count}: {len(my_files):,} of "
+             f"{len(json_files):,} bundles -> {out_dir}")
+
+    # Re-running a shard replaces its previous fragments
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in out_dir.glob("*"):
+        stale.unlink()
+
+    batch_records = {k: [] for k in RESOURCE_PARSERS}
+    total_counts  = {k: 0 for k in RESOURCE_PARSERS}
+    fragment_no   = 0
+
+    for i, path in enumerate(my_files, 1):
+        for rtype, recs in process_bundle(path).items():
+            batch_records[rtype].extend(recs)
+
+        if i % batch_size == 0 or i == len(my_files):
+            for rtype, recs in batch_records.items():
+                if not recs:
+                    continue
+                df_batch = pd.DataFrame(recs).drop_duplicates(subset=[f"fhir_{rtype.lower()}_id"])
+                df_batch.to_parquet(out_dir / f"{rtype.lower()}_{fragment_no:05d}.parquet",
+                                    index=False, engine="pyarrow")
+                total_counts[rtype] += len(df_batch)
+            fragment_no += 1
+            batch_records = {k: [] for k in RESOURCE_PARSERS}
+
+    manifest = {
+        "shard_index":  shard_index,
+        "shard_count":  shard_count,
+        "bundle_count": len(my_files),
+        "fragments":    fragment_no,
+        "record_counts": total_counts,
+        "finished_utc": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    (out_dir / "_SUCCESS").write_text(json.dumps(manifest, indent=2))
+
+    for rtype, count in total_counts.items():
+        log.info(f"  {rtype}: {count:,} records in shard {shard_index}/{shard_count}")
+    return manifest
+
+
+def validate_merged(rtype: str, df: pd.DataFrame) -> None:
+    """Checks the merged table before it replaces the standard Parquet file."""
+    id_col = f"fhir_{rtype.lower()}_id"
+    if id_col not in df.columns:
+        raise ValueError(f"{rtype}: merged fragments have no '{id_col}' column")
+    if df[id_col].isna().any():
+        raise ValueError(f"{rtype}: {int(df[id_col].isna().sum())} rows with a null {id_col}")
+    if not df[id_col].is_unique:
+        raise ValueError(f"{rtype}: {id_col} is not unique after de-duplication")
+    if rtype != "Patient" and df["fhir_patient_id"].isna().all():
+        raise ValueError(f"{rtype}: no rows reference a patient")
+
+
+def merge_shards():
+    """Combine every shard's fragments into the standard *_fhir.parquet files."""
+    manifests = [json.loads(p.read_text()) for p in sorted(SHARD_DIR.glob("shard_*/_SUCCESS"))]
+    if not manifests:
+        raise FileNotFoundError(f"No completed shards found under {SHARD_DIR}")
+
+    counts = {m["shard_count"] for m in manifests}
+    if len(counts) != 1:
+        raise ValueError(f"Shards from different runs found (N = {sorted(counts)}); "
+                         f"clear {SHARD_DIR} and re-run")
+    shard_count = counts.pop()
+    missing = sorted(set(range(shard_count)) - {m["shard_index"] for m in manifests})
+    if missing:
+        raise ValueError(f"Shards not finished yet: {missing} of {shard_count}")
+
+    log.info(f"Merging {shard_count} shards "
+             f"({sum(m['bundle_count'] for m in manifests):,} bundles)...")
+
+    for rtype in RESOURCE_PARSERS:
+        fragments = []
+        for i in range(shard_count):
+            fragments.extend(sorted(shard_path(i, shard_count).glob(f"{rtype.lower()}_*.parquet")))
+        if not fragments:
+            log.warning(f"  {rtype}: no fragments, skipping")
+            continue
+
+        df = pd.concat((pd.read_parquet(f) for f in fragments), ignore_index=True)
+        before = len(df)
+        df = df.drop_duplicates(subset=[f"fhir_{rtype.lower()}_id"])
+        validate_merged(rtype, df)
+
+        df.to_parquet(OUTPUT_DIR / f"{rtype.lower()}_fhir.parquet", index=False, engine="pyarrow")
+        df.head(100).to_csv(OUTPUT_DIR / f"{rtype.lower()}_sample.csv", index=False)
+        log.info(f"  {rtype}: {len(df):,} unique records "
+                 f"({before - len(df):,} duplicates dropped, {len(fragments)} fragments)")
+
+    log.info("Shard merge complete.")
+
+
 # ── Main ───────────────────────────────────────────────────────────────────────
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse Synthea FHIR R4 bundles to Parquet.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--shard", type=parse_shard_spec, metavar="i/N",
+                      help="parse only shard i of N (0-based) into shard fragments")
+    mode.add_argument("--merge", action="store_true",
+                      help="merge completed shard fragments into *_fhir.parquet")
+    args = parser.parse_args(argv)
+
+    if args.merge:
+        merge_shards()
+        return
+
     log.info("=== FHIR R4 Scalable Bundle Parser ===")
     
     # 1. FORCE ABSOLUTE PATHS TO PREVENT RELATIVE PATH ERRORS
@@ -224,6 +377,10 @@ def main():
         log.error(f"No JSON files found in {FHIR_DIR}.")
         return
 
+    if args.shard:
+        run_shard(json_files, *args.shard)
+        return
+
     log.info(f"Processing 7.7GB across {len(json_files)} bundles...")
 
     # Initialize storage for this batch
@@ -273,5 +430,7 @@ def main():
         pd.read_parquet(OUTPUT_DIR / f"{rtype.lower()}_fhir.parquet").head(100).to_csv(sample_path, index=False)
 
     log.info("Scalable FHIR parsing complete.")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,12 @@
 import os
+import argparse
 import urllib.parse
+import functools
 import pandas as pd
+import pyarrow.parquet as pq
 import hashlib
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import time
 
@@ -32,9 +35,60 @@ def uuid_to_int(uuid_str):
     """Deterministically converts a string UUID into a 32-bit OMOP Integer ID"""
     return int(hashlib.sha256(str(uuid_str).encode('utf-8')).hexdigest(), 16) % (10**9)
 
-def load_person(engine, local_dir):
+# Registered loaders in load order: (loader, parquet file, columns it uses)
+LOADERS = []
+
+def reads(filename, columns):
+    """Registers a loader and declares the only Parquet columns it needs.
+
+    The decorated function receives a DataFrame with just those columns,
+    served from a shared ParquetCache instead of its own full-file read.
+    """
+    def register(fn):
+        @functools.wraps(fn)
+        def loader(engine, cache):
+            return fn(engine, cache.frame(filename, columns))
+        LOADERS.append((loader, filename, list(columns)))
+        return loader
+    return register
+
+class ParquetCache:
+    """Reads each Parquet file once, projected to the union of columns its loaders need.
+
+    The Arrow table is shared by every loader of that file and dropped after
+    the last one has taken its slice, so peak memory is one projected file
+    rather than every full file at once.
+    """
+
+    def __init__(self, local_dir, loaders=None):
+        self.local_dir = Path(local_dir)
+        self.columns   = {}
+        self.consumers = {}
+        self._tables   = {}
+        for _, filename, cols in (LOADERS if loaders is None else loaders):
+            wanted = self.columns.setdefault(filename, [])
+            wanted.extend(c for c in cols if c not in wanted)
+            self.consumers[filename] = self.consumers.get(filename, 0) + 1
+
+    def table(self, filename):
+        if filename not in self._tables:
+            path = self.local_dir / filename
+            total = len(pq.read_schema(path).names)
+            self._tables[filename] = pq.read_table(path, columns=self.columns[filename])
+            print(f"  ↳ read {filename}: {len(self.columns[filename])}/{total} columns, "
+                  f"{self._tables[filename].nbytes / (1024 ** 2):.1f} MB in memory")
+        return self._tables[filename]
+
+    def frame(self, filename, columns):
+        df = self.table(filename).select(columns).to_pandas()
+        self.consumers[filename] -= 1
+        if self.consumers[filename] <= 0:
+            del self._tables[filename]
+        return df
+
+@reads("patient_fhir.parquet", ["fhir_patient_id", "gender", "birth_year", "race"])
+def load_person(engine, df):
     print("── Building true OMOP PERSON table ──")
-    df = pd.read_parquet(local_dir / "patient_fhir.parquet")
     
     def map_gender(g):
         g = str(g).lower()
@@ -62,9 +116,9 @@ def load_person(engine, local_dir):
     person_df.to_sql("person", con=engine, if_exists="replace", index=False)
     print(f"  ✓ person: {len(person_df):,} rows loaded")
 
-def load_visit_occurrence(engine, local_dir):
+@reads("encounter_fhir.parquet", ["fhir_encounter_id", "fhir_patient_id", "start_date"])
+def load_visit_occurrence(engine, df):
     print("── Building true OMOP VISIT_OCCURRENCE table ──")
-    df = pd.read_parquet(local_dir / "encounter_fhir.parquet")
     
     visit_df = pd.DataFrame()
     visit_df['visit_occurrence_id'] = df['fhir_encounter_id'].apply(uuid_to_int)
@@ -78,9 +132,9 @@ def load_visit_occurrence(engine, local_dir):
     visit_df.to_sql("visit_occurrence", con=engine, if_exists="replace", index=False)
     print(f"  ✓ visit_occurrence: {len(visit_df):,} rows loaded")
 
-def load_cost(engine, local_dir):
+@reads("claims_fhir.parquet", ["claim_id", "patient_id", "encounter_id", "total_cost", "payment_amount"])
+def load_cost(engine, df):
     print("── Building true OMOP COST table ──")
-    df = pd.read_parquet(local_dir / "claims_fhir.parquet")
     
     cost_df = pd.DataFrame()
     # Clean the claim ID
@@ -102,9 +156,9 @@ def load_cost(engine, local_dir):
     print(f"  ✓ cost: {len(cost_df):,} rows loaded")
     
     
-def load_concept(engine, local_dir):
+@reads("condition_fhir.parquet", ["snomed_code", "snomed_display"])
+def load_concept(engine, df):
     print("── Building true OMOP CONCEPT table ──")
-    df = pd.read_parquet(local_dir / "condition_fhir.parquet")
     
     # FIX: Only drop rows if the actual code or display name is missing
     df = df.dropna(subset=['snomed_code', 'snomed_display']).drop_duplicates(subset=['snomed_code'])
@@ -121,9 +175,9 @@ def load_concept(engine, local_dir):
     concept_df.to_sql("concept", con=engine, if_exists="replace", index=False)
     print(f"  ✓ concept: {len(concept_df):,} rows loaded")
 
-def load_condition_occurrence(engine, local_dir):
+@reads("condition_fhir.parquet", ["fhir_condition_id", "fhir_patient_id", "snomed_code", "onset_date"])
+def load_condition_occurrence(engine, df):
     print("── Building true OMOP CONDITION_OCCURRENCE table ──")
-    df = pd.read_parquet(local_dir / "condition_fhir.parquet")
     
     # We must map your parquet columns (fhir_condition_id, fhir_patient_id, snomed_code)
     # to the OMOP standard names (condition_occurrence_id, person_id, condition_concept_id)
@@ -137,7 +191,116 @@ def load_condition_occurrence(engine, local_dir):
     
     cond_occ.to_sql("condition_occurrence", con=engine, if_exists="replace", index=False)
     print(f"  ✓ condition_occurrence: {len(cond_occ):,} rows loaded")
+
+# ── Post-load keys & join indexes ──
+# Built only after the bulk insert (to_sql "replace" recreates bare heaps), so
+# inserts never pay for index maintenance. Each entry: (table, name, statements).
+POST_LOAD_INDEXES = [
+    ("person", "pk_person", [
+        "ALTER TABLE dbo.person ALTER COLUMN person_id BIGINT NOT NULL",
+        "ALTER TABLE dbo.person ADD CONSTRAINT pk_person PRIMARY KEY CLUSTERED (person_id)",
+    ]),
+    ("visit_occurrence", "pk_visit_occurrence", [
+        "ALTER TABLE dbo.visit_occurrence ALTER COLUMN visit_occurrence_id BIGINT NOT NULL",
+        "ALTER TABLE dbo.visit_occurrence ADD CONSTRAINT pk_visit_occurrence "
+        "PRIMARY KEY CLUSTERED (visit_occurrence_id)",
+    ]),
+    ("visit_occurrence", "ix_visit_occurrence_person", [
+        "CREATE NONCLUSTERED INDEX ix_visit_occurrence_person ON dbo.visit_occurrence (person_id) "
+        "INCLUDE (visit_start_date, visit_end_date)",
+    ]),
+    ("cost", "pk_cost", [
+        "ALTER TABLE dbo.cost ALTER COLUMN cost_id BIGINT NOT NULL",
+        "ALTER TABLE dbo.cost ADD CONSTRAINT pk_cost PRIMARY KEY CLUSTERED (cost_id)",
+    ]),
+    ("cost", "ix_cost_person", [
+        "CREATE NONCLUSTERED INDEX ix_cost_person ON dbo.cost (person_id) "
+        "INCLUDE (total_charge, total_paid, paid_by_patient)",
+    ]),
+    ("cost", "ix_cost_event", [
+        "CREATE NONCLUSTERED INDEX ix_cost_event ON dbo.cost (cost_event_id) "
+        "INCLUDE (person_id, total_charge, total_paid, paid_by_patient)",
+    ]),
+    ("concept", "pk_concept", [
+        "ALTER TABLE dbo.concept ALTER COLUMN concept_id BIGINT NOT NULL",
+        "ALTER TABLE dbo.concept ADD CONSTRAINT pk_concept PRIMARY KEY CLUSTERED (concept_id)",
+    ]),
+    ("condition_occurrence", "pk_condition_occurrence", [
+        "ALTER TABLE dbo.condition_occurrence ALTER COLUMN condition_occurrence_id BIGINT NOT NULL",
+        "ALTER TABLE dbo.condition_occurrence ADD CONSTRAINT pk_condition_occurrence "
+        "PRIMARY KEY CLUSTERED (condition_occurrence_id)",
+    ]),
+    ("condition_occurrence", "ix_condition_occurrence_person", [
+        "CREATE NONCLUSTERED INDEX ix_condition_occurrence_person ON dbo.condition_occurrence (person_id) "
+        "INCLUDE (condition_concept_id, condition_start_date)",
+    ]),
+]
+
+# Semantic views from sql/06_semantic views.sql, timed before and after indexing
+BENCHMARK_VIEWS = [
+    "dbo.vw_patient_summary",
+    "dbo.vw_high_cost_patients",
+    "dbo.vw_readmissions",
+    "dbo.vw_claims_with_conditions",
+]
+
+def build_indexes(engine):
+    """Creates primary keys and join indexes, timing each build separately.
+
+    A failed build (e.g. a hash collision breaking a primary key) is reported
+    and skipped so the remaining indexes still get created.
+    """
+    print("── Building keys & join indexes ──")
+    timings = {}
+    for table, name, statements in POST_LOAD_INDEXES:
+        start = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                for stmt in statements:
+                    conn.execute(text(stmt))
+        except Exception as e:
+            print(f"  ✗ {name} on {table}: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+        print(f"  ✓ {name} on {table}: {timings[name]:.2f}s")
+    return timings
+
+def benchmark_views(engine, label, repeats=3):
+    """Best-of-N wall time to fully fetch each semantic view."""
+    print(f"── Benchmarking semantic views ({label}) ──")
+    results = {}
+    for view in BENCHMARK_VIEWS:
+        best = None
+        try:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                with engine.connect() as conn:
+                    conn.execute(text(f"SELECT * FROM {view}")).fetchall()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+        except Exception as e:
+            print(f"  ✗ {view}: {e}")
+            continue
+        results[view] = best
+        print(f"  {view}: {best * 1000:,.0f} ms")
+    return results
+
+def print_benchmark(before, after):
+    print("── View latency: before vs after indexing ──")
+    for view in BENCHMARK_VIEWS:
+        if view in before and view in after:
+            speedup = before[view] / after[view] if after[view] else float("inf")
+            print(f"  {view:<32} {before[view] * 1000:>9,.0f} ms → "
+                  f"{after[view] * 1000:>9,.0f} ms  ({speedup:.1f}x)")
+
 def main():
+    parser = argparse.ArgumentParser(description="Load parsed FHIR Parquet into OMOP tables on Azure SQL.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time the semantic views before and after the index build")
+    parser.add_argument("--skip-indexes", action="store_true",
+                        help="load the tables without building keys and join indexes")
+    args = parser.parse_args()
+
     print("=== Azure SQL OMOP Database Builder ===")
     load_dotenv()
     local_dir = Path(os.getenv("LOCAL_PROCESSED_PATH", "data/processed/fhir_parsed"))
@@ -159,11 +322,16 @@ def main():
             print(f"😴 Database waking up... (Attempt {attempt+1}/3)")
             time.sleep(15)
     
-    load_person(engine, local_dir)
-    load_visit_occurrence(engine, local_dir)
-    load_cost(engine, local_dir)
-    load_concept(engine, local_dir)
-    load_condition_occurrence(engine, local_dir)
+    # One projected read per Parquet file, shared across the loaders that use it
+    cache = ParquetCache(local_dir)
+    for loader, _, _ in LOADERS:
+        loader(engine, cache)
+
+    if not args.skip_indexes:
+        before = benchmark_views(engine, "no indexes") if args.benchmark else {}
+        build_indexes(engine)
+        if args.benchmark:
+            print_benchmark(before, benchmark_views(engine, "indexed"))
     print("=== OMOP Tables Successfully Deployed to Azure! ===")
 
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+"""
+06_build_star_schema.py
+-----------------------
+Builds the KPI star schema queried by sql/07_kpi_analysis.sql and
+sql/08_incre_load_architecture.sql from the parsed FHIR Parquet files:
+
+  - dim_patient          one row per patient
+  - dim_condition        one row per SNOMED code (+ an 'Unknown' member, key 0)
+  - dim_encounter_type   one row per encounter class (+ 'Unknown', key 0)
+  - dim_date             every calendar day between the first and last service date
+  - fact_claims          one row per claim, at encounter grain
+
+Everything is set-based: surrogate keys are assigned with one sort + arange per
+dimension, facts pick up their keys through DataFrame merges, and dim_date is
+generated with a single date_range. Outputs go to Parquet and, unless
+--no-sql is given, are bulk loaded into Azure SQL.
+
+Usage:
+  python 06_build_star_schema.py            # Parquet + Azure SQL
+  python 06_build_star_schema.py --no-sql   # Parquet only
+"""
+
+import os
+import argparse
+import importlib
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+# Reuse the engine factory and deterministic ID hashing from the OMOP loader
+omop = importlib.import_module("05_load_to_sql")
+
+STAR_DIR = Path("data/processed/star_schema")
+
+EMERGENCY_CLASSES = {"EMER"}
+INPATIENT_CLASSES = {"IMP", "ACUTE", "NONAC"}
+
+
+def strip_ref(series):
+    """Vectorized 'urn:uuid:' / 'Patient/' / 'Encounter/' prefix stripping."""
+    return series.astype("string").str.replace(r"^(urn:uuid:|Patient/|Encounter/)", "", regex=True)
+
+
+def hash_ids(series):
+    """uuid_to_int over a column, hashing each distinct ID only once.
+
+    Tokens match the OMOP person_id / visit_occurrence_id values, so the star
+    schema and the OMOP tables can be cross-referenced.
+    """
+    uniques = series.dropna().unique()
+    mapping = pd.Series([omop.uuid_to_int(u) for u in uniques], index=uniques, dtype="int64")
+    return series.map(mapping).astype("Int64")
+
+
+def surrogate_keys(df, natural_key):
+    """Assigns dense 1..n surrogate keys in natural-key order."""
+    df = df.sort_values(natural_key, kind="stable").reset_index(drop=True)
+    df.insert(0, "key", np.arange(1, len(df) + 1, dtype="int64"))
+    return df
+
+
+# ── Dimensions ─────────────────────────────────────────────────────────────────
+def build_dim_patient(patients):
+    dim = patients.assign(
+        fhir_patient_id=strip_ref(patients["fhir_patient_id"]),
+    ).drop_duplicates("fhir_patient_id")
+    dim = dim.assign(patient_token=hash_ids(dim["fhir_patient_id"]))
+    dim = surrogate_keys(dim, "patient_token").rename(columns={"key": "patient_key"})
+    return dim[["patient_key", "patient_token", "fhir_patient_id", "gender", "birth_year",
+                "race", "ethnicity", "state", "zip_3digit"]].rename(columns={"state": "state_abbr"})
+
+
+def build_dim_condition(conditions):
+    dim = (conditions.dropna(subset=["snomed_code"])
+                     .drop_duplicates("snomed_code")[["snomed_code", "snomed_display"]])
+    # Synthea displays end in a SNOMED semantic tag, e.g. "Hypertension (disorder)"
+    tag = dim["snomed_display"].str.extract(r"\(([^()]+)\)\s*$", expand=False)
+    dim = dim.assign(condition_category=tag.str.title().fillna("Other"))
+    dim = surrogate_keys(dim, "snomed_code").rename(columns={"key": "condition_key"})
+    unknown = pd.DataFrame({"condition_key": [0], "snomed_code": [None],
+                            "snomed_display": ["Unknown"], "condition_category": ["Unknown"]})
+    return pd.concat([unknown, dim], ignore_index=True)
+
+
+def build_dim_encounter_type(encounters):
+    dim = encounters.drop_duplicates("class_code")[["class_code", "class_display"]].dropna(subset=["class_code"])
+    dim = dim.assign(
+        class_display=dim["class_display"].fillna(dim["class_code"]),
+        is_emergency=dim["class_code"].isin(EMERGENCY_CLASSES).astype("int8"),
+        is_inpatient=dim["class_code"].isin(INPATIENT_CLASSES).astype("int8"),
+    )
+    dim = surrogate_keys(dim, "class_code").rename(columns={"key": "encounter_type_key"})
+    unknown = pd.DataFrame({"encounter_type_key": [0], "class_code": [None], "class_display": ["Unknown"],
+                            "is_emergency": [0], "is_inpatient": [0]})
+    return pd.concat([unknown, dim], ignore_index=True).astype({"is_emergency": "int8", "is_inpatient": "int8"})
+
+
+def build_dim_date(service_dates):
+    """The whole calendar between the first and last service date, in one pass."""
+    days = pd.date_range(service_dates.min(), service_dates.max(), freq="D")
+    return pd.DataFrame({
+        "date_key":    (days.year * 10000 + days.month * 100 + days.day).astype("int32"),
+        "full_date":   days.date,
+        "year":        days.year.astype("int16"),
+        "quarter":     days.quarter.astype("int8"),
+        "month":       days.month.astype("int8"),
+        "month_name":  days.month_name(),
+        "day":         days.day.astype("int8"),
+        "day_of_week": (days.dayofweek + 1).astype("int8"),
+        "day_name":    days.day_name(),
+        "is_weekend":  (days.dayofweek >= 5).astype("int8"),
+    })
+
+
+# ── Fact ───────────────────────────────────────────────────────────────────────
+def primary_condition(conditions):
+    """First-onset condition per encounter, used as the claim's condition."""
+    cond = conditions.assign(fhir_encounter_id=strip_ref(conditions["fhir_encounter_id"]))
+    cond = cond.dropna(subset=["fhir_encounter_id", "snomed_code"])
+    cond = cond.sort_values(["fhir_encounter_id", "onset_date"], kind="stable", na_position="last")
+    return cond.drop_duplicates("fhir_encounter_id")[["fhir_encounter_id", "snomed_code"]]
+
+
+def build_fact_claims(claims, encounters, conditions, dim_patient, dim_condition, dim_encounter_type):
+    fact = claims.assign(
+        patient_id=strip_ref(claims["patient_id"]),
+        encounter_id=strip_ref(claims["encounter_id"]),
+    )
+    enc = encounters.assign(fhir_encounter_id=strip_ref(encounters["fhir_encounter_id"]))
+    enc = enc.drop_duplicates("fhir_encounter_id")[["fhir_encounter_id", "class_code", "start_date"]]
+
+    fact = (fact.merge(enc, how="left", left_on="encounter_id", right_on="fhir_encounter_id")
+                .merge(primary_condition(conditions), how="left",
+                       left_on="encounter_id", right_on="fhir_encounter_id", suffixes=("", "_cond"))
+                .merge(dim_patient[["patient_key", "fhir_patient_id"]], how="inner",
+                       left_on="patient_id", right_on="fhir_patient_id")
+                .merge(dim_condition[["condition_key", "snomed_code"]].dropna(), how="left", on="snomed_code")
+                .merge(dim_encounter_type[["encounter_type_key", "class_code"]].dropna(), how="left",
+                       on="class_code"))
+
+    # Service date: encounter start, falling back to the claim's creation date
+    service_start = pd.to_datetime(fact["start_date"], errors="coerce").fillna(
+        pd.to_datetime(fact["created"].astype("string").str[:10], errors="coerce"))
+    date_key = service_start.dt.year * 10000 + service_start.dt.month * 100 + service_start.dt.day
+
+    total = pd.to_numeric(fact["total_cost"], errors="coerce")
+    paid  = pd.to_numeric(fact["payment_amount"], errors="coerce")
+
+    out = pd.DataFrame({
+        "encounter_token":       hash_ids(fact["encounter_id"]),
+        "claim_token":           hash_ids(strip_ref(fact["claim_id"])),
+        "patient_key":           fact["patient_key"].astype("int64"),
+        "date_key":              date_key.astype("Int32"),
+        "condition_key":         fact["condition_key"].fillna(0).astype("int64"),
+        "encounter_type_key":    fact["encounter_type_key"].fillna(0).astype("int64"),
+        "service_start":         service_start.dt.date,
+        "total_claim_cost":      total.round(2),
+        "payer_coverage":        paid.round(2),
+        "patient_out_of_pocket": (total - paid).round(2),
+    })
+    out = out.drop_duplicates("claim_token")
+    out.insert(0, "claim_key", np.arange(1, len(out) + 1, dtype="int64"))
+    return out, service_start.dropna()
+
+
+# ── Outputs ────────────────────────────────────────────────────────────────────
+def write_parquet(tables, out_dir):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        df.to_parquet(out_dir / f"{name}.parquet", index=False, engine="pyarrow")
+        print(f"  ✓ {name}.parquet: {len(df):,} rows")
+
+
+def write_sql(tables, engine, chunksize=10_000):
+    for name, df in tables.items():
+        start = time.perf_counter()
+        df.to_sql(name, con=engine, if_exists="replace", index=False, chunksize=chunksize)
+        print(f"  ✓ {name}: {len(df):,} rows loaded in {time.perf_counter() - start:.1f}s")
+
+
+def bump_watermark(engine, pipeline_name="synthea_claims_ingestion"):
+    """Moves the load watermark so watermark-keyed KPI caches see the reload."""
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(
+                text("UPDATE etl_control_table SET last_processed_timestamp = GETUTCDATE() "
+                     "WHERE pipeline_name = :p"), {"p": pipeline_name})
+        print(f"  ✓ watermark for {pipeline_name} moved ({result.rowcount} row)")
+    except Exception as e:
+        print(f"  ⚠️ watermark not updated: {e}")
+
+
+def build_star_schema(local_dir):
+    print("── Reading parsed FHIR Parquet ──")
+    patients   = pd.read_parquet(local_dir / "patient_fhir.parquet",
+                                 columns=["fhir_patient_id", "gender", "birth_year", "race",
+                                          "ethnicity", "state", "zip_3digit"])
+    encounters = pd.read_parquet(local_dir / "encounter_fhir.parquet",
+                                 columns=["fhir_encounter_id", "class_code", "class_display", "start_date"])
+    conditions = pd.read_parquet(local_dir / "condition_fhir.parquet",
+                                 columns=["fhir_encounter_id", "snomed_code", "snomed_display", "onset_date"])
+    claims     = pd.read_parquet(local_dir / "claims_fhir.parquet",
+                                 columns=["claim_id", "patient_id", "encounter_id",
+                                          "total_cost", "payment_amount", "created"])
+
+    print("── Building dimensions & fact ──")
+    dim_patient        = build_dim_patient(patients)
+    dim_condition      = build_dim_condition(conditions)
+    dim_encounter_type = build_dim_encounter_type(encounters)
+    fact_claims, service_dates = build_fact_claims(
+        claims, encounters, conditions, dim_patient, dim_condition, dim_encounter_type)
+    dim_date = build_dim_date(service_dates)
+
+    return {
+        # The raw FHIR id is only needed for the fact join; ship the hashed token
+        "dim_patient":        dim_patient.drop(columns=["fhir_patient_id"]),
+        "dim_condition":      dim_condition,
+        "dim_encounter_type": dim_encounter_type,
+        "dim_date":           dim_date,
+        "fact_claims":        fact_claims,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the KPI star schema from parsed FHIR Parquet.")
+    parser.add_argument("--no-sql", action="store_true", help="write Parquet only, skip the Azure SQL load")
+    args = parser.parse_args()
+
+    print("=== Star Schema Builder ===")
+    load_dotenv()
+    local_dir = Path(os.getenv("LOCAL_PROCESSED_PATH", "data/processed/fhir_parsed"))
+    if not local_dir.exists():
+        print(f"❌ Could not find the folder: {local_dir}")
+        return
+
+    tables = build_star_schema(local_dir)
+
+    print(f"── Writing Parquet to {STAR_DIR} ──")
+    write_parquet(tables, STAR_DIR)
+
+    if not args.no_sql:
+        print("── Bulk loading into Azure SQL ──")
+        engine = omop.get_engine()
+        write_sql(tables, engine)
+        bump_watermark(engine)
+
+    print("=== Star Schema Build Complete ===")
+
+
+if __name__ == "__main__":
+    main()
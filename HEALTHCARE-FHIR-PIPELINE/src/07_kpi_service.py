@@ -0,0 +1,164 @@
+"""
+07_kpi_service.py
+-----------------
+Serves the dashboard KPIs from sql/07_kpi_analysis.sql with a result cache
+keyed on the load watermark.
+
+The fact tables only change when a load moves
+etl_control_table.last_processed_timestamp (see sql/08_incre_load_architecture.sql),
+so each result set is cached under (kpi, SQL text hash, watermark). A refresh
+costs one single-row watermark lookup; the KPI queries themselves only re-run
+after the next load. Results are kept in memory and in Parquet under
+data/processed/kpi_outputs/, so a restarted dashboard process starts warm.
+
+Usage:
+  python 07_kpi_service.py                       # all KPIs
+  python 07_kpi_service.py --kpi summary_card    # one KPI
+  python 07_kpi_service.py --force               # ignore the cache
+"""
+
+import os
+import re
+import argparse
+import hashlib
+import importlib
+import time
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+omop = importlib.import_module("05_load_to_sql")
+
+KPI_SQL_PATH  = Path(__file__).resolve().parent.parent / "sql" / "07_kpi_analysis.sql"
+KPI_CACHE_DIR = Path("data/processed/kpi_outputs")
+PIPELINE_NAME = "synthea_claims_ingestion"
+
+# Section headers in 07_kpi_analysis.sql -> KPI names used by the dashboard
+KPI_SECTIONS = {
+    "KPI 1": "cost_by_condition",
+    "KPI 2": "monthly_volume",
+    "KPI 4": "coverage_gap",
+    "KPI 5": "readmissions",
+    "BONUS": "summary_card",
+}
+
+
+def load_kpi_queries(sql_path=KPI_SQL_PATH):
+    """Splits the KPI SQL file on its '-- KPI n' / '-- BONUS' headers."""
+    queries, name, lines = {}, None, []
+    for line in Path(sql_path).read_text(encoding="utf-8").splitlines():
+        header = re.match(r"--\s*(KPI \d+|BONUS)\b", line)
+        if header:
+            if name:
+                queries[name] = "\n".join(lines).strip().rstrip(";")
+            name, lines = KPI_SECTIONS.get(header.group(1)), []
+        elif name:
+            lines.append(line)
+    if name:
+        queries[name] = "\n".join(lines).strip().rstrip(";")
+    return queries
+
+
+class KPIService:
+    """Runs the KPI queries at most once per load watermark.
+
+    The watermark lookup itself is cached for watermark_ttl seconds, so bursts
+    of dashboard refreshes do not each hit the database.
+    """
+
+    def __init__(self, engine, cache_dir=KPI_CACHE_DIR, pipeline_name=PIPELINE_NAME,
+                 watermark_ttl=30, sql_path=KPI_SQL_PATH):
+        self.engine        = engine
+        self.cache_dir     = Path(cache_dir)
+        self.pipeline_name = pipeline_name
+        self.watermark_ttl = watermark_ttl
+        self.queries       = load_kpi_queries(sql_path)
+        self._memory       = {}
+        self._watermark    = None
+        self._watermark_at = 0.0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def watermark(self, refresh=False):
+        """Current last_processed_timestamp, or None if the control table is missing."""
+        now = time.monotonic()
+        if refresh or now - self._watermark_at > self.watermark_ttl:
+            try:
+                with self.engine.connect() as conn:
+                    self._watermark = conn.execute(
+                        text("SELECT last_processed_timestamp FROM etl_control_table "
+                             "WHERE pipeline_name = :p"),
+                        {"p": self.pipeline_name},
+                    ).scalar()
+            except Exception as e:
+                print(f"⚠️  Could not read watermark ({e}); KPIs will not be cached")
+                self._watermark = None
+            self._watermark_at = now
+        return self._watermark
+
+    def _cache_key(self, name, watermark):
+        sql_hash = hashlib.sha256(self.queries[name].encode("utf-8")).hexdigest()[:12]
+        wm = pd.Timestamp(watermark).strftime("%Y%m%dT%H%M%S%f")
+        return f"{name}__{sql_hash}__{wm}"
+
+    def get(self, name, force=False):
+        """Returns (DataFrame, source) where source is 'memory', 'disk' or 'query'."""
+        if name not in self.queries:
+            raise KeyError(f"Unknown KPI {name!r}; expected one of {sorted(self.queries)}")
+
+        watermark = self.watermark()
+        if watermark is None:
+            return self._run(name), "query"
+
+        key = self._cache_key(name, watermark)
+        if not force:
+            if key in self._memory:
+                return self._memory[key], "memory"
+            path = self.cache_dir / f"{key}.parquet"
+            if path.exists():
+                self._memory[key] = pd.read_parquet(path)
+                return self._memory[key], "disk"
+
+        df = self._run(name)
+        self._store(name, key, df)
+        return df, "query"
+
+    def get_all(self, force=False):
+        return {name: self.get(name, force=force) for name in self.queries}
+
+    def _run(self, name):
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(self.queries[name]), conn)
+
+    def _store(self, name, key, df):
+        # Older watermarks for this KPI can never be served again
+        self._memory = {k: v for k, v in self._memory.items() if not k.startswith(f"{name}__")}
+        for stale in self.cache_dir.glob(f"{name}__*.parquet"):
+            stale.unlink()
+        self._memory[key] = df
+        df.to_parquet(self.cache_dir / f"{key}.parquet", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve dashboard KPIs with a watermark-keyed cache.")
+    parser.add_argument("--kpi", choices=sorted(KPI_SECTIONS.values()), help="run a single KPI")
+    parser.add_argument("--force", action="store_true", help="re-run the queries even if cached")
+    args = parser.parse_args()
+
+    print("=== KPI Service ===")
+    load_dotenv()
+    service = KPIService(omop.get_engine(), Path(os.getenv("KPI_CACHE_PATH", KPI_CACHE_DIR)))
+    print(f"Watermark ({service.pipeline_name}): {service.watermark()}")
+
+    names = [args.kpi] if args.kpi else list(service.queries)
+    for name in names:
+        start = time.perf_counter()
+        df, source = service.get(name, force=args.force)
+        print(f"── {name}: {len(df):,} rows from {source} in "
+              f"{(time.perf_counter() - start) * 1000:,.1f} ms ──")
+        print(df.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
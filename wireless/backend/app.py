@@ -85,6 +85,47 @@ DATABASE_SOURCE = os.getenv('DB_CONNECTION_STRING')
 UPLOAD_ROOT = os.path.join(os.path.dirname(__file__), '../uploads')
 bronze_service = BronzeService(DATABASE_SOURCE, UPLOAD_ROOT)
 
+from backend.services.metadata_cache import MetadataCache
+from backend.services.job_service import JobService, SpooledFile
+from backend.processors.pcd_processor import PCDProcessor
+metadata_cache = MetadataCache()
+
+# Uploads and cache-miss analyses run here, not in the request thread
+job_service = JobService()
+try:
+    job_service.recover()
+except Exception as e:
+    print(f"⚠️  Job table unavailable ({e}); run init_cloud_tables.py")
+
+# Extension -> processor class; each class carries the PROCESSOR_VERSION its cache entries are keyed on
+ANALYZERS = {
+    'csv': CSVProcessor,
+    'mat': WirelessDataProcessor,
+    'pcd': PCDProcessor,
+}
+
+# ─── METRICS ───
+# Per-route latency plus SQL pool / blob client setup costs (see /api/metrics)
+from flask import g
+from backend.utils.metrics import timings
+from backend.utils.db_pool import get_pool
+
+@app.before_request
+def _start_timer():
+    g._request_start = time.perf_counter()
+
+@app.after_request
+def _record_timing(response):
+    if request.path.startswith('/api/') and hasattr(g, '_request_start'):
+        timings.record(f"route.{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                       time.perf_counter() - g._request_start)
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    return jsonify({'success': True, 'sql_pool': get_pool().snapshot(), 'timings': timings.snapshot()})
+
 # ─── ROUTES ───
 
 @app.route('/')
@@ -94,53 +135,188 @@ def index():
 @app.route('/api/upload', methods=['POST'])
 @login_required
 def upload_file():
+    """
+    Spools the request's files and returns 202 with a job id at once; the
+    blob transfer and SQL recording run on the job workers (poll /api/jobs/<id>).
+    """
     if 'file' not in request.files:
         return jsonify({'success': False, 'error': 'No file part'}), 400
     
-    files = request.files.getlist('file')
+    files = [f for f in request.files.getlist('file') if f.filename != '']
     dataset_name = request.form.get('dataset_name', 'Default_Dataset')
-    
+    if not files:
+        return jsonify({'success': False, 'error': 'No files selected'}), 400
+
+    spool_dir, spooled = job_service.spool_files(files)
+    job_id = job_service.submit(
+        'upload', current_user.id, run_upload_job,
+        params={
+            'files': spooled, 'dataset_name': dataset_name,
+            'user_email': current_user.email, 'user_id': current_user.id,
+            'user_full_name': current_user.full_name
+        },
+        cleanup=lambda: job_service.remove_spool(spool_dir)
+    )
+    return jsonify({'success': True, 'job_id': job_id,
+                    'message': f'Queued {len(spooled)} file(s) for upload.'}), 202
+
+def run_upload_job(ctx, files, dataset_name, user_email, user_id, user_full_name):
+    file_objs = [SpooledFile(f['path'], f['filename']) for f in files]
     success_count = 0
     errors = []
-
-    for file in files:
-        if file.filename == '': continue
-        try:
+    try:
+        if len(file_objs) > 1:
+            # Dataset upload: concurrent blob uploads, one set-based SQL transaction
+            success_count, _, errors = bronze_service.process_batch(
+                file_objs, dataset_name, user_email, user_id, user_full_name, ctx=ctx
+            )
+        else:
             success, msg = bronze_service.process_upload(
-                file, dataset_name, current_user.email, current_user.id, current_user.full_name
+                file_objs[0], dataset_name, user_email, user_id, user_full_name
             )
             if success: success_count += 1
+    finally:
+        for f in file_objs:
+            f.close()
+    return {'message': f'Processed {success_count} files.', 'errors': errors}
+
+# --- HASH-FIRST DEDUPE ---
+# The browser hashes files before sending them. Content we already hold is
+# linked instead of uploaded, once the client proves it has the bytes by
+# hashing a server-chosen range of them (the challenge is signed, not stored).
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+import secrets
+
+DEDUPE_PROOF_BYTES = 64 * 1024
+DEDUPE_CHALLENGE_TTL = 600  # seconds
+_dedupe_signer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='upload-dedupe')
+
+@app.route('/api/upload/check', methods=['POST'])
+@login_required
+def check_upload_hashes():
+    """Body: {files: [{filename, size, sha256}]}. Returns which files need uploading."""
+    files = (request.get_json(silent=True) or {}).get('files', [])
+    if not isinstance(files, list) or not all(isinstance(f, dict) for f in files):
+        return jsonify({'success': False, 'error': 'files must be a list of {filename, size, sha256}'}), 400
+    duplicates, upload = [], []
+
+    for f in files:
+        filename = f.get('filename', '')
+        try:
+            size = int(f.get('size'))
+        except (TypeError, ValueError):
+            size = -1
+        if size < 0:
+            return jsonify({'success': False, 'error': f"Invalid size for '{filename}'"}), 400
+        file_hash = str(f.get('sha256', '')).lower()
+        existing = bronze_service.find_existing(file_hash) if len(file_hash) == 64 else None
+        # An empty file has no bytes to prove possession of; it uploads instantly anyway
+        if size == 0 or not existing or existing['file_size'] != size:
+            upload.append(filename)
+            continue
+
+        length = min(DEDUPE_PROOF_BYTES, size)
+        offset = secrets.randbelow(size - length + 1)
+        nonce  = secrets.token_hex(16)
+        token  = _dedupe_signer.dumps({
+            'h': file_hash, 'p': existing['file_path'], 'f': filename,
+            'o': offset, 'l': length, 'n': nonce, 'u': current_user.id
+        })
+        duplicates.append({'filename': filename, 'token': token,
+                           'offset': offset, 'length': length, 'nonce': nonce})
+
+    return jsonify({'success': True, 'duplicates': duplicates, 'upload': upload})
+
+@app.route('/api/upload/link', methods=['POST'])
+@login_required
+def link_duplicate_uploads():
+    """Body: {dataset_name, proofs: [{token, proof}]}. Records proven duplicates without a transfer."""
+    body = request.get_json(silent=True) or {}
+    dataset_name = body.get('dataset_name', 'Default_Dataset')
+    linked, errors, failed = 0, [], []
+
+    for item in body.get('proofs', []):
+        try:
+            c = _dedupe_signer.loads(item.get('token', ''), max_age=DEDUPE_CHALLENGE_TTL)
+        except BadSignature:
+            errors.append('Invalid or expired dedupe challenge')
+            continue
+        if c['u'] != current_user.id or not bronze_service.verify_possession(
+                c['p'], c['o'], c['l'], c['n'], item.get('proof', '')):
+            failed.append(c['f'])   # the client falls back to a normal upload
+            continue
+        try:
+            success, msg = bronze_service.link_verified(
+                c['h'], c['f'], dataset_name,
+                current_user.email, current_user.id, current_user.full_name
+            )
+            if success: linked += 1
+            else: failed.append(c['f'])
         except Exception as e:
-            print(f"Error uploading {file.filename}: {e}")
+            print(f"Error linking {c['f']}: {e}")
             errors.append(str(e))
-            
-    return jsonify({
-        'success': True, 
-        'message': f'Processed {success_count} files.',
-        'errors': errors
-    })
+
+    return jsonify({'success': True, 'linked': linked, 'failed': failed, 'errors': errors})
+
+FILES_PAGE_DEFAULT = 100
+FILES_PAGE_MAX     = 500
+
+def _listing_args():
+    """Page size, cursor and filters from the query string (?limit=&cursor=&dataset=&modality=&extension=)."""
+    try:
+        limit = int(request.args.get('limit', FILES_PAGE_DEFAULT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return {
+        'limit':          min(max(limit, 1), FILES_PAGE_MAX),
+        'cursor':         request.args.get('cursor') or None,
+        'dataset_name':   request.args.get('dataset') or None,
+        'modality':       request.args.get('modality') or None,
+        'file_extension': (request.args.get('extension') or '').lower().lstrip('.') or None,
+    }
 
 @app.route('/api/files', methods=['GET'])
 @login_required
 def get_my_files():
     try:
-        # 1. Fetch from the database
-        files = bronze_service.get_user_files(current_user.id)
-        
-        # 2. Fix the Datetime Serialization Crash
-        for f in files:
-            # Convert datetime objects to strings so JSON can read them
-            if 'upload_time_pst' in f and f['upload_time_pst']:
-                f['upload_time_pst'] = str(f['upload_time_pst'])
-                
-        # 3. Send safely to frontend
-        return jsonify({'success': True, 'files': files})
-        
+        files, next_cursor = bronze_service.get_user_files(current_user.id, **_listing_args())
+        return jsonify({'success': True, 'files': files, 'next_cursor': next_cursor})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), 'files': []}), 400
     except Exception as e:
         print(f"Error fetching files: {e}")
         # Always return a valid 'files' array, even on error, to prevent frontend crashes
         return jsonify({'success': False, 'error': str(e), 'files': []})
 
+@app.route('/api/files/delete', methods=['POST'])
+@login_required
+def delete_my_files():
+    data = request.get_json(silent=True) or {}
+    try:
+        deleted = bronze_service.soft_delete(
+            current_user.id, data.get('ids') or [],
+            user_email=current_user.email, user_full_name=current_user.full_name)
+        return jsonify({'success': True, 'deleted': deleted})
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'ids must be a list of file ids'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/files', methods=['GET'])
+@login_required
+def get_admin_files():
+    if not getattr(current_user, 'is_admin', False):
+        return jsonify({'success': False, 'error': 'Admin only'}), 403
+    try:
+        files, next_cursor = bronze_service.get_all_files_for_admin(**_listing_args())
+        return jsonify({'success': True, 'files': files, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), 'files': []}), 400
+    except Exception as e:
+        print(f"Error fetching admin files: {e}")
+        return jsonify({'success': False, 'error': str(e), 'files': []})
+
 # ... (rest of your routes)
 # --- IMPORTS FOR ANALYSIS ---
 from backend.processors.pcd_processor import PCDProcessor
@@ -156,7 +332,9 @@ from flask import request, jsonify
 def analyze_dataset():
     """
     Catches the Azure path from the frontend and routes it to the correct processor.
-    The processor classes now handle their own downloading, analyzing, and cleanup.
+    Cache hits return the metadata directly; misses return 202 with a job id
+    and the processor runs on a job worker. ?stats=1 asks for the statistics
+    that read the whole file, for processors that offer them (STATS_VERSION).
     """
     try:
         # 1. Catch the exact Azure Blob Path sent by the frontend
@@ -167,40 +345,339 @@ def analyze_dataset():
 
         # Extract the extension (e.g., 'csv', 'mat', 'pcd')
         ext = blob_path.rsplit('.', 1)[-1].lower()
-        metadata = {}
-
-        # 2. Route to the correct processor
-        # Pass the Azure blob_path directly to the processor classes
-        if ext == 'csv':
-            from backend.processors.csv_processor import CSVProcessor
-            proc = CSVProcessor(blob_path)
-            metadata = proc.get_metadata()
-            
-        elif ext == 'mat':
-            from backend.processors.mat_processor import WirelessDataProcessor
-            proc = WirelessDataProcessor(blob_path)
-            metadata = proc.get_metadata()
-            
-        elif ext == 'pcd':
-            from backend.processors.pcd_processor import PCDProcessor
-            proc = PCDProcessor(blob_path)
-            metadata = proc.get_metadata() 
-            
-        else:
+        processor_cls = ANALYZERS.get(ext)
+        if processor_cls is None:
             return jsonify({"success": False, "error": f"Analysis not supported for .{ext} files"})
 
-        # 3. Check for processor-level errors (like h5py missing)
-        if metadata.get('success') is False or 'error' in metadata:
-            error_msg = metadata.get('error', 'Unknown analysis error')
-            return jsonify({'success': False, 'error': error_msg})
+        # 2. Same content + same processor version = same answer, so serve it from the cache
+        stats = request.args.get('stats') == '1' and hasattr(processor_cls, 'STATS_VERSION')
+        versions = [processor_cls.PROCESSOR_VERSION]
+        if hasattr(processor_cls, 'STATS_VERSION'):
+            # A cached statistics analysis (from the upload stream or an earlier ?stats=1) covers the header view too
+            versions = [processor_cls.STATS_VERSION] if stats else [processor_cls.STATS_VERSION] + versions
+        file_hash, metadata = None, None
+        try:
+            for version in versions:
+                file_hash, metadata = metadata_cache.lookup(blob_path, version)
+                if metadata is not None or file_hash is None:
+                    break
+        except Exception as e:
+            # The lookup is also what proves the path is a live bronze file, so never analyze without it
+            print(f"⚠️  Analysis cache unavailable ({e})")
+            return jsonify({'success': False, 'error': 'Analysis is unavailable right now'}), 503
+        if file_hash is None:
+            return jsonify({'success': False, 'error': 'File not found'}), 404
+        if metadata is not None:
+            return jsonify({'success': True, 'metadata': metadata, 'cached': True})
 
-        # 4. Return the glorious metadata to the React frontend
-        return jsonify({'success': True, 'metadata': metadata})
+        # 3. Cache miss: analyze on a job worker; the frontend polls /api/jobs/<id>
+        job_id = job_service.submit(
+            'analyze', current_user.id, run_analyze_job,
+            params={'blob_path': blob_path, 'ext': ext, 'file_hash': file_hash, 'stats': stats}
+        )
+        return jsonify({'success': True, 'job_id': job_id, 'cached': False}), 202
 
     except Exception as e:
         print(f"Analysis Route Error: {e}")
         return jsonify({'success': False, 'error': str(e)})
     
+def run_analyze_job(ctx, blob_path, ext, file_hash, stats=False):
+    processor_cls = ANALYZERS[ext]
+    version = processor_cls.STATS_VERSION if stats else processor_cls.PROCESSOR_VERSION
+    ctx.progress(0.05, f"Analyzing with {version}")
+
+    # The processor handles its own downloading, analyzing, and cleanup
+    start = time.perf_counter()
+    processor = processor_cls(blob_path)
+    metadata = processor.get_metadata(stats=True) if stats else processor.get_metadata()
+
+    # Check for processor-level errors (like h5py missing); errors are never cached
+    if metadata.get('success') is False or 'error' in metadata:
+        raise RuntimeError(metadata.get('error', 'Unknown analysis error'))
+
+    try:
+        metadata_cache.store(file_hash, version, ext, metadata)
+    except Exception as e:
+        print(f"⚠️  Could not cache analysis for {blob_path}: {e}")
+    print(f"🔬 Analyzed {blob_path} with {version} in {time.perf_counter() - start:.2f}s")
+    return metadata
+
+# --- POINT CLOUD PREVIEWS ---
+# Voxel-downsampled LODs cached next to the bronze blob; see PreviewService.
+from flask import Response, stream_with_context
+from backend.services.preview_service import PreviewService, PREVIEW_LODS, PREVIEW_VERSION
+preview_service = PreviewService()
+
+@app.route('/api/preview', methods=['GET'])
+@login_required
+def point_cloud_preview():
+    """
+    Streams one level of detail (?lod=10000) of a PCD file (?path=) in the
+    pcd_preview binary format. A preview that has not been built yet returns
+    202 with a job id; fetch again once the job succeeds.
+    """
+    blob_path = request.args.get('path', '')
+    if not blob_path.lower().endswith('.pcd'):
+        return jsonify({'success': False, 'error': 'Previews are available for .pcd files'}), 400
+    try:
+        lod = int(request.args.get('lod', PREVIEW_LODS[0]))
+    except ValueError:
+        lod = None
+    if lod not in PREVIEW_LODS:
+        return jsonify({'success': False, 'error': f'lod must be one of {list(PREVIEW_LODS)}'}), 400
+
+    file_hash = preview_service.file_hash(blob_path)
+    if not file_hash:
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+
+    # Content-addressed, so the browser's copy is valid for as long as the hash is
+    etag = f'"{file_hash}-{PREVIEW_VERSION}-{lod}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+
+    downloader = preview_service.open(blob_path, file_hash, lod)
+    if downloader is None:
+        job_id = job_service.submit('preview', current_user.id, run_preview_job,
+                                    {'blob_path': blob_path, 'file_hash': file_hash})
+        return jsonify({'success': True, 'job_id': job_id, 'cached': False}), 202
+
+    return Response(stream_with_context(downloader.chunks()), mimetype='application/octet-stream', headers={
+        'Content-Length': str(downloader.size),
+        'Cache-Control':  'private, max-age=31536000, immutable',
+        'ETag':           etag,
+    })
+
+def run_preview_job(ctx, blob_path, file_hash):
+    ctx.progress(0.05, "Reading points")
+    return preview_service.build(blob_path, file_hash, ctx=ctx)
+
+# --- JOBS ---
+@app.route('/api/jobs', methods=['GET'])
+@login_required
+def list_jobs():
+    return jsonify({'success': True, 'jobs': job_service.list_recent(current_user.id)})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    job = job_service.get(job_id, current_user.id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    if not job_service.cancel(job_id, current_user.id):
+        return jsonify({'success': False, 'error': 'Job is not running'}), 409
+    return jsonify({'success': True})
+
+# --- SILVER LAYER ---
+# Hub pages read the precomputed silver_aggregated / data_lineage tables;
+# builds consolidate a modality's bronze folders into Parquet as a job.
+from backend.services.silver_service import SilverService, MODALITY_EXTENSIONS
+silver_service = SilverService()
+
+@app.route('/api/silver/hub/<modality>', methods=['GET'])
+@login_required
+def silver_hub(modality):
+    if modality not in MODALITY_EXTENSIONS:
+        return jsonify({'success': False, 'error': f'Unknown modality: {modality}', 'files': []}), 404
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), 2000)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer', 'files': []}), 400
+    try:
+        aggregations, files = silver_service.hub(modality, limit=limit)
+        return jsonify({'success': True, 'modality': modality,
+                        'aggregations': aggregations, 'files': files})
+    except Exception as e:
+        print(f"Error loading silver hub: {e}")
+        return jsonify({'success': False, 'error': str(e), 'files': []})
+
+@app.route('/api/silver/build/<modality>', methods=['POST'])
+@login_required
+def silver_build(modality):
+    if modality not in MODALITY_EXTENSIONS:
+        return jsonify({'success': False, 'error': f'Unknown modality: {modality}'}), 404
+    # Rewrites every researcher's partitions, so it is an admin operation
+    if not getattr(current_user, 'is_admin', False):
+        return jsonify({'success': False, 'error': 'Admin only'}), 403
+    # One build per modality: a build's cleanup deletes parts it did not write
+    # (SilverService.build also holds a lock, for scripts and racing requests)
+    running = job_service.active('silver_build', modality=modality)
+    if running:
+        return jsonify({'success': False, 'error': f'A {modality} build is already running',
+                        'job_id': running}), 409
+    force = request.args.get('force') == '1'
+    job_id = job_service.submit('silver_build', current_user.id, run_silver_build_job,
+                                {'modality': modality, 'force': force})
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+def run_silver_build_job(ctx, modality, force):
+    return silver_service.build(modality, ctx=ctx, force=force)
+
+# Aligned frame index tables: other aggregations as-of joined to a reference one in time
+from backend.services.align_service import AlignService, DEFAULT_TOLERANCE_MS
+from backend.processors.time_align import DIRECTIONS
+align_service = AlignService(silver_service)
+
+@app.route('/api/silver/align', methods=['POST'])
+@login_required
+def silver_align():
+    """
+    {"reference": {"modality": "lidar", "aggregation_name": "pratyusha/lidar0"},
+     "others": [{"modality": "wifi", "aggregation_name": "pratyusha/csi"}, ...],
+     "tolerance_ms": 50, "direction": "nearest" | "backward" | "forward"}
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        streams = [body['reference']] + list(body.get('others') or [])
+        streams = [(s['modality'], s['aggregation_name']) for s in streams]
+        tolerance_ms = float(body.get('tolerance_ms', DEFAULT_TOLERANCE_MS))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'reference, others and tolerance_ms are required'}), 400
+    unknown = [m for m, _ in streams if m not in MODALITY_EXTENSIONS]
+    if unknown or len(streams) < 2:
+        return jsonify({'success': False, 'error': f'Unknown modality: {unknown[0]}' if unknown
+                        else 'Give at least one aggregation to align with the reference'}), 400
+    direction = body.get('direction', 'nearest')
+    if direction not in DIRECTIONS:
+        return jsonify({'success': False, 'error': f'direction must be one of {list(DIRECTIONS)}'}), 400
+    job_id = job_service.submit('silver_align', current_user.id, run_silver_align_job,
+                                {'reference': streams[0], 'others': streams[1:],
+                                 'tolerance_ms': tolerance_ms, 'direction': direction})
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+def run_silver_align_job(ctx, reference, others, tolerance_ms, direction):
+    return align_service.align(reference, others, tolerance_ms=tolerance_ms, direction=direction, ctx=ctx)
+
+# Hyperslabs of converted MAT / HDF5 variables; only the overlapping chunks are fetched
+import io
+import numpy as np
+from backend.services.array_store import parse_selection, selection_shape
+ARRAY_SLICE_MAX_BYTES    = int(os.getenv('SILVER_ARRAY_SLICE_MAX_MB', '64')) * 1024 * 1024
+# Decoded chunk bytes one read may fetch: a strided slice can be small yet touch many chunks
+ARRAY_READ_MAX_BYTES     = int(os.getenv('SILVER_ARRAY_READ_MAX_MB', '256')) * 1024 * 1024
+ARRAY_JSON_MAX_ELEMENTS  = 1_000_000
+
+@app.route('/api/silver/array', methods=['GET'])
+@login_required
+def silver_array():
+    """
+    ?path=<bronze .mat>            -> the converted variables (shape, dtype, chunks)
+    &var=H&slice=0:1000,2,:        -> that hyperslab, as .npy (default) or &format=json
+    """
+    blob_path = request.args.get('path', '')
+    reader = silver_service.array_store(blob_path)
+    if reader is None:
+        return jsonify({'success': False, 'error': 'No Silver array store for this file; run the Silver build'}), 404
+
+    name = request.args.get('var')
+    if not name:
+        return jsonify({'success': True, 'variables': reader.variables(), 'skipped': reader.skipped()})
+    try:
+        info = reader.array_info(name)
+    except KeyError:
+        return jsonify({'success': False, 'error': f'Unknown variable: {name}'}), 404
+    try:
+        selection = parse_selection(request.args.get('slice', ''), info['shape'])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Bad slice: {e}'}), 400
+
+    fmt      = request.args.get('format', 'npy')
+    shape    = selection_shape(selection)
+    elements = int(np.prod(shape, dtype=np.int64))
+    if elements * np.dtype(info['dtype']).itemsize > ARRAY_SLICE_MAX_BYTES or (
+            fmt == 'json' and elements > ARRAY_JSON_MAX_ELEMENTS):
+        return jsonify({'success': False, 'error': f'Slice of shape {list(shape)} is too large; narrow it or use format=npy'}), 413
+
+    chunks = reader.touched_chunks(name, selection)
+    chunk_bytes = int(np.prod(info['chunks'], dtype=np.int64)) * np.dtype(info['dtype']).itemsize
+    if chunks * chunk_bytes > ARRAY_READ_MAX_BYTES:
+        return jsonify({'success': False, 'error': f'Slice touches {chunks:,} chunks '
+                        f'({chunks * chunk_bytes / (1024 * 1024):.0f} MB); narrow it'}), 413
+
+    values = reader.read(name, selection)
+    headers = {'X-Array-Chunks': str(reader.last_read['chunks']),
+               'X-Array-Bytes-Read': str(reader.last_read['bytes'])}
+    if fmt == 'json':
+        body = {'success': True, 'variable': name, 'shape': list(values.shape), 'dtype': values.dtype.str}
+        if np.iscomplexobj(values):
+            body.update({'real': values.real.tolist(), 'imag': values.imag.tolist()})
+        else:
+            body['data'] = values.tolist()
+        return jsonify(body), 200, headers
+    buffer = io.BytesIO()
+    np.save(buffer, values, allow_pickle=False)
+    headers['Content-Disposition'] = f'attachment; filename="{name}.npy"'
+    return Response(buffer.getvalue(), mimetype='application/octet-stream', headers=headers)
+
+# --- GOLD LAYER ---
+# Maintained incrementally by BronzeService; these are primary-key lookups.
+import threading
+from datetime import date, datetime, timezone
+gold_service = bronze_service.gold
+
+def _day_arg():
+    # Gold rows are keyed on the UTC upload date, so "today" is the UTC day too
+    if request.args.get('date'):
+        return date.fromisoformat(request.args['date'])
+    return datetime.now(timezone.utc).date()
+
+@app.route('/api/gold/researcher', methods=['GET'])
+@login_required
+def gold_researcher():
+    return jsonify({'success': True, 'stats': gold_service.researcher_stats(current_user.id)})
+
+@app.route('/api/gold/daily', methods=['GET'])
+@login_required
+def gold_daily():
+    try:
+        day = _day_arg()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'date must be YYYY-MM-DD'}), 400
+    return jsonify({'success': True, 'date': day.isoformat(),
+                    'uploads': gold_service.daily_uploads(current_user.id, day)})
+
+@app.route('/api/gold/quality/<modality>', methods=['GET'])
+@login_required
+def gold_quality(modality):
+    try:
+        day = _day_arg()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'date must be YYYY-MM-DD'}), 400
+    return jsonify({'success': True, 'quality': gold_service.quality(modality, day)})
+
+@app.route('/api/gold/reconcile', methods=['POST'])
+@login_required
+def gold_reconcile():
+    # Recomputes every researcher's rows, so it is an admin operation
+    if not getattr(current_user, 'is_admin', False):
+        return jsonify({'success': False, 'error': 'Admin only'}), 403
+    job_id = job_service.submit('gold_reconcile', current_user.id,
+                                lambda ctx: gold_service.reconcile())
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+# Periodic drift check (GOLD_RECONCILE_HOURS=0 disables it, e.g. when cron runs scripts/reconcile_gold.py)
+GOLD_RECONCILE_HOURS = float(os.getenv('GOLD_RECONCILE_HOURS', '24'))
+
+def _schedule_gold_reconcile():
+    def run():
+        try:
+            gold_service.reconcile()
+        except Exception as e:
+            print(f"⚠️  Gold reconcile failed: {e}")
+        _schedule_gold_reconcile()
+    timer = threading.Timer(GOLD_RECONCILE_HOURS * 3600, run)
+    timer.daemon = True
+    timer.start()
+
+# The debug reloader runs this module in a watcher process and again in the
+# serving child (WERKZEUG_RUN_MAIN=true); only the process that serves gets the timer
+if GOLD_RECONCILE_HOURS > 0 and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    _schedule_gold_reconcile()
+
 if __name__ == '__main__':
     print("🚀 Wireless Platform (Cloud-Ready) Running on http://0.0.0.0:5001")
     app.run(host='0.0.0.0', port=5001, debug=True)
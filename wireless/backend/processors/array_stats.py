@@ -0,0 +1,191 @@
+"""
+Streaming per-variable statistics for large MAT / HDF5 arrays.
+
+A dataset is read in blocks aligned to its native HDF5 chunks, so every
+chunk is decompressed exactly once, and no block (plus its float64
+temporaries) exceeds the memory budget. Each block's moments are merged
+into running totals (Chan et al.), so mean and std stay accurate over
+billions of elements.
+
+Complex arrays - numpy complex, or MATLAB v7.3's compound {real, imag} -
+are summarized by magnitude |h| (min / max / mean / std), the complex mean
+and the mean power in dB, which is what CSI analysis looks at.
+"""
+
+import time
+import itertools
+import numpy as np
+
+# Float64 temporaries per element on top of the raw block (converted copy, filtered values,
+# deviations, and the real / imag / |h| arrays of the complex path)
+_TEMP_BYTES_PER_ELEMENT = 32
+
+# MATLAB classes whose numbers are not measurements
+_SKIP_MATLAB_CLASSES = {b'char', b'cell', b'struct', b'function_handle'}
+
+def iter_blocks(shape, chunks, max_elements):
+    """
+    Selections (tuples of slices) tiling an array in blocks of whole chunks
+    with at most max_elements each. Trailing axes are taken whole while they
+    fit; the first axis that does not fit gets as many chunks as fit (at
+    least one), and leading axes stay one chunk wide. A contiguous dataset
+    is treated as chunked by single elements.
+    """
+    ndim = len(shape)
+    if ndim == 0:
+        yield ()
+        return
+    chunks = tuple(chunks or (1,) * ndim)
+    block  = list(chunks)
+    for axis in reversed(range(ndim)):
+        others = int(np.prod(block[:axis] + block[axis + 1:], dtype=np.int64))
+        fit = max_elements // max(others, 1)
+        if fit >= shape[axis]:
+            block[axis] = shape[axis]
+            continue
+        block[axis] = max(chunks[axis], fit // chunks[axis] * chunks[axis])
+        break
+    for starts in itertools.product(*(range(0, shape[a], block[a]) for a in range(ndim))):
+        yield tuple(slice(s, min(s + block[a], shape[a])) for a, s in enumerate(starts))
+
+def is_complex_dtype(dtype):
+    return dtype.kind == 'c' or bool(dtype.names and {'real', 'imag'} <= set(dtype.names))
+
+def is_numeric_dtype(dtype):
+    return dtype.kind in 'biuf' or is_complex_dtype(dtype)
+
+class _Moments:
+    """Running count / mean / M2 / min / max, merged block by block."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean  = 0.0
+        self.m2    = 0.0
+        self.min   = np.inf
+        self.max   = -np.inf
+
+    def update(self, values):
+        n = values.size
+        if not n:
+            return
+        mean = float(values.mean())
+        m2   = float(np.square(values - mean).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2   += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def result(self):
+        if not self.count:
+            return {'min': None, 'max': None, 'mean': None, 'std': None}
+        return {
+            'min':  _round(self.min),
+            'max':  _round(self.max),
+            'mean': _round(self.mean),
+            'std':  _round((self.m2 / self.count) ** 0.5),
+        }
+
+class ArrayStats:
+    """Streaming statistics of one array; feed it blocks in any order."""
+
+    def __init__(self, dtype):
+        self.complex   = is_complex_dtype(dtype)
+        self.elements  = 0
+        self.nan_count = 0
+        self.inf_count = 0
+        self.values    = _Moments()   # the values, or |h| for complex
+        self.real_sum  = 0.0
+        self.imag_sum  = 0.0
+
+    def update(self, block):
+        block = np.asarray(block)
+        self.elements += block.size
+        if self.complex:
+            if block.dtype.names:
+                real, imag = block['real'], block['imag']
+            else:
+                real, imag = block.real, block.imag
+            real = np.asarray(real, dtype=np.float64).ravel()
+            imag = np.asarray(imag, dtype=np.float64).ravel()
+            finite = self._finite(real, imag)
+            if not finite.all():
+                real, imag = real[finite], imag[finite]
+            self.real_sum += float(real.sum())
+            self.imag_sum += float(imag.sum())
+            self.values.update(np.hypot(real, imag))
+        else:
+            values = np.asarray(block, dtype=np.float64).ravel()
+            finite = self._finite(values)
+            self.values.update(values if finite.all() else values[finite])
+
+    def _finite(self, *parts):
+        """Mask of elements with every part finite; counts the NaN and infinite ones."""
+        finite = np.isfinite(parts[0])
+        for part in parts[1:]:
+            finite &= np.isfinite(part)
+        if not finite.all():
+            nan = np.isnan(parts[0])
+            for part in parts[1:]:
+                nan |= np.isnan(part)
+            nans = int(np.count_nonzero(nan))
+            self.nan_count += nans
+            self.inf_count += int(finite.size - np.count_nonzero(finite)) - nans
+        return finite
+
+    def result(self):
+        stats = {'elements': self.elements, 'nan_count': self.nan_count, 'inf_count': self.inf_count}
+        moments = self.values.result()
+        if not self.complex:
+            stats.update(moments)
+            return stats
+        n = self.values.count
+        stats['magnitude'] = moments
+        stats['mean'] = {'real': _round(self.real_sum / n) if n else None,
+                         'imag': _round(self.imag_sum / n) if n else None}
+        # E|h|^2 = var(|h|) + mean(|h|)^2
+        power = self.values.m2 / n + self.values.mean ** 2 if n else 0.0
+        stats['mean_power_db'] = _round(10 * np.log10(power)) if power > 0 else None
+        return stats
+
+def is_measurement_dataset(dataset):
+    """Numeric, non-empty, and not a MATLAB char / cell / struct stored as numbers."""
+    if not is_numeric_dtype(dataset.dtype) or dataset.size == 0:
+        return False
+    return dataset.attrs.get('MATLAB_class', b'') not in _SKIP_MATLAB_CLASSES and 'MATLAB_empty' not in dataset.attrs
+
+def dataset_stats(dataset, memory_budget):
+    """ArrayStats over an h5py Dataset, one chunk-aligned block at a time; None if not numeric."""
+    if not is_measurement_dataset(dataset):
+        return None
+
+    start   = time.perf_counter()
+    stats   = ArrayStats(dataset.dtype)
+    limit   = max(1, memory_budget // (dataset.dtype.itemsize + _TEMP_BYTES_PER_ELEMENT))
+    blocks  = 0
+    for selection in iter_blocks(dataset.shape, dataset.chunks, limit):
+        stats.update(dataset[selection])
+        blocks += 1
+
+    result = stats.result()
+    result.update({'blocks': blocks, 'chunks': list(dataset.chunks) if dataset.chunks else None,
+                   'seconds': round(time.perf_counter() - start, 3)})
+    return result
+
+def array_stats(array, memory_budget):
+    """ArrayStats over an in-memory array (v5 MAT variables), in budget-sized blocks."""
+    array = np.asarray(array)
+    if not is_numeric_dtype(array.dtype) or array.size == 0:
+        return None
+    stats = ArrayStats(array.dtype)
+    flat  = array.reshape(-1)
+    step  = max(1, memory_budget // (array.dtype.itemsize + _TEMP_BYTES_PER_ELEMENT))
+    for start in range(0, flat.size, step):
+        stats.update(flat[start:start + step])
+    return stats.result()
+
+def _round(value, digits=6):
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
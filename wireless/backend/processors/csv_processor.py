@@ -1,213 +1,216 @@
 import pandas as pd
-import numpy as np
 import os
+import io
+import csv
+import codecs
 import tempfile
-from azure.storage.blob import BlobServiceClient
 from dotenv import load_dotenv
+from backend.utils.blob_io import get_blob_client
+from backend.processors.csv_profiler import profile_csv, profile_chunks
 
 load_dotenv()
 
 class CSVProcessor:
+    # Bump whenever get_metadata() output changes; cached analyses are keyed on it
+    PROCESSOR_VERSION = 'csv-4'   # sniffed dialect + streaming sketch profile (unique_values <= non-null)
+
     def __init__(self, blob_path):
         self.blob_path = blob_path # This is now the Azure path (e.g., pratyusha/000004.csv)
         self.filename = os.path.basename(blob_path)
         self.df = None
         self.local_temp_path = None
+        self._owns_temp = True
+
+    @classmethod
+    def from_local(cls, path):
+        """Processor over a local file (batch jobs, benchmarks): read in place, never deleted."""
+        processor = cls(path)
+        processor.local_temp_path = path
+        processor._owns_temp = False
+        return processor
 
     def _download_from_azure(self):
         """Pulls the file from Azure to a temporary location for Pandas to read."""
         if not self.local_temp_path:
-            bsc = BlobServiceClient.from_connection_string(os.getenv('AZURE_STORAGE_CONNECTION_STRING'))
-            container_name = os.getenv('BRONZE_CONTAINER_NAME', 'bronze-layer')
-            blob_client = bsc.get_blob_client(container=container_name, blob=self.blob_path)
-            
-            # Create a safe temp file on the Mac
-            temp_dir = tempfile.gettempdir()
-            self.local_temp_path = os.path.join(temp_dir, self.filename)
+            # Shared service client: no per-file client construction or TLS handshake
+            blob_client = get_blob_client(self.blob_path)
             
+            # A unique temp file: concurrent jobs on files with the same name must not share one
+            fd, self.local_temp_path = tempfile.mkstemp(suffix='.csv', prefix='csv_')
+
             print(f"📥 Downloading {self.filename} from Azure for analysis...")
-            with open(self.local_temp_path, "wb") as f:
-                f.write(blob_client.download_blob().readall())
+            with os.fdopen(fd, "wb") as f:
+                # Stream to disk; readall() would hold the whole file in memory
+                blob_client.download_blob().readinto(f)
 
     def __del__(self):
         """Automatically cleans up the temp file when analysis is done."""
-        if self.local_temp_path and os.path.exists(self.local_temp_path):
+        if self._owns_temp and self.local_temp_path and os.path.exists(self.local_temp_path):
             os.remove(self.local_temp_path)
             print(f"🧹 Cleaned up temp file: {self.local_temp_path}")
 
     def get_metadata(self):
         """Bridge method for the Frontend."""
         try:
-            full_meta = self.extract_metadata()
-            variables = {}
-            rows = full_meta.get('num_rows', 0)
-            
-            for col_name, stats in full_meta.get('columns', {}).items():
-                variables[col_name] = {
-                    'shape': (rows,),          
-                    'dtype': stats['detected_type'] 
-                }
-                
-            return {
-                'filename': self.filename,
-                'file_type': 'CSV (Smart Analysis)',
-                'variables': variables
-            }
+            return frontend_metadata(self.extract_metadata(), self.filename)
         except Exception as e:
             return {'error': str(e)}
 
     def read_file(self):
         self._download_from_azure() # Ensure file is downloaded first
-        
-        for sep in [',', ';', '\t', '|']:
-            try:
-                # Use the local_temp_path instead of the old filepath
-                self.df = pd.read_csv(self.local_temp_path, sep=sep, engine='python')
-                if len(self.df.columns) == 1 and sep == ',':
-                    continue
-                print(f"✅ Read {self.filename} with separator '{sep}'")
-                return self.df
-            except Exception:
-                continue
-        raise ValueError(f"Could not parse {self.filename}")
-
-    # --- YOUR DYNAMIC LOGIC REMAINS EXACTLY THE SAME BELOW THIS LINE ---
-
-    @staticmethod
-    def _classify_column(series):
-        if series.dtype == bool or set(series.dropna().unique()).issubset(
-            {True, False, 0, 1, 'true', 'false', 'True', 'False', 'yes', 'no', 'Yes', 'No'}
-        ):
-            if series.nunique() <= 2:
-                return 'boolean'
-
-        if pd.api.types.is_numeric_dtype(series):
-            name_lower = series.name.lower()
-            time_keywords = ['time', 'timestamp', 'date', 'epoch', 'unix', 'sec', 'ms', 'ns']
-            if any(kw in name_lower for kw in time_keywords):
-                return 'timestamp'
-            if series.min() > 1e9 and series.is_monotonic_increasing:
-                return 'timestamp'
-            return 'numeric'
-
-        if series.dtype == object:
-            try:
-                pd.to_datetime(series.head(20), infer_datetime_format=True)
-                return 'timestamp'
-            except (ValueError, TypeError):
-                pass
-
-        if series.dtype == object:
-            unique_ratio = series.nunique() / max(len(series), 1)
-            if unique_ratio < 0.05 or series.nunique() <= 50:
-                return 'categorical'
-            return 'text'
-
-        return 'unknown'
-
-    def _stats_for_column(self, col_name):
-        series = self.df[col_name]
-        col_type = self._classify_column(series)
-
-        base = {
-            'column_name': col_name,
-            'detected_type': col_type,
-            'dtype': str(series.dtype),
-            'total_values': int(len(series)),
-            'null_count': int(series.isnull().sum()),
-            'non_null_count': int(series.notna().sum()),
-            'unique_values': int(series.nunique()),
-            'sample_values': [_safe_serialize(v) for v in series.dropna().head(5).tolist()]
+        dialect = sniff_dialect(self.local_temp_path)
+        # One parse with the C engine, using the dialect sniffed from a sample block
+        self.df = pd.read_csv(self.local_temp_path, engine='c', **dialect.read_csv_kwargs())
+        print(f"✅ Read {self.filename} with separator '{dialect.sep}'")
+        return self.df
+
+    def extract_metadata(self, chunksize=100_000):
+        """Every column statistic in one streaming pass, with memory bounded by `chunksize` rows."""
+        profile = self.profile(chunksize)
+        return profile.to_metadata(self.filename)
+
+    def profile(self, chunksize=100_000):
+        """Mergeable CSVProfile of this file (see csv_profiler.CSVProfile.merge)."""
+        self._download_from_azure()
+        dialect = sniff_dialect(self.local_temp_path)
+        try:
+            profile = profile_chunks(iter_arrow_chunks(self.local_temp_path, dialect))
+            engine = 'pyarrow'
+        except Exception as e:
+            # pyarrow missing, or a later block contradicts the types inferred from the first one
+            print(f"⚠️  pyarrow CSV reader unavailable for {self.filename} ({e}); using the C engine")
+            profile = profile_csv(self.local_temp_path, chunksize=chunksize, engine='c',
+                                  **dialect.read_csv_kwargs())
+            engine = 'c'
+        print(f"✅ Profiled {self.filename} ({engine}, separator '{dialect.sep}', "
+              f"header={'yes' if dialect.has_header else 'no'}, {dialect.encoding})")
+        # Use the local temp file to get the correct size
+        profile.file_size = os.path.getsize(self.local_temp_path)
+        return profile
+
+def frontend_metadata(full_meta, filename):
+    """The variables view the analysis modal shows, from extract_metadata() output."""
+    variables = {}
+    rows = full_meta.get('num_rows', 0)
+
+    for col_name, stats in full_meta.get('columns', {}).items():
+        variables[col_name] = {
+            'shape': (rows,),
+            'dtype': stats['detected_type']
         }
 
-        if col_type == 'numeric':
-            base.update({
-                'min': _safe_float(series.min()),
-                'max': _safe_float(series.max()),
-                'mean': _safe_float(series.mean()),
-                'median': _safe_float(series.median()),
-                'std': _safe_float(series.std()),
-                'percentile_25': _safe_float(series.quantile(0.25)),
-                'percentile_75': _safe_float(series.quantile(0.75)),
-            })
-
-        elif col_type == 'timestamp':
-            try:
-                dt = pd.to_datetime(series, unit='s' if series.dtype.kind in 'ifu' else None, errors='coerce')
-                base.update({
-                    'min': str(dt.min()),
-                    'max': str(dt.max()),
-                    'time_range_seconds': _safe_float((dt.max() - dt.min()).total_seconds()),
-                })
-            except Exception:
-                if pd.api.types.is_numeric_dtype(series):
-                    base.update({
-                        'min': _safe_float(series.min()),
-                        'max': _safe_float(series.max()),
-                        'time_range_seconds': _safe_float(series.max() - series.min()),
-                    })
-
-        elif col_type == 'categorical':
-            counts = series.value_counts().head(10)
-            base['top_values'] = [
-                {'value': _safe_serialize(v), 'count': int(c)}
-                for v, c in counts.items()
-            ]
-
-        elif col_type == 'boolean':
-            base['true_count'] = int(series.astype(str).str.lower().isin(['true', '1', 'yes']).sum())
-            base['false_count'] = int(series.astype(str).str.lower().isin(['false', '0', 'no']).sum())
-
-        elif col_type == 'text':
-            lengths = series.dropna().str.len()
-            base.update({
-                'avg_length': _safe_float(lengths.mean()),
-                'min_length': int(lengths.min()) if len(lengths) else 0,
-                'max_length': int(lengths.max()) if len(lengths) else 0,
-            })
-
-        return base
-
-    def extract_metadata(self):
-        if self.df is None:
-            self.read_file()
-
-        metadata = {
-            'filename': self.filename,
-            # Use the local temp file to get the correct size
-            'file_size': os.path.getsize(self.local_temp_path), 
-            'file_type': 'CSV',
-            'num_rows': int(len(self.df)),
-            'num_columns': int(len(self.df.columns)),
-            'columns': {}
+    return {
+        'filename': filename,
+        'file_type': 'CSV (Smart Analysis)',
+        'variables': variables
+    }
+
+class CSVDialect:
+    """What sniff_dialect learned about a file, convertible to reader options."""
+
+    def __init__(self, sep=',', quotechar='"', has_header=True, encoding='utf-8', num_fields=1):
+        self.sep = sep
+        self.quotechar = quotechar
+        self.has_header = has_header
+        self.encoding = encoding
+        self.num_fields = num_fields
+
+    def read_csv_kwargs(self):
+        return {
+            'sep': self.sep,
+            'quotechar': self.quotechar,
+            'header': 0 if self.has_header else None,
+            'encoding': self.encoding,
         }
 
-        type_counts = {}
-
-        for col in self.df.columns:
-            col_stats = self._stats_for_column(col)
-            metadata['columns'][col] = col_stats
-            t = col_stats['detected_type']
-            type_counts[t] = type_counts.get(t, 0) + 1
-
-        metadata['type_summary'] = type_counts
-        metadata['has_nulls'] = int(self.df.isnull().any().any())
-        metadata['total_null_cells'] = int(self.df.isnull().sum().sum())
-
-        return metadata
-
-def _safe_float(val):
+def sniff_dialect(path, sample_bytes=64 * 1024):
+    """
+    Delimiter, quoting, header row and encoding from the first `sample_bytes`
+    of the file, instead of trial-parsing the whole file once per separator.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(sample_bytes)
+    return sniff_sample(raw, truncated=len(raw) == sample_bytes)
+
+def sniff_sample(raw, truncated=True):
+    """sniff_dialect over bytes already in hand (e.g. the first chunks of an upload stream)."""
+    if truncated and b'\n' in raw:
+        raw = raw[:raw.rfind(b'\n') + 1]   # never sniff a half-read last line
+
+    encoding = _detect_encoding(raw)
+    text = raw.decode(encoding, errors='replace')
+    if not text.strip():
+        return CSVDialect(encoding=encoding)
+
+    sniffer = csv.Sniffer()
+    try:
+        d = sniffer.sniff(text, delimiters=',;\t|')
+        sep, quotechar = d.delimiter, d.quotechar or '"'
+    except csv.Error:
+        sep, quotechar = _most_consistent_delimiter(text), '"'
+
+    first_row = next(csv.reader(io.StringIO(text), delimiter=sep, quotechar=quotechar), [])
+    fields = [v for v in first_row if v.strip()]
+    numeric = [_is_number(v) for v in fields]
+    if fields and all(numeric):
+        has_header = False          # a numeric first row is data
+    elif not any(numeric):
+        has_header = True           # all labels
+    else:
+        try:
+            has_header = sniffer.has_header(text)
+        except csv.Error:
+            has_header = True
+
+    return CSVDialect(sep, quotechar, has_header, encoding, max(len(first_row), 1))
+
+def iter_arrow_chunks(path, dialect, block_size=16 * 1024 * 1024):
+    """Streams a CSV through pyarrow's multithreaded reader, one DataFrame per block."""
+    for batch in iter_arrow_batches(path, dialect, block_size):
+        yield batch.to_pandas()
+
+def iter_arrow_batches(path, dialect, block_size=16 * 1024 * 1024):
+    """iter_arrow_chunks without the pandas conversion: one pyarrow RecordBatch per block."""
+    import pyarrow.csv as pv
+
+    read_options = pv.ReadOptions(
+        block_size=block_size,
+        encoding=dialect.encoding,
+        column_names=None if dialect.has_header else [str(i) for i in range(dialect.num_fields)],
+    )
+    parse_options = pv.ParseOptions(delimiter=dialect.sep, quote_char=dialect.quotechar)
+    convert_options = pv.ConvertOptions(strings_can_be_null=True)
+    with pv.open_csv(path, read_options=read_options, parse_options=parse_options,
+                     convert_options=convert_options) as reader:
+        yield from reader
+
+def _detect_encoding(raw):
+    if raw.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        raw.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def _most_consistent_delimiter(text):
+    """Fallback when csv.Sniffer gives up: the delimiter with the same non-zero count on most lines."""
+    lines = [l for l in text.splitlines()[:50] if l.strip()]
+    best, best_score = ',', 0
+    for sep in [',', ';', '\t', '|']:
+        counts = [l.count(sep) for l in lines]
+        if not counts or counts[0] == 0:
+            continue
+        score = sum(c == counts[0] for c in counts)
+        if score > best_score:
+            best, best_score = sep, score
+    return best
+
+def _is_number(value):
     try:
-        f = float(val)
-        return None if (np.isnan(f) or np.isinf(f)) else round(f, 6)
-    except (TypeError, ValueError):
-        return None
-
-def _safe_serialize(val):
-    if isinstance(val, (np.integer,)):
-        return int(val)
-    if isinstance(val, (np.floating,)):
-        return None if np.isnan(val) else float(val)
-    if isinstance(val, (np.bool_,)):
-        return bool(val)
-    return str(val)
\ No newline at end of file
+        float(value)
+        return True
+    except ValueError:
+        return False
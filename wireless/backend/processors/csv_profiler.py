@@ -0,0 +1,458 @@
+"""
+Single-pass, bounded-memory CSV profiling.
+
+Each column keeps a set of small mergeable sketches that are updated once per
+chunk with vectorized pandas/NumPy operations:
+
+    RunningMoments  count / mean / variance / min / max   (exact, Chan et al. merge)
+    QuantileSketch  bottom-k random sample                 (exact up to k values)
+    DistinctSketch  exact hash set, then HyperLogLog       (exact up to 65k values)
+    HeavyHitters    Misra-Gries counters                   (exact up to k distinct)
+
+Any two profiles (chunks of one file, or different files) merge with
+CSVProfile.merge, so a dataset can be profiled file by file and combined.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+BOOL_TOKENS = {True, False, 0, 1, 'true', 'false', 'True', 'False', 'yes', 'no', 'Yes', 'No'}
+TIME_KEYWORDS = ['time', 'timestamp', 'date', 'epoch', 'unix', 'sec', 'ms', 'ns']
+
+class RunningMoments:
+    """Count, mean, M2 (for variance), min and max over a stream of floats."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        other = RunningMoments()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.count = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        # Sample standard deviation (ddof=1), matching pandas Series.std()
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+class QuantileSketch:
+    """
+    Bottom-k sample: every value gets a random priority and the k smallest
+    priorities are kept. The union of two bottom-k samples trimmed to k is
+    again a uniform sample, so the sketch merges exactly.
+    """
+
+    def __init__(self, k=50_000, seed=None):
+        self.k = k
+        self._rng = np.random.default_rng(seed)
+        self._priorities = np.empty(0)
+        self._values = np.empty(0)
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._add(self._rng.random(len(values)), values)
+
+    def merge(self, other):
+        self._add(other._priorities, other._values)
+
+    def _add(self, priorities, values):
+        self._priorities = np.concatenate([self._priorities, priorities])
+        self._values = np.concatenate([self._values, values])
+        if len(self._values) > self.k:
+            keep = np.argpartition(self._priorities, self.k)[:self.k]
+            self._priorities = self._priorities[keep]
+            self._values = self._values[keep]
+
+    def quantile(self, q):
+        return float(np.quantile(self._values, q)) if len(self._values) else np.nan
+
+class DistinctSketch:
+    """
+    Distinct count over 64-bit value hashes. Exact while fewer than
+    exact_limit distinct hashes have been seen, HyperLogLog (2^p registers)
+    after that.
+    """
+
+    def __init__(self, p=14, exact_limit=65_536):
+        self.p = p
+        self.exact_limit = exact_limit
+        self._exact = np.empty(0, dtype='uint64')
+        self._registers = np.zeros(1 << p, dtype='uint8')
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        self._add(pd.util.hash_pandas_object(values, index=False).to_numpy(dtype='uint64'))
+
+    def _add(self, hashes):
+        idx = (hashes >> np.uint64(64 - self.p)).astype('int64')
+        rest = hashes << np.uint64(self.p)
+        # Leading zeros of the remaining bits, from their top 32 bits (exact in float64)
+        top = (rest >> np.uint64(32)).astype('float64')
+        rank = np.where(top > 0, 32 - np.floor(np.log2(np.maximum(top, 1))), 33).astype('uint8')
+        np.maximum.at(self._registers, idx, rank)
+        if self._exact is not None:
+            self._exact = np.union1d(self._exact, hashes)
+            if len(self._exact) > self.exact_limit:
+                self._exact = None
+
+    def merge(self, other):
+        np.maximum(self._registers, other._registers, out=self._registers)
+        if self._exact is not None and other._exact is not None:
+            self._exact = np.union1d(self._exact, other._exact)
+            if len(self._exact) > self.exact_limit:
+                self._exact = None
+        else:
+            self._exact = None
+
+    def estimate(self):
+        if self._exact is not None:
+            return int(len(self._exact))
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self._registers.astype('float64')))
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+class HeavyHitters:
+    """
+    Misra-Gries summary with k counters. Counts are exact while a column has
+    at most k distinct values; beyond that they are lower bounds that are off
+    by at most `error`.
+    """
+
+    def __init__(self, k=1000):
+        self.k = k
+        self.error = 0
+        self.counts = pd.Series(dtype='int64')
+
+    def update(self, values):
+        if len(values):
+            self._add(values.value_counts())
+
+    def merge(self, other):
+        self.error += other.error
+        self._add(other.counts)
+
+    def _add(self, counts):
+        combined = self.counts.add(counts, fill_value=0).astype('int64')
+        if len(combined) > self.k:
+            cut = int(combined.nlargest(self.k + 1).iloc[-1])
+            self.error += cut
+            combined = combined[combined > cut] - cut
+        self.counts = combined
+
+    def top(self, n=10):
+        return self.counts.nlargest(n)
+
+class ColumnProfile:
+    """Streaming state for one column; finalized into the extract_metadata() shape."""
+
+    def __init__(self, name):
+        self.name = name
+        self.kind = None            # 'numeric' or 'object', fixed by the first non-empty chunk
+        self.dtypes = set()
+        self.total = 0
+        self.nulls = 0
+        self.samples = []
+        self.distinct = DistinctSketch()
+        # Boolean candidate
+        self.bool_like = True
+        self.true_count = 0
+        self.false_count = 0
+        # Numeric
+        self.moments = RunningMoments()
+        self.quantiles = QuantileSketch()
+        self.monotonic = True
+        self.first_value = None
+        self.last_value = None
+        # Object
+        self.heavy = HeavyHitters()
+        self.lengths = RunningMoments()
+        self.datetime_like = None   # decided on the first 20 non-null strings
+        self.dt_format = None       # guessed from the first one; 'mixed' parses element by element
+        self.dt_min = pd.NaT
+        self.dt_max = pd.NaT
+
+    def update(self, series):
+        self.total += len(series)
+        self.dtypes.add(str(series.dtype))
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if len(values) == 0:
+            return
+
+        if self.kind is None:
+            self.kind = 'numeric' if pd.api.types.is_numeric_dtype(values) else 'object'
+        if len(self.samples) < 5:
+            self.samples.extend(_safe_serialize(v) for v in values.head(5 - len(self.samples)).tolist())
+
+        if self.bool_like:
+            self.bool_like = bool(values.isin(BOOL_TOKENS).all())
+            if self.bool_like:
+                lowered = values.astype(str).str.lower()
+                self.true_count += int(lowered.isin(['true', '1', 'yes']).sum())
+                self.false_count += int(lowered.isin(['false', '0', 'no']).sum())
+
+        if self.kind == 'numeric':
+            self._update_numeric(pd.to_numeric(values, errors='coerce').astype('float64').dropna())
+        else:
+            self._update_object(values.astype(str))
+
+    def _update_numeric(self, values):
+        if len(values) == 0:
+            return
+        arr = values.to_numpy()
+        self.distinct.update(values)
+        self.moments.update(arr)
+        self.quantiles.update(arr)
+        if self.monotonic:
+            in_order = self.last_value is None or arr[0] >= self.last_value
+            self.monotonic = in_order and bool(values.is_monotonic_increasing)
+        if self.first_value is None:
+            self.first_value = float(arr[0])
+        self.last_value = float(arr[-1])
+
+    def _update_object(self, values):
+        self.distinct.update(values)
+        self.heavy.update(values)
+        self.lengths.update(values.str.len().to_numpy())
+        if self.datetime_like is None:
+            # An explicit format: without one pandas warns that it could not infer it.
+            # The first value's format parses vectorized; 'mixed' covers columns that vary.
+            self.datetime_like = False
+            for fmt in dict.fromkeys([guess_datetime_format(str(values.iloc[0])) or 'mixed', 'mixed']):
+                try:
+                    pd.to_datetime(values.head(20), format=fmt)
+                except (ValueError, TypeError):
+                    continue
+                self.datetime_like, self.dt_format = True, fmt
+                break
+        if self.datetime_like:
+            parsed = pd.to_datetime(values, errors='coerce', format=self.dt_format).dropna()
+            if len(parsed):
+                self.dt_min = parsed.min() if pd.isna(self.dt_min) else min(self.dt_min, parsed.min())
+                self.dt_max = parsed.max() if pd.isna(self.dt_max) else max(self.dt_max, parsed.max())
+
+    def merge(self, other):
+        """Folds in a profile of the same column from a later chunk or file."""
+        self.kind = self.kind or other.kind
+        self.dtypes |= other.dtypes
+        self.total += other.total
+        self.nulls += other.nulls
+        self.samples = (self.samples + other.samples)[:5]
+        self.distinct.merge(other.distinct)
+        self.bool_like = self.bool_like and other.bool_like
+        self.true_count += other.true_count
+        self.false_count += other.false_count
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        in_order = (self.last_value is None or other.first_value is None
+                    or other.first_value >= self.last_value)
+        self.monotonic = self.monotonic and other.monotonic and in_order
+        if self.first_value is None:
+            self.first_value = other.first_value
+        if other.last_value is not None:
+            self.last_value = other.last_value
+        self.heavy.merge(other.heavy)
+        self.lengths.merge(other.lengths)
+        if self.datetime_like is None:
+            self.datetime_like = other.datetime_like
+            self.dt_format = other.dt_format
+        for ts in (other.dt_min, other.dt_max):
+            if not pd.isna(ts):
+                self.dt_min = ts if pd.isna(self.dt_min) else min(self.dt_min, ts)
+                self.dt_max = ts if pd.isna(self.dt_max) else max(self.dt_max, ts)
+
+    @property
+    def dtype(self):
+        if len(self.dtypes) == 1:
+            return next(iter(self.dtypes))
+        try:
+            return str(np.result_type(*[np.dtype(d) for d in self.dtypes]))
+        except TypeError:
+            return 'object'
+
+    def detected_type(self):
+        unique = self.distinct.estimate()
+        if self.bool_like and self.kind is not None and unique <= 2:
+            return 'boolean'
+        if self.kind in ('numeric', None):
+            if any(kw in str(self.name).lower() for kw in TIME_KEYWORDS):
+                return 'timestamp'
+            if self.moments.count and self.moments.min > 1e9 and self.monotonic:
+                return 'timestamp'
+            return 'numeric'
+        if self.datetime_like:
+            return 'timestamp'
+        unique_ratio = unique / max(self.total, 1)
+        if unique_ratio < 0.05 or unique <= 50:
+            return 'categorical'
+        return 'text'
+
+    def to_dict(self):
+        col_type = self.detected_type()
+        base = {
+            'column_name': self.name,
+            'detected_type': col_type,
+            'dtype': self.dtype,
+            'total_values': int(self.total),
+            'null_count': int(self.nulls),
+            'non_null_count': int(self.total - self.nulls),
+            # HLL estimates can overshoot; a column can't have more distinct values than values
+            'unique_values': int(min(self.distinct.estimate(), self.total - self.nulls)),
+            'sample_values': self.samples,
+        }
+
+        if col_type == 'numeric':
+            base.update({
+                'min': _safe_float(self.moments.min),
+                'max': _safe_float(self.moments.max),
+                'mean': _safe_float(self.moments.mean if self.moments.count else np.nan),
+                'median': _safe_float(self.quantiles.quantile(0.5)),
+                'std': _safe_float(self.moments.std),
+                'percentile_25': _safe_float(self.quantiles.quantile(0.25)),
+                'percentile_75': _safe_float(self.quantiles.quantile(0.75)),
+            })
+
+        elif col_type == 'timestamp':
+            if self.kind == 'object':
+                lo, hi = self.dt_min, self.dt_max
+            else:
+                lo = pd.to_datetime(self.moments.min, unit='s', errors='coerce')
+                hi = pd.to_datetime(self.moments.max, unit='s', errors='coerce')
+            base.update({
+                'min': str(lo),
+                'max': str(hi),
+                'time_range_seconds': _safe_float((hi - lo).total_seconds()) if not (pd.isna(lo) or pd.isna(hi)) else None,
+            })
+
+        elif col_type == 'categorical':
+            base['top_values'] = [
+                {'value': _safe_serialize(v), 'count': int(c)}
+                for v, c in self.heavy.top(10).items()
+            ]
+
+        elif col_type == 'boolean':
+            base['true_count'] = int(self.true_count)
+            base['false_count'] = int(self.false_count)
+
+        elif col_type == 'text':
+            base.update({
+                'avg_length': _safe_float(self.lengths.mean if self.lengths.count else np.nan),
+                'min_length': int(self.lengths.min) if self.lengths.count else 0,
+                'max_length': int(self.lengths.max) if self.lengths.count else 0,
+            })
+
+        return base
+
+class CSVProfile:
+    """Mergeable profile of one or more CSV files."""
+
+    def __init__(self):
+        self.columns = {}
+        self.num_rows = 0
+        self.file_size = 0
+        self.file_count = 0
+
+    def update(self, chunk):
+        self.num_rows += len(chunk)
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnProfile(col)
+            self.columns[col].update(chunk[col])
+
+    def merge(self, other):
+        self.num_rows += other.num_rows
+        self.file_size += other.file_size
+        self.file_count += other.file_count
+        for name, col in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(col)
+            else:
+                self.columns[name] = col
+        return self
+
+    def to_metadata(self, filename):
+        metadata = {
+            'filename': filename,
+            'file_size': int(self.file_size),
+            'file_type': 'CSV',
+            'num_rows': int(self.num_rows),
+            'num_columns': int(len(self.columns)),
+            'columns': {}
+        }
+
+        type_counts = {}
+        for name, col in self.columns.items():
+            col_stats = col.to_dict()
+            metadata['columns'][name] = col_stats
+            t = col_stats['detected_type']
+            type_counts[t] = type_counts.get(t, 0) + 1
+
+        total_nulls = sum(col.nulls for col in self.columns.values())
+        metadata['type_summary'] = type_counts
+        metadata['has_nulls'] = int(total_nulls > 0)
+        metadata['total_null_cells'] = int(total_nulls)
+        return metadata
+
+def profile_chunks(chunks):
+    """Profiles any iterable of DataFrames (one file's chunks) in a single pass."""
+    profile = CSVProfile()
+    for chunk in chunks:
+        profile.update(chunk)
+    profile.file_count = 1
+    return profile
+
+def profile_csv(path, chunksize=100_000, **read_kwargs):
+    """Profiles a CSV in one streaming pass; memory is bounded by `chunksize` rows."""
+    with pd.read_csv(path, chunksize=chunksize, **read_kwargs) as reader:
+        return profile_chunks(reader)
+
+def _safe_float(val):
+    try:
+        f = float(val)
+        return None if (np.isnan(f) or np.isinf(f)) else round(f, 6)
+    except (TypeError, ValueError):
+        return None
+
+def _safe_serialize(val):
+    if isinstance(val, (np.integer,)):
+        return int(val)
+    if isinstance(val, (np.floating,)):
+        return None if np.isnan(val) else float(val)
+    if isinstance(val, (np.bool_,)):
+        return bool(val)
+    return str(val)
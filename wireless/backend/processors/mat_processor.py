@@ -1,95 +1,286 @@
 import os
-import tempfile
+import zlib
+import struct
 import numpy as np
-from azure.storage.blob import BlobServiceClient
 from dotenv import load_dotenv
+from backend.utils.blob_io import BlobFile, get_blob_client
+from backend.processors.array_stats import array_stats, dataset_stats, is_measurement_dataset
 
 load_dotenv()
 
+# Working memory for per-variable statistics (one chunk-aligned block plus its temporaries)
+STATS_MEMORY_BUDGET = int(os.getenv('MAT_STATS_BUDGET_MB', '256')) * 1024 * 1024
+
+# Ranged-read block size when statistics stream every data chunk from Azure
+STATS_READ_BLOCK = 4 * 1024 * 1024
+
 class WirelessDataProcessor:
-    def __init__(self, blob_path):
+    # Bump whenever get_metadata() output changes; cached analyses are keyed on it
+    PROCESSOR_VERSION = 'mat-4'   # v5 / h5py header-only metadata (v5 complex arrays as complex dtypes)
+    STATS_VERSION     = 'mat-5'   # get_metadata(stats=True): + streaming per-variable statistics
+
+    def __init__(self, blob_path, memory_budget=None):
         self.blob_path = blob_path
         self.filename = os.path.basename(blob_path)
-        self.local_temp_path = None
-
-    def _download_from_azure(self):
-        """Pulls the file from Azure to a temporary location for analysis."""
-        if not self.local_temp_path:
-            bsc = BlobServiceClient.from_connection_string(os.getenv('AZURE_STORAGE_CONNECTION_STRING'))
-            container_name = os.getenv('BRONZE_CONTAINER_NAME', 'bronze-layer')
-            blob_client = bsc.get_blob_client(container=container_name, blob=self.blob_path)
-            
-            temp_dir = tempfile.gettempdir()
-            self.local_temp_path = os.path.join(temp_dir, self.filename)
-            
-            print(f"📥 Downloading {self.filename} from Azure for metadata extraction...")
-            with open(self.local_temp_path, "wb") as f:
-                f.write(blob_client.download_blob().readall())
-
-    def __del__(self):
-        """Cleans up the temp file to save your Mac's hard drive space."""
-        if self.local_temp_path and os.path.exists(self.local_temp_path):
-            os.remove(self.local_temp_path)
-            print(f"🧹 Cleaned up temp file: {self.local_temp_path}")
-
-    def get_metadata(self):
+        self.memory_budget = memory_budget or STATS_MEMORY_BUDGET
+        self.local_path = None
+
+    @classmethod
+    def from_local(cls, path, memory_budget=None):
+        """Processor over a local file (batch jobs) instead of a blob."""
+        processor = cls(path, memory_budget)
+        processor.local_path = path
+        return processor
+
+    def _open(self, stats=False):
+        """
+        Seekable handle on the file without downloading it: a local file is
+        opened directly, a blob through a ranged-read BlobFile. Headers take a
+        few small reads; statistics read in larger blocks, since they touch
+        every data chunk once.
+        """
+        if self.local_path:
+            return open(self.local_path, 'rb')
+        if stats:
+            return BlobFile(get_blob_client(self.blob_path), block_size=STATS_READ_BLOCK, cache_blocks=16)
+        return BlobFile(get_blob_client(self.blob_path))
+
+    def get_metadata(self, stats=False):
+        """
+        Variable names, shapes and dtypes from the MAT/HDF5 headers. With
+        stats=True every numeric variable also gets streaming statistics,
+        which reads the whole workspace (see STATS_VERSION).
+        """
         try:
-            self._download_from_azure()
+            f = self._open(stats)
         except Exception as e:
-            return {'success': False, 'error': f"Azure Download Failed: {str(e)}"}
+            return {'success': False, 'error': f"Azure Read Failed: {str(e)}"}
 
         variables = {}
-        skip_keys = {'__header__', '__version__', '__globals__'}
 
-        # ── 1. Try Standard v5 MAT files (scipy) ──
-        try:
-            import scipy.io as sio
-            mat_data = sio.loadmat(self.local_temp_path)
-            
-            for key, value in mat_data.items():
-                if key in skip_keys: continue
-                
-                # key is the Variable/Column Name
-                if isinstance(value, np.ndarray):
-                    variables[key] = {
-                        'shape': list(value.shape),
-                        'dtype': str(value.dtype)
-                    }
-                else:
+        with f:
+            # ── 1. Try Standard v5 MAT files (scipy: variable headers, then stats per variable if asked) ──
+            try:
+                for key, shape, mat_class, is_complex in mat5_whos(f):
+                    if key in MAT_SKIP_KEYS: continue
+
+                    # key is the Variable/Column Name
                     variables[key] = {
-                        'shape': [], 
-                        'dtype': type(value).__name__
+                        'shape': list(shape),
+                        'dtype': mat5_dtype(mat_class, is_complex)
                     }
+                if stats:
+                    mat5_variable_stats(f, variables, self.memory_budget)
 
-        # ── 2. Try v7.3 HDF5 MAT files (h5py) ──
-        except Exception:
-            try:
-                import h5py
-                with h5py.File(self.local_temp_path, 'r') as f:
-                    for key in f.keys():
-                        if key in skip_keys: continue
-                        dataset = f[key]
-                        
-                        # key is the Variable/Column Name
-                        if isinstance(dataset, h5py.Dataset):
-                            variables[key] = {
-                                'shape': list(dataset.shape),
-                                'dtype': str(dataset.dtype)
-                            }
-                        else:
-                            variables[key] = {
-                                'shape': [], 
-                                'dtype': 'HDF5 Group'
-                            }
-            except ImportError:
-                return {'success': False, 'error': 'h5py not installed. Run: pip install h5py'}
+            # ── 2. Try v7.3 HDF5 MAT files (h5py: object headers, then chunk-by-chunk stats if asked) ──
+            except Exception:
+                variables = {}
+                try:
+                    import h5py
+                    f.seek(0)
+                    with h5py.File(f, 'r') as h5:
+                        variables = hdf5_variables(h5, stats_budget=self.memory_budget if stats else None)
+                except ImportError:
+                    return {'success': False, 'error': 'h5py not installed. Run: pip install h5py'}
+
+            if isinstance(f, BlobFile):
+                print(f"📥 Read {f.bytes_fetched / 1024:.0f} KB of {f.size / (1024 * 1024):.1f} MB "
+                      f"from Azure in {f.requests} range requests for {self.filename}")
+            file_size = f.size if isinstance(f, BlobFile) else os.fstat(f.fileno()).st_size
 
         # ── Return Final Schema Dictionary ──
-        file_size_mb = os.path.getsize(self.local_temp_path) / (1024 * 1024)
-        return {
-            'success': True,
-            'filename': self.filename,
-            'file_type': 'MATLAB Workspace',
-            'file_size_mb': round(file_size_mb, 4),
-            'variables': variables
-        }
\ No newline at end of file
+        return mat_metadata(self.filename, variables, file_size)
+
+def hdf5_variables(h5, stats_budget=None):
+    """
+    Top-level variables of an open v7.3 MAT / HDF5 file. Object headers
+    only, unless stats_budget is given: then each numeric dataset also gets
+    streaming statistics, read chunk by chunk within that many bytes.
+    """
+    import h5py
+    variables = {}
+    for key in h5.keys():
+        if key in MAT_SKIP_KEYS: continue
+        dataset = h5[key]
+
+        # key is the Variable/Column Name
+        if isinstance(dataset, h5py.Dataset):
+            variables[key] = {
+                'shape': list(dataset.shape),
+                'dtype': str(dataset.dtype)
+            }
+            if stats_budget:
+                stats = dataset_stats(dataset, stats_budget)
+                if stats is not None:
+                    variables[key]['stats'] = stats
+        else:
+            variables[key] = {
+                'shape': [],
+                'dtype': 'HDF5 Group'
+            }
+    return variables
+
+def mat5_whos(f):
+    """
+    scipy.io.whosmat plus complexity: (name, shape, mat_class, is_complex)
+    per variable of an open v4 / v5 MAT file. whosmat reports a complex array
+    by its class alone ('double'). Raises, like whosmat, for v7.3 (HDF5) files.
+    """
+    import scipy.io as sio
+    from scipy.io.matlab import matfile_version
+    f.seek(0)
+    variables = sio.whosmat(f)
+    f.seek(0)
+    if matfile_version(f)[0] == 1:
+        complex_flags = mat5_complex_flags(f)
+    else:
+        complex_flags = [False] * len(variables)   # v4
+    return [(name, shape, mat_class, is_complex)
+            for (name, shape, mat_class), is_complex in zip(variables, complex_flags)]
+
+def mat5_complex_flags(f):
+    """
+    The complex bit of each v5 variable's array flags, in file order: one
+    small read per variable (-v7 variables are compressed, so a few hundred
+    bytes are inflated to reach the flags).
+    """
+    f.seek(126)
+    order = '<' if f.read(2) == b'IM' else '>'
+    flags, position = [], 128
+    while True:
+        f.seek(position)
+        tag = f.read(8)
+        if len(tag) < 8:
+            return flags
+        mdtype, nbytes = struct.unpack(order + 'II', tag)
+        if mdtype == MI_COMPRESSED:
+            inflate, head, remaining = zlib.decompressobj(), b'', nbytes
+            while len(head) < 20 and remaining > 0:
+                piece = f.read(min(512, remaining))
+                if not piece:
+                    break
+                remaining -= len(piece)
+                head += inflate.decompress(piece, 20 - len(head))
+            head = head[8:]
+        else:
+            head = f.read(min(12, nbytes))
+        # Array flags subelement: 8-byte tag, then the flags word (bit 11: complex)
+        flags.append(len(head) >= 12 and bool(struct.unpack(order + 'I', head[8:12])[0] & 0x0800))
+        position += 8 + nbytes
+
+def mat5_dtype(mat_class, is_complex=False):
+    """numpy dtype name loadmat returns for a v5 variable (complex singles load as complex64, the rest as complex128)."""
+    dtype = MAT_CLASS_DTYPES.get(mat_class, mat_class)
+    if is_complex and dtype in MAT_NUMERIC_DTYPES:
+        return 'complex64' if dtype == 'float32' else 'complex128'
+    return dtype
+
+def mat5_variable_stats(f, variables, memory_budget):
+    """
+    v5 MAT variables have no chunks: scipy can only load a variable whole, so
+    stats are computed for variables that fit the budget, one at a time.
+    """
+    import scipy.io as sio
+    for key, info in variables.items():
+        itemsize = np.dtype(info['dtype']).itemsize if info['dtype'] in MAT_NUMERIC_DTYPES else None
+        if itemsize is None:
+            continue
+        nbytes = int(np.prod(info['shape'], dtype=np.int64)) * itemsize
+        if nbytes * 2 > memory_budget:
+            info['stats'] = {'skipped': f"{nbytes / (1024 * 1024):.1f} MB v5 variable exceeds the stats memory budget"}
+            continue
+        try:
+            f.seek(0)
+            value = sio.loadmat(f, variable_names=[key])[key]
+            stats = array_stats(value, memory_budget)
+            del value
+        except Exception as e:
+            stats = {'error': str(e)}
+        if stats is not None:
+            info['stats'] = stats
+
+def mat_arrays(f, memory_budget, load_budget=None):
+    """
+    The numeric variables of an open MAT / HDF5 file, for the Silver array
+    store: yields (name, shape, dtype, read_block, attrs), where
+    read_block(selection) returns the values for a tuple of slices.
+
+    v7.3 variables are read chunk by chunk and presented in MATLAB's
+    dimension order (HDF5 stores them transposed); plain HDF5 keeps its own
+    order. v5 variables (MATLAB's default -v7 format) have no chunks and
+    load whole, so they get their own load_budget (default memory_budget):
+    a variable is converted when twice its size fits, and otherwise yielded
+    with read_block None and the reason in attrs['skipped'].
+    """
+    load_budget = load_budget or memory_budget
+    try:
+        variables = [v for v in mat5_whos(f) if v[0] not in MAT_SKIP_KEYS]
+    except Exception:
+        variables = None
+
+    if variables is not None:
+        import scipy.io as sio
+        for key, shape, mat_class, is_complex in variables:
+            dtype = mat5_dtype(mat_class, is_complex)
+            if dtype not in MAT_NUMERIC_DTYPES:
+                continue
+            attrs  = {'matlab_class': mat_class, 'source_format': 'mat5'}
+            nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            if nbytes * 2 > load_budget:
+                attrs['skipped'] = (f"{nbytes / (1024 * 1024):.1f} MB v5 variable exceeds the "
+                                    f"{load_budget / (1024 * 1024):.0f} MB v5 load budget")
+                yield key, list(shape), dtype, None, attrs
+                continue
+            f.seek(0)
+            value = sio.loadmat(f, variable_names=[key])[key]
+            if value.size == 0 or not (np.issubdtype(value.dtype, np.number) or value.dtype == bool):
+                continue
+            yield key, list(value.shape), value.dtype, value.__getitem__, attrs
+            del value
+        return
+
+    import h5py
+    f.seek(0)
+    # A chunk cache as large as the budget allows: store chunks rarely line up with HDF5 chunks
+    with h5py.File(f, 'r', rdcc_nbytes=max(memory_budget // 4, 1024 * 1024), rdcc_nslots=100003) as h5:
+        for key in h5.keys():
+            dataset = h5[key]
+            if key in MAT_SKIP_KEYS or not isinstance(dataset, h5py.Dataset) or dataset.ndim == 0:
+                continue
+            if not is_measurement_dataset(dataset):
+                continue
+            mat_class = dataset.attrs.get('MATLAB_class')
+            if mat_class is not None:
+                # MATLAB writes column-major arrays, which HDF5 sees with the axes reversed
+                attrs = {'matlab_class': mat_class.decode(), 'source_format': 'mat73'}
+                yield (key, list(dataset.shape[::-1]), dataset.dtype,
+                       lambda sel, ds=dataset: ds[sel[::-1]].T, attrs)
+            else:
+                yield key, list(dataset.shape), dataset.dtype, dataset.__getitem__, {'source_format': 'hdf5'}
+
+def mat_metadata(filename, variables, file_size):
+    file_size_mb = file_size / (1024 * 1024)
+    return {
+        'success': True,
+        'filename': filename,
+        'file_type': 'MATLAB Workspace',
+        'file_size_mb': round(file_size_mb, 4),
+        'variables': variables
+    }
+
+MAT_SKIP_KEYS = {'__header__', '__version__', '__globals__'}
+
+# v5 data element type of a zlib-compressed variable (MATLAB's default -v7 format)
+MI_COMPRESSED = 15
+
+# MATLAB classes reported by scipy.io.whosmat -> numpy dtype names
+MAT_CLASS_DTYPES = {
+    'double': 'float64', 'single': 'float32',
+    'int8': 'int8', 'int16': 'int16', 'int32': 'int32', 'int64': 'int64',
+    'uint8': 'uint8', 'uint16': 'uint16', 'uint32': 'uint32', 'uint64': 'uint64',
+    'logical': 'bool', 'char': '<U', 'cell': 'object', 'struct': 'object',
+}
+
+# v5 dtypes whose values get statistics (complex ones come from mat5_dtype; ArrayStats handles them)
+MAT_NUMERIC_DTYPES = {'float64', 'float32', 'int8', 'int16', 'int32', 'int64',
+                      'uint8', 'uint16', 'uint32', 'uint64', 'bool', 'complex64', 'complex128'}
@@ -0,0 +1,358 @@
+import os
+import time
+import struct
+import numpy as np
+from backend.utils import lzf_codec
+
+# (TYPE, SIZE) -> little-endian NumPy type, per the PCD v0.7 spec
+PCD_NUMPY_TYPES = {
+    ('F', 4): '<f4', ('F', 8): '<f8',
+    ('I', 1): 'i1',  ('I', 2): '<i2', ('I', 4): '<i4', ('I', 8): '<i8',
+    ('U', 1): 'u1',  ('U', 2): '<u2', ('U', 4): '<u4', ('U', 8): '<u8',
+}
+
+# DATA encodings whose points can be read (ascii is not)
+POINT_FORMATS = ('binary', 'binary_compressed')
+
+# binary_compressed payloads start with the LZF block's compressed and uncompressed sizes
+COMPRESSED_PREFIX = struct.Struct('<II')
+
+# The LZF block only decodes whole, so this caps the decoded buffer a job holds in memory
+MAX_DECODED_BYTES = int(os.getenv('PCD_DECODE_MAX_MB', '1024')) * 1024 * 1024
+
+# Names LiDAR drivers use for return strength, in order of preference
+INTENSITY_FIELDS = ('intensity', 'i', 'reflectivity', 'reflectance')
+
+def pcd_dtype(header_data):
+    """
+    Structured dtype for one point record from FIELDS / SIZE / TYPE / COUNT.
+    COUNT > 1 becomes a sub-array; repeated '_' padding fields get unique names.
+    """
+    fields = header_data.get('FIELDS', [])
+    sizes  = header_data.get('SIZE', [])
+    types  = header_data.get('TYPE', [])
+    counts = header_data.get('COUNT') or ['1'] * len(fields)
+    if not (len(fields) == len(sizes) == len(types) == len(counts)):
+        raise ValueError("FIELDS, SIZE, TYPE and COUNT have different lengths")
+
+    spec, seen = [], {}
+    for name, size, kind, count in zip(fields, sizes, types, counts):
+        np_type = PCD_NUMPY_TYPES.get((kind.upper(), int(size)))
+        if np_type is None:
+            raise ValueError(f"Unsupported PCD field type {kind}{size} for '{name}'")
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}{seen[name]}"
+        else:
+            seen[name] = 0
+        count = int(count)
+        spec.append((name, np_type) if count == 1 else (name, np_type, (count,)))
+    return np.dtype(spec)
+
+def point_count(header_data):
+    if header_data.get('POINTS'):
+        return int(header_data['POINTS'])
+    return int(header_data.get('WIDTH', 0)) * int(header_data.get('HEIGHT', 1))
+
+def map_points(path, header_data, data_offset):
+    """
+    The point records of a `DATA binary` PCD as a read-only memmap: no bytes
+    are read until a field is touched, and field views (points['x']) are
+    strided views of the mapping, not copies.
+    """
+    data_format = header_data.get('DATA', '').lower()
+    if data_format != 'binary':
+        raise ValueError(f"map_points needs DATA binary, got DATA {data_format or '?'}")
+    dtype = pcd_dtype(header_data)
+    count = point_count(header_data)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(count,))
+
+def iter_chunks(points, chunk_points=4_000_000):
+    """Slices of a (memory-mapped) point array; each is a view, so memory stays at one chunk's temporaries."""
+    for start in range(0, len(points), chunk_points):
+        yield points[start:start + chunk_points]
+
+def check_compressed_sizes(prefix, header_data, max_decoded_bytes=None):
+    """
+    (compressed_size, uncompressed_size) from a binary_compressed size prefix,
+    checked against the header and against max_decoded_bytes (default
+    MAX_DECODED_BYTES) before anything is read or decoded.
+    """
+    if len(prefix) < COMPRESSED_PREFIX.size:
+        raise ValueError("binary_compressed payload is missing its size prefix")
+    compressed_size, uncompressed_size = COMPRESSED_PREFIX.unpack_from(prefix)
+    expected = point_count(header_data) * pcd_dtype(header_data).itemsize
+    if uncompressed_size != expected:
+        raise ValueError(f"binary_compressed payload holds {uncompressed_size} bytes, "
+                         f"header describes {expected}")
+    limit = max_decoded_bytes or MAX_DECODED_BYTES
+    if uncompressed_size > limit:
+        raise ValueError(f"binary_compressed payload decodes to {uncompressed_size / (1024 * 1024):.0f} MB, "
+                         f"over the {limit / (1024 * 1024):.0f} MB decode limit")
+    return compressed_size, uncompressed_size
+
+def decode_compressed(payload, header_data, max_decoded_bytes=None):
+    """
+    Decompresses a `DATA binary_compressed` payload (the bytes after the DATA
+    line). The result is column-major: every point's first field, then every
+    point's second field, and so on.
+    """
+    compressed_size, uncompressed_size = check_compressed_sizes(payload, header_data, max_decoded_bytes)
+    block = memoryview(payload)[COMPRESSED_PREFIX.size:COMPRESSED_PREFIX.size + compressed_size]
+    if len(block) < compressed_size:
+        raise ValueError(f"binary_compressed payload is {compressed_size - len(block)} bytes short")
+    return lzf_codec.decompress(block, uncompressed_size)
+
+class ColumnarPoints:
+    """
+    A decompressed, column-major point buffer that slices like a structured
+    array: points[a:b] transposes just those records, so iter_chunks() only
+    ever holds one interleaved chunk.
+    """
+
+    def __init__(self, buffer, dtype, count):
+        self.buffer  = buffer
+        self.dtype   = dtype
+        self.count   = count
+        self.columns = []
+        offset = 0
+        for name in dtype.names:
+            field = dtype.fields[name][0]
+            self.columns.append((name, field, offset))
+            offset += field.itemsize * count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start, stop, step = index.indices(self.count)
+        if step != 1:
+            raise IndexError("ColumnarPoints only supports contiguous slices")
+        n = max(0, stop - start)
+        chunk = np.empty(n, dtype=self.dtype)
+        for name, field, base in self.columns:
+            values = np.frombuffer(self.buffer, dtype=field.base,
+                                   count=n * (field.itemsize // field.base.itemsize),
+                                   offset=base + start * field.itemsize)
+            chunk[name] = values.reshape((n,) + field.shape)
+        return chunk
+
+def iter_columnar_chunks(buffer, dtype, count, chunk_points=4_000_000):
+    return iter_chunks(ColumnarPoints(buffer, dtype, count), chunk_points)
+
+def read_compressed(path, header_data, data_offset):
+    """
+    Reads and decompresses the binary_compressed payload of a local PCD file.
+    The size prefix is checked first, so an oversized payload is refused
+    before its bytes are read.
+    """
+    with open(path, 'rb') as f:
+        f.seek(data_offset)
+        compressed_size, _ = check_compressed_sizes(f.read(COMPRESSED_PREFIX.size), header_data)
+        f.seek(data_offset)
+        return decode_compressed(f.read(COMPRESSED_PREFIX.size + compressed_size), header_data)
+
+def open_points(path, header_data, data_offset):
+    """
+    The points of a local PCD file as something iter_chunks() can slice,
+    whatever the DATA encoding: a memmap for `binary`, a ColumnarPoints over
+    the decompressed payload for `binary_compressed`. Slicing it again is
+    free, so several passes (statistics, then downsampling) read it once.
+    """
+    data_format = header_data.get('DATA', '').lower()
+    if data_format == 'binary':
+        return map_points(path, header_data, data_offset)
+    if data_format == 'binary_compressed':
+        buffer = read_compressed(path, header_data, data_offset)
+        return ColumnarPoints(buffer, pcd_dtype(header_data), point_count(header_data))
+    raise ValueError(f"No point reader for DATA {data_format or '?'}")
+
+def iter_pcd_chunks(path, header_data, data_offset, chunk_points=4_000_000):
+    """Structured point chunks from a local PCD file; statistics and downsampling both consume this."""
+    yield from iter_chunks(open_points(path, header_data, data_offset), chunk_points)
+
+class PointStats:
+    """
+    Single-pass point cloud statistics over structured-array chunks: bounding
+    box, per-field min / max / mean, an intensity histogram and density.
+    Every update is a handful of whole-array NumPy reductions.
+    """
+
+    def __init__(self, dtype, histogram_bins=64):
+        self.dtype          = dtype
+        self.histogram_bins = histogram_bins
+        self.points         = 0
+        self.valid_points   = 0
+        self.xyz            = all(axis in dtype.names for axis in ('x', 'y', 'z'))
+        self.bbox_min       = np.full(3, np.inf)
+        self.bbox_max       = np.full(3, -np.inf)
+        self.intensity      = next((f for f in INTENSITY_FIELDS if f in dtype.names), None)
+        self.histogram      = _StreamingHistogram() if self.intensity else None
+        self.fields         = {
+            name: {'min': np.inf, 'max': -np.inf, 'sum': 0.0, 'count': 0, 'nan_count': 0}
+            for name in dtype.names if not name.startswith('_')
+        }
+        self.seconds        = 0.0
+
+    def update(self, chunk):
+        start = time.perf_counter()
+        self.points += len(chunk)
+
+        finite_masks = {}
+        for name, acc in self.fields.items():
+            # One contiguous copy of the strided field, then every reduction runs at memory speed
+            values = np.ascontiguousarray(chunk[name])
+            if values.dtype.kind == 'f':
+                finite = np.isfinite(values)
+                bad = values.size - np.count_nonzero(finite)
+                if bad:
+                    acc['nan_count'] += int(bad)
+                    values = values[finite]
+                finite_masks[name] = finite if bad else None
+            if values.size:
+                acc['min']    = min(acc['min'], values.min().item())
+                acc['max']    = max(acc['max'], values.max().item())
+                acc['sum']   += float(values.sum(dtype=np.float64))
+                acc['count'] += int(values.size)
+
+        if self.xyz and len(chunk):
+            self._update_bbox(chunk, [finite_masks.get(axis) for axis in ('x', 'y', 'z')])
+
+        if self.histogram is not None:
+            values = np.asarray(chunk[self.intensity], dtype=np.float64).ravel()
+            if values.dtype.kind == 'f':
+                values = values[np.isfinite(values)]
+            self.histogram.update(values)
+
+        self.seconds += time.perf_counter() - start
+
+    def _update_bbox(self, chunk, masks):
+        """Box over points whose x, y and z are all finite (NaN marks a missing return)."""
+        masks = [m for m in masks if m is not None]
+        if masks:
+            valid = np.logical_and.reduce(masks)
+            count = int(np.count_nonzero(valid))
+        else:
+            valid, count = None, len(chunk)
+        if not count:
+            return
+        self.valid_points += count
+        for i, axis in enumerate(('x', 'y', 'z')):
+            values = chunk[axis] if valid is None else chunk[axis][valid]
+            self.bbox_min[i] = min(self.bbox_min[i], float(values.min()))
+            self.bbox_max[i] = max(self.bbox_max[i], float(values.max()))
+
+    def result(self):
+        fields = {}
+        for name, acc in self.fields.items():
+            has = acc['count'] > 0
+            fields[name] = {
+                'min':  _round(acc['min']) if has else None,
+                'max':  _round(acc['max']) if has else None,
+                'mean': _round(acc['sum'] / acc['count']) if has else None,
+                'nan_count': acc['nan_count'],
+            }
+
+        stats = {'points': self.points, 'fields': fields}
+        if self.xyz:
+            stats['valid_points'] = self.valid_points
+            if self.valid_points:
+                extent = self.bbox_max - self.bbox_min
+                stats['bbox'] = {
+                    'min':    [_round(v) for v in self.bbox_min],
+                    'max':    [_round(v) for v in self.bbox_max],
+                    'extent': [_round(v) for v in extent],
+                }
+                stats['density'] = _density(self.valid_points, extent)
+        if self.histogram is not None and self.histogram.total:
+            stats['intensity_histogram'] = {'field': self.intensity,
+                                            **self.histogram.result(self.histogram_bins)}
+        stats['seconds'] = round(self.seconds, 3)
+        return stats
+
+def summarize_points(points, chunk_points=4_000_000, histogram_bins=64):
+    """PointStats over a whole (memory-mapped) point array, one chunk view at a time."""
+    return summarize_chunks(points.dtype, iter_chunks(points, chunk_points), histogram_bins)
+
+def summarize_chunks(dtype, chunks, histogram_bins=64):
+    stats = PointStats(dtype, histogram_bins=histogram_bins)
+    for chunk in chunks:
+        stats.update(chunk)
+    return stats.result()
+
+def _density(count, extent):
+    area   = float(extent[0] * extent[1])
+    volume = float(area * extent[2])
+    return {
+        'points_per_m2':  _round(count / area) if area > 0 else None,
+        'points_per_m3':  _round(count / volume) if volume > 0 else None,
+        # Spacing of a uniform grid with the same count over the XY footprint
+        'mean_spacing_m': _round((area / count) ** 0.5) if area > 0 else None,
+    }
+
+def _round(value, digits=6):
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
+
+class _StreamingHistogram:
+    """
+    One-pass histogram whose range is not known up front. Keeps `fine_bins`
+    equal-width bins; when a value falls outside, the range doubles (towards
+    that side) and neighbouring bins merge, so no value is ever re-read.
+    """
+
+    def __init__(self, fine_bins=4096):
+        self.fine_bins = fine_bins
+        self.counts    = None
+        self.low       = None
+        self.width     = None
+        self.total     = 0
+        self.min       = np.inf
+        self.max       = -np.inf
+
+    def update(self, values):
+        if not values.size:
+            return
+        lo, hi = float(values.min()), float(values.max())
+        self.min, self.max = min(self.min, lo), max(self.max, hi)
+        if self.counts is None:
+            self.low    = lo
+            self.width  = max(hi - lo, 1e-9) * (1 + 1e-9) / self.fine_bins
+            self.counts = np.zeros(self.fine_bins, dtype=np.int64)
+        while lo < self.low:
+            self._grow(left=True)
+        while hi >= self.low + self.width * self.fine_bins:
+            self._grow(left=False)
+        idx = ((values - self.low) / self.width).astype(np.int64)
+        np.clip(idx, 0, self.fine_bins - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.fine_bins)
+        self.total  += int(values.size)
+
+    def _grow(self, left):
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        self.counts = np.zeros(self.fine_bins, dtype=np.int64)
+        if left:
+            self.low -= self.width * self.fine_bins
+            self.counts[self.fine_bins // 2:] = merged
+        else:
+            self.counts[:self.fine_bins // 2] = merged
+        self.width *= 2
+
+    def result(self, bins):
+        """`bins` equal-width bins covering the occupied part of the fine range."""
+        occupied = np.nonzero(self.counts)[0]
+        first, last = int(occupied[0]), int(occupied[-1]) + 1
+        group  = max(1, -(-(last - first) // bins))   # ceil
+        stop   = first + group * (-(-(last - first) // group))
+        padded = np.zeros(stop - first, dtype=np.int64)
+        padded[:last - first] = self.counts[first:last]
+        counts = padded.reshape(-1, group).sum(axis=1)
+        edges  = self.low + self.width * np.arange(first, stop + 1, group)
+        return {
+            'min':    _round(self.min),
+            'max':    _round(self.max),
+            'edges':  [_round(e) for e in edges],
+            'counts': counts.tolist(),
+        }
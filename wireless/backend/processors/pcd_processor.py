@@ -1,29 +1,34 @@
 import os
 import tempfile
-from azure.storage.blob import BlobServiceClient
 from dotenv import load_dotenv
+from backend.utils.blob_io import get_blob_client, read_prefix_until
+from backend.processors.pcd_points import (POINT_FORMATS, PointStats, iter_chunks, iter_pcd_chunks, open_points,
+                                           pcd_dtype, summarize_chunks)
+from backend.processors.pcd_preview import VoxelPyramid, encode_preview
 
 load_dotenv()
 
 class PCDProcessor:
+    # Bump whenever get_metadata() output changes; cached analyses are keyed on it
+    PROCESSOR_VERSION = 'pcd-2'   # ranged-read header parse
+    STATS_VERSION     = 'pcd-4'   # get_metadata(stats=True): + point statistics (binary, binary_compressed)
+
     def __init__(self, blob_path):
         self.blob_path = blob_path
         self.filename = os.path.basename(blob_path)
         self.local_temp_path = None
 
     def _download_from_azure(self):
-        """Pulls the file from Azure to a temporary location for metadata extraction."""
+        """Streams the blob to a temporary file (point statistics memory-map it)."""
         if not self.local_temp_path:
-            bsc = BlobServiceClient.from_connection_string(os.getenv('AZURE_STORAGE_CONNECTION_STRING'))
-            container_name = os.getenv('BRONZE_CONTAINER_NAME', 'bronze-layer')
-            blob_client = bsc.get_blob_client(container=container_name, blob=self.blob_path)
-            
-            temp_dir = tempfile.gettempdir()
-            self.local_temp_path = os.path.join(temp_dir, self.filename)
-            
-            print(f"📥 Downloading {self.filename} from Azure for Lidar metadata extraction...")
-            with open(self.local_temp_path, "wb") as f:
-                f.write(blob_client.download_blob().readall())
+            # Shared service client: no per-file client construction or TLS handshake
+            blob_client = get_blob_client(self.blob_path)
+
+            fd, self.local_temp_path = tempfile.mkstemp(suffix='.pcd', prefix='pcd_')
+            print(f"📥 Downloading {self.filename} from Azure for point statistics...")
+            with os.fdopen(fd, "wb") as f:
+                blob_client.download_blob(max_concurrency=4).readinto(f)
+        return self.local_temp_path
 
     def __del__(self):
         """Cleans up the temp file to save your Mac's hard drive space."""
@@ -31,63 +36,146 @@ class PCDProcessor:
             os.remove(self.local_temp_path)
             print(f"🧹 Cleaned up temp file: {self.local_temp_path}")
 
-    def get_metadata(self):
-        try:
-            self._download_from_azure()
-        except Exception as e:
-            return {'success': False, 'error': f"Azure Download Failed: {str(e)}"}
+    def _read_header(self):
+        """Ranged header read: only the first few KB leave Azure. Returns (header_data, data_offset, file_size)."""
+        blob_client = get_blob_client(self.blob_path)
+        raw, file_size = read_prefix_until(blob_client, lambda b: parse_pcd_header(b) is not None)
+        # A header-only file may end on the DATA line without a newline
+        parsed = parse_pcd_header(raw if len(raw) < file_size else raw + b'\n')
+        if parsed is None:
+            raise ValueError("No DATA line found in the PCD header")
+        return parsed + (file_size,)
 
-        header_data = {}
-        variables = {}
-        
-        # ── Fast Header Parsing (Immune to Out-Of-Memory Crashes) ──
+    def get_metadata(self, stats=False):
+        """
+        Fields, point count and version from a ranged read of the header.
+        With stats=True, binary payloads also get point statistics, which
+        downloads the whole file (uploads compute them from the stream
+        instead; see PCDHeaderAnalyzer).
+        """
         try:
-            with open(self.local_temp_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#'): continue
-                    
-                    parts = line.split()
-                    key = parts[0].upper()
-                    
-                    if key in ['VERSION', 'WIDTH', 'HEIGHT', 'POINTS', 'DATA']:
-                        header_data[key] = parts[1] if len(parts) > 1 else ""
-                    elif key in ['FIELDS', 'SIZE', 'TYPE', 'COUNT']:
-                        header_data[key] = parts[1:]
-                        
-                    if key == 'DATA':
-                        # Stop reading immediately! Do not load the millions of 3D points into memory.
-                        break 
-            
-            # ── Construct the variables schema (like columns in CSV) ──
-            fields = header_data.get('FIELDS', [])
-            sizes = header_data.get('SIZE', [])
-            types = header_data.get('TYPE', [])
-            num_points = int(header_data.get('POINTS', 0))
-            
-            # Map PCD types (I=Int, U=UInt, F=Float) to readable strings
-            type_map = {'I': 'Integer', 'U': 'Unsigned Integer', 'F': 'Float'}
-            
-            for i, field in enumerate(fields):
-                # Fallbacks in case the header is slightly malformed
-                f_size = sizes[i] if i < len(sizes) else "Unknown"
-                f_type = types[i] if i < len(types) else "Unknown"
-                readable_type = f"{type_map.get(f_type, f_type)} ({f_size} bytes)"
-                
-                variables[field] = {
-                    'shape': [num_points],
-                    'dtype': readable_type
-                }
-                
+            header_data, data_offset, file_size = self._read_header()
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
         except Exception as e:
-            return {'success': False, 'error': f"Failed to parse PCD header: {str(e)}"}
-
-        file_size_mb = os.path.getsize(self.local_temp_path) / (1024 * 1024)
-        
-        return {
-            'success': True,
-            'filename': self.filename,
-            'file_type': f"Point Cloud Data (PCD v{header_data.get('VERSION', 'Unknown')})",
-            'file_size_mb': round(file_size_mb, 4),
-            'variables': variables
-        }
\ No newline at end of file
+            return {'success': False, 'error': f"Azure Read Failed: {str(e)}"}
+        metadata = pcd_metadata(self.filename, header_data, file_size)
+
+        # ── Binary payloads: the whole cloud, summarized chunk by chunk ──
+        # (memory-mapped for DATA binary, LZF-decoded and transposed for binary_compressed)
+        if stats and metadata.get('success') and header_data.get('DATA', '').lower() in POINT_FORMATS:
+            try:
+                chunks = iter_pcd_chunks(self._download_from_azure(), header_data, data_offset)
+                metadata['point_stats'] = summarize_chunks(pcd_dtype(header_data), chunks)
+            except Exception as e:
+                metadata['point_stats'] = {'error': str(e)}
+        return metadata
+
+    def build_previews(self, lods, progress=None):
+        """
+        Voxel-downsampled levels of detail of the cloud, in the binary format
+        of pcd_preview. Two passes over the same points: PointStats for the
+        bounding box, then one VoxelPyramid pass that serves every LOD.
+        Returns ({lod: encoded bytes}, manifest).
+        """
+        header_data, data_offset, file_size = self._read_header()
+        if header_data.get('DATA', '').lower() not in POINT_FORMATS:
+            raise ValueError(f"Previews need DATA binary or binary_compressed, got DATA {header_data.get('DATA')}")
+        points = open_points(self._download_from_azure(), header_data, data_offset)
+        stats  = PointStats(points.dtype)
+        if not stats.xyz:
+            raise ValueError("PCD has no x, y, z fields to preview")
+
+        for chunk in iter_chunks(points):
+            stats.update(chunk)
+        summary = stats.result()
+        if not stats.valid_points:
+            raise ValueError("PCD has no finite points to preview")
+        if progress:
+            progress(0.4, "Voxelizing")
+
+        pyramid = VoxelPyramid(stats.bbox_min, stats.bbox_max, intensity=stats.intensity)
+        for chunk in iter_chunks(points):
+            pyramid.update(chunk)
+        del points   # release a memmap before __del__ removes the file
+
+        previews, manifest_lods = {}, []
+        for lod, (xyz, intensity, level) in sorted(pyramid.lods(lods).items()):
+            previews[lod] = encode_preview(xyz, intensity)
+            manifest_lods.append({'lod': lod, 'points': len(xyz), 'bytes': len(previews[lod]),
+                                  'voxel_size_m': round(pyramid.size / (1 << level), 6)})
+        manifest = {
+            'filename':        self.filename,
+            'points':          summary['points'],
+            'valid_points':    summary['valid_points'],
+            'bbox':            summary['bbox'],
+            'intensity_field': stats.intensity,
+            'lods':            manifest_lods,
+        }
+        return previews, manifest
+
+def pcd_metadata(filename, header_data, file_size):
+    """The analysis-modal view of a parsed PCD header."""
+    variables = {}
+
+    # ── Construct the variables schema (like columns in CSV) ──
+    try:
+        fields = header_data.get('FIELDS', [])
+        sizes = header_data.get('SIZE', [])
+        types = header_data.get('TYPE', [])
+        num_points = int(header_data.get('POINTS', 0))
+
+        # Map PCD types (I=Int, U=UInt, F=Float) to readable strings
+        type_map = {'I': 'Integer', 'U': 'Unsigned Integer', 'F': 'Float'}
+
+        for i, field in enumerate(fields):
+            # Fallbacks in case the header is slightly malformed
+            f_size = sizes[i] if i < len(sizes) else "Unknown"
+            f_type = types[i] if i < len(types) else "Unknown"
+            readable_type = f"{type_map.get(f_type, f_type)} ({f_size} bytes)"
+
+            variables[field] = {
+                'shape': [num_points],
+                'dtype': readable_type
+            }
+
+    except Exception as e:
+        return {'success': False, 'error': f"Failed to parse PCD header: {str(e)}"}
+
+    file_size_mb = file_size / (1024 * 1024)
+
+    return {
+        'success': True,
+        'filename': filename,
+        'file_type': f"Point Cloud Data (PCD v{header_data.get('VERSION', 'Unknown')})",
+        'file_size_mb': round(file_size_mb, 4),
+        'variables': variables
+    }
+
+def parse_pcd_header(raw):
+    """
+    Parses a PCD header from the leading bytes of a file.
+    Returns (header_data, data_offset) where data_offset is the byte offset of
+    the point payload, or None if the DATA line is not complete in `raw` yet.
+    """
+    header_data = {}
+    offset = 0
+    while True:
+        end = raw.find(b'\n', offset)
+        if end == -1:
+            return None
+        line = raw[offset:end].decode('utf-8', errors='ignore').strip()
+        offset = end + 1
+        if not line or line.startswith('#'): continue
+
+        parts = line.split()
+        key = parts[0].upper()
+
+        if key in ['VERSION', 'WIDTH', 'HEIGHT', 'POINTS', 'DATA']:
+            header_data[key] = parts[1] if len(parts) > 1 else ""
+        elif key in ['FIELDS', 'SIZE', 'TYPE', 'COUNT', 'VIEWPOINT']:
+            header_data[key] = parts[1:]
+
+        if key == 'DATA':
+            # Stop immediately! Everything after this line is point payload.
+            return header_data, offset
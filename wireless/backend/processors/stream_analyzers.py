@@ -0,0 +1,341 @@
+"""
+Analyzers that see an upload's bytes once, as they stream to Blob Storage.
+
+BronzeService feeds every chunk of an upload through an AnalyzerTee next to
+the SHA-256 update, so the metadata /api/analyze would compute is ready when
+the upload finishes, with no second read of the blob:
+
+    CSVStreamAnalyzer    dialect sniff + single-pass CSVProfile over the stream
+    PCDHeaderAnalyzer    buffers only up to the DATA line; DATA binary point
+                         records stream into PointStats, binary_compressed
+                         payloads (within a size cap) are decoded once the
+                         last byte arrives
+    HDF5HeaderAnalyzer   keeps the head and tail of a v7.3 MAT / HDF5 file and
+                         reads the object headers from that capture
+
+Each analyzer produces (details, analysis): details is stored with the bronze
+record, analysis is exactly what the matching processor's get_metadata()
+returns and is keyed on that processor's PROCESSOR_VERSION (None when the
+stream alone cannot reproduce it, so nothing is cached). An analyzer may
+also set stats_analysis, the get_metadata(stats=True) result, which is keyed
+on the processor's STATS_VERSION. An analyzer that fails drops out quietly;
+it never fails the upload.
+"""
+
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from backend.processors.csv_processor import CSVProcessor, sniff_sample, frontend_metadata
+from backend.processors.csv_profiler import CSVProfile
+from backend.processors.pcd_processor import PCDProcessor, parse_pcd_header, pcd_metadata
+from backend.processors.pcd_points import (PointStats, pcd_dtype, point_count, check_compressed_sizes,
+                                           decode_compressed, iter_columnar_chunks, COMPRESSED_PREFIX)
+from backend.processors.mat_processor import WirelessDataProcessor, hdf5_variables, mat_metadata
+from backend.utils import lzf_codec
+
+# Largest decoded binary_compressed payload held while an upload finishes (jobs use PCD_DECODE_MAX_MB)
+UPLOAD_DECODE_MAX_BYTES = int(os.getenv('PCD_UPLOAD_DECODE_MAX_MB', '256')) * 1024 * 1024
+
+class CSVStreamAnalyzer:
+    name = 'csv_profile'
+    processor = CSVProcessor
+
+    def __init__(self, filename, sniff_bytes=64 * 1024):
+        self.filename    = filename
+        self.sniff_bytes = sniff_bytes
+        self.dialect     = None
+        self.columns     = None
+        self.profile     = CSVProfile()
+        self._pending    = b''
+
+    def feed(self, chunk):
+        self._pending += chunk
+        if self.dialect is None:
+            if len(self._pending) < self.sniff_bytes:
+                return
+            self._start(truncated=True)
+        # Only whole lines are parsed; the partial last line waits for the next chunk
+        cut = self._pending.rfind(b'\n')
+        if cut == -1:
+            return
+        block, self._pending = self._pending[:cut + 1], self._pending[cut + 1:]
+        self._parse(block)
+
+    def finish(self, file_size):
+        if self.dialect is None:
+            self._start(truncated=False)
+        if self._pending.strip():
+            self._parse(self._pending)
+        self._pending = b''
+        self.profile.file_size = file_size
+        self.profile.file_count = 1
+        details = self.profile.to_metadata(self.filename)
+        return details, frontend_metadata(details, self.filename)
+
+    def _start(self, truncated):
+        self.dialect = sniff_sample(self._pending[:self.sniff_bytes], truncated=truncated)
+        if self.dialect.encoding == 'utf-16':
+            raise ValueError("UTF-16 CSVs cannot be split on newline bytes")
+
+    def _parse(self, block):
+        kwargs = self.dialect.read_csv_kwargs()
+        if self.columns is not None:
+            # Later blocks have no header row; reuse the first block's column names
+            kwargs.update(header=None, names=self.columns)
+        chunk = pd.read_csv(io.BytesIO(block), engine='c', **kwargs)
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        self.profile.update(chunk)
+
+class PCDHeaderAnalyzer:
+    """
+    Parses the PCD header from the first blocks; for DATA binary it then
+    folds every whole point record into PointStats as the blocks stream past,
+    matching PCDProcessor's memory-mapped statistics. A binary_compressed
+    payload is one LZF block, so it is kept and decoded in finish(); that
+    needs the python-lzf C decoder and a decoded size within
+    max_decoded_bytes, otherwise the statistics are skipped (the header is
+    still analyzed). The point statistics go to stats_analysis; the plain
+    analysis stays header-only, like PCDProcessor.get_metadata().
+    """
+    name = 'pcd_header'
+    processor = PCDProcessor
+
+    def __init__(self, filename, max_header_bytes=4 * 1024 * 1024,
+                 max_decoded_bytes=UPLOAD_DECODE_MAX_BYTES):
+        self.filename          = filename
+        self.max_header_bytes  = max_header_bytes
+        self.max_decoded_bytes = max_decoded_bytes
+        self.parsed            = None
+        self.stats             = None
+        self.compressed        = None
+        self.compressed_end    = None
+        self.skipped           = None
+        self.stats_analysis    = None
+        self._head             = b''
+        self._pending          = b''
+        self._remaining        = 0
+
+    def feed(self, chunk):
+        if self.parsed is None:
+            if len(self._head) >= self.max_header_bytes:
+                return
+            self._head += chunk
+            self.parsed = parse_pcd_header(self._head)
+            if self.parsed is None:
+                return
+            header_data, data_offset = self.parsed
+            chunk, self._head = self._head[data_offset:], b''
+            data_format = header_data.get('DATA', '').lower()
+            if data_format in ('binary', 'binary_compressed'):
+                self.stats      = PointStats(pcd_dtype(header_data))
+                self._remaining = point_count(header_data)
+            if data_format == 'binary_compressed':
+                if lzf_codec.native_available():
+                    self.compressed = bytearray()
+                else:
+                    # The pure-Python decoder would hold the upload for minutes
+                    self._skip("python-lzf is not installed; run /api/analyze?stats=1 once it is")
+        if self.compressed is not None:
+            self._collect(chunk)
+        elif self.stats is not None and self._remaining:
+            self._consume(chunk)
+
+    def _collect(self, chunk):
+        if self.compressed_end is None:
+            self.compressed += chunk
+            if len(self.compressed) < COMPRESSED_PREFIX.size:
+                return
+            try:
+                compressed_size, _ = check_compressed_sizes(self.compressed, self.parsed[0], self.max_decoded_bytes)
+                if compressed_size > self.max_decoded_bytes:
+                    raise ValueError(f"binary_compressed payload is {compressed_size / (1024 * 1024):.0f} MB, "
+                                     f"over the {self.max_decoded_bytes / (1024 * 1024):.0f} MB upload limit")
+            except ValueError as e:
+                self._skip(f"{e}; run /api/analyze?stats=1 instead")
+                return
+            self.compressed_end = COMPRESSED_PREFIX.size + compressed_size
+        else:
+            self.compressed += chunk
+        # Trailing bytes after the LZF block are never needed
+        del self.compressed[self.compressed_end:]
+
+    def _skip(self, reason):
+        self.skipped    = reason
+        self.stats      = None
+        self.compressed = None
+
+    def _consume(self, chunk):
+        itemsize = self.stats.dtype.itemsize
+        self._pending += chunk
+        count = min(len(self._pending) // itemsize, self._remaining)
+        if count:
+            self.stats.update(np.frombuffer(self._pending, dtype=self.stats.dtype, count=count))
+            self._pending    = self._pending[count * itemsize:]
+            self._remaining -= count
+
+    def finish(self, file_size):
+        if self.parsed is None:
+            # A header-only file may end on the DATA line without a newline
+            self.parsed = parse_pcd_header(self._head + b'\n')
+        if self.parsed is None:
+            raise ValueError("No DATA line found in the PCD header")
+        header_data, data_offset = self.parsed
+        details  = {'header': header_data, 'data_offset': data_offset, 'file_size': file_size}
+        analysis = pcd_metadata(self.filename, header_data, file_size)
+        if self.skipped:
+            details['point_stats'] = {'skipped': self.skipped}
+        if self.compressed is not None:
+            buffer = decode_compressed(self.compressed, header_data, self.max_decoded_bytes)
+            self.compressed = None
+            for chunk in iter_columnar_chunks(buffer, self.stats.dtype, self._remaining):
+                self.stats.update(chunk)
+            self._remaining = 0
+        if self.stats is not None:
+            if self._remaining:
+                raise ValueError(f"PCD payload ends {self._remaining} points short of POINTS")
+            details['point_stats'] = self.stats.result()
+            self.stats_analysis = dict(analysis, point_stats=details['point_stats'])
+        return details, analysis
+
+class HDF5HeaderAnalyzer:
+    """
+    HDF5 object headers usually sit in the first few MB (MATLAB v7.3 writes a
+    512-byte userblock, then the superblock and root group), with some
+    metadata flushed at the end. Keeping the head and a rolling tail is
+    enough for h5py to list every variable in the common case; if it needs a
+    byte that was not captured, the analyzer gives up and /api/analyze falls
+    back to ranged reads.
+    """
+    name = 'hdf5_header'
+    processor = WirelessDataProcessor
+    SIGNATURE = b'\x89HDF\r\n\x1a\n'
+
+    def __init__(self, filename, head_bytes=4 * 1024 * 1024, tail_bytes=1024 * 1024):
+        self.filename   = filename
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self._head      = bytearray()
+        self._tail      = bytearray()
+
+    def feed(self, chunk):
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self._tail += chunk
+            del self._tail[:-self.tail_bytes]
+
+    def finish(self, file_size):
+        # The superblock may follow a userblock of 0, 512, 1024, 2048, ... bytes
+        offsets = [0] + [512 << i for i in range(14)]
+        if not any(self._head[o:o + 8] == self.SIGNATURE for o in offsets):
+            raise ValueError("Not an HDF5 file (v5 MAT files are analyzed on demand)")
+
+        import h5py
+        capture = CapturedFile(bytes(self._head), bytes(self._tail), file_size)
+        with h5py.File(capture, 'r') as h5:
+            variables = hdf5_variables(h5)
+        details = {'variables': variables, 'file_size': file_size}
+        return details, mat_metadata(self.filename, variables, file_size)
+
+class CapturedFile(io.RawIOBase):
+    """Read-only view of a file of which only the head and tail bytes were kept."""
+
+    def __init__(self, head, tail, size):
+        super().__init__()
+        self.head       = head
+        self.tail       = tail
+        self.size       = size
+        self.tail_start = size - len(tail)
+        self._pos       = 0
+        if self.tail_start <= len(head):
+            # Small file: head and tail are contiguous, so everything was captured
+            self.head       = head + tail[len(head) - self.tail_start:]
+            self.tail       = b''
+            self.tail_start = size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        self._pos = base + offset
+        return self._pos
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        n = max(0, min(len(view), self.size - self._pos))
+        start, end = self._pos, self._pos + n
+        if end <= len(self.head):
+            view[:n] = self.head[start:end]
+        elif start >= self.tail_start:
+            view[:n] = self.tail[start - self.tail_start:end - self.tail_start]
+        else:
+            raise OSError(f"Bytes {start}-{end} were not captured during upload")
+        self._pos = end
+        return n
+
+ANALYZERS_BY_EXTENSION = {
+    'csv':  [CSVStreamAnalyzer],
+    'pcd':  [PCDHeaderAnalyzer],
+    'mat':  [HDF5HeaderAnalyzer],
+    'h5':   [HDF5HeaderAnalyzer],
+    'hdf5': [HDF5HeaderAnalyzer],
+}
+
+class AnalyzerTee:
+    """Fans each upload chunk out to the analyzers registered for the file's extension."""
+
+    def __init__(self, filename, ext):
+        self.analyzers = [cls(filename) for cls in ANALYZERS_BY_EXTENSION.get(ext, [])]
+        self.errors    = {}
+        self.seconds   = 0.0
+
+    def feed(self, chunk):
+        start = time.perf_counter()
+        for analyzer in list(self.analyzers):
+            try:
+                analyzer.feed(chunk)
+            except Exception as e:
+                self._drop(analyzer, e)
+        self.seconds += time.perf_counter() - start
+
+    def finish(self, file_size):
+        """
+        Returns (details, analyses): details for bronze_files.metadata_json and
+        a list of (processor_version, analysis) pairs for the analysis cache.
+        """
+        start = time.perf_counter()
+        details, analyses = {}, []
+        for analyzer in self.analyzers:
+            try:
+                detail, analysis = analyzer.finish(file_size)
+            except Exception as e:
+                self.errors[analyzer.name] = str(e)
+                continue
+            version = analyzer.processor.PROCESSOR_VERSION
+            details[analyzer.name] = {'processor_version': version, 'result': detail}
+            if analysis is not None:
+                analyses.append((version, analysis))
+            stats_analysis = getattr(analyzer, 'stats_analysis', None)
+            if stats_analysis is not None:
+                analyses.append((analyzer.processor.STATS_VERSION, stats_analysis))
+        self.seconds += time.perf_counter() - start
+        if self.errors:
+            details['errors'] = self.errors
+        return details, analyses
+
+    def _drop(self, analyzer, error):
+        self.errors[analyzer.name] = str(error)
+        self.analyzers.remove(analyzer)
@@ -0,0 +1,274 @@
+"""
+As-of alignment of timestamp streams from different modalities.
+
+A stream is a sequence of FRAME_DTYPE blocks: one record per sample (a CSI
+snapshot, a radar or lidar frame) with its timestamp in int64 nanoseconds
+and where it came from (source_file_id, frame, row). asof_align() walks a
+reference stream block by block and, for every record, finds the nearest
+record of each other stream within a tolerance - the as-of join of
+pandas.merge_asof, vectorized with np.searchsorted over a sliding window.
+
+Nothing is held whole: the reference is processed one block at a time, and
+each other stream only keeps the records that can still match (those within
+the tolerance of the current block). A dense stream against a sparse
+reference could need many records for one reference block, so a block is
+split wherever a window would hold more than max_window records. Both sides
+must be sorted by time;
+sort_stream() makes any stream sorted with an external merge sort, so it
+works on streams far larger than memory as well.
+"""
+
+import os
+import tempfile
+import numpy as np
+
+FRAME_DTYPE = np.dtype([
+    ('timestamp',      '<i8'),   # ns since 1970-01-01 UTC
+    ('source_file_id', '<i8'),   # bronze_files.id
+    ('frame',          '<i4'),   # file order in the aggregation
+    ('row',            '<i8'),   # sample within the file (0 for one-frame-per-file modalities)
+])
+
+DIRECTIONS = ('nearest', 'backward', 'forward')
+
+# Days from MATLAB's datenum epoch (year 0) to 1970-01-01
+_DATENUM_UNIX_EPOCH = 719529
+_NS = {'s': 10**9, 'ms': 10**6, 'us': 10**3, 'ns': 1}
+
+def timestamp_unit(sample):
+    """
+    Unit of numeric timestamps, from their magnitude: epoch s / ms / us / ns,
+    or MATLAB datenum (days since year 0, ~7.3e5 for this century).
+    """
+    sample = np.asarray(sample, dtype=np.float64)
+    sample = sample[np.isfinite(sample)]
+    if not sample.size:
+        return 's'
+    magnitude = float(np.median(np.abs(sample)))
+    if magnitude >= 1e17: return 'ns'
+    if magnitude >= 1e14: return 'us'
+    if magnitude >= 1e11: return 'ms'
+    if 6e5 <= magnitude < 8e5: return 'datenum'
+    return 's'
+
+def to_nanoseconds(values, unit):
+    """Timestamps in `unit` (or datetime64) -> (int64 ns, mask of the valid ones)."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64), ~np.isnat(values)
+    if values.dtype.kind in 'iu' and unit in _NS:
+        return values.astype(np.int64) * _NS[unit], np.ones(len(values), dtype=bool)
+    values = values.astype(np.float64, copy=False)
+    finite = np.isfinite(values)
+    if unit == 'datenum':
+        seconds = (values - _DATENUM_UNIX_EPOCH) * 86400.0
+        ns = np.where(finite, np.rint(seconds * 1e9), 0).astype(np.int64)
+    else:
+        ns = np.where(finite, np.rint(values * _NS[unit]), 0).astype(np.int64)
+    return ns, finite
+
+def sort_stream(blocks, block_rows=1_000_000, spill_dir=None, fan_in=16):
+    """
+    Sorted FRAME_DTYPE blocks of at most block_rows records from blocks in
+    any order. Incoming blocks are buffered up to block_rows records, and
+    each full buffer is sorted and spilled to a temporary file as one run,
+    so however short the incoming blocks are there are at most
+    total / block_rows runs. A stream that fits one buffer never touches
+    disk. Runs that follow each other in time (a stream that arrives
+    sorted) are read straight back; otherwise they are merged fan_in at a
+    time, in passes, with at most block_rows records in memory.
+    """
+    paths = []
+
+    def new_file():
+        fd, path = tempfile.mkstemp(suffix='.frames', prefix='align_', dir=spill_dir)
+        paths.append(path)
+        return os.fdopen(fd, 'wb'), path
+
+    try:
+        buffer, buffered = [], 0
+        runs, total, last = [], 0, None
+        f, path = None, None
+        for block in blocks:
+            if not len(block):
+                continue
+            buffer.append(block)
+            buffered += len(block)
+            if buffered < block_rows:
+                continue
+            run = _sorted(buffer)
+            buffer, buffered = [], 0
+            if f is None:
+                f, path = new_file()
+            runs, total, last = _append_run(f, runs, total, last, run)
+        if f is None:
+            # Everything fit in one buffer
+            if buffered:
+                run = _sorted(buffer)
+                for start in range(0, len(run), block_rows):
+                    yield run[start:start + block_rows]
+            return
+        if buffered:
+            runs, total, last = _append_run(f, runs, total, last, _sorted(buffer))
+        f.close()
+        del buffer
+
+        data = np.memmap(path, dtype=FRAME_DTYPE, mode='r', shape=(total,))
+        while len(runs) > fan_in:
+            # One merge pass: every fan_in runs become one run of the next file
+            out, out_path = new_file()
+            merged, offset = [], 0
+            with out:
+                for group in range(0, len(runs), fan_in):
+                    first = offset
+                    for block in _merge_runs(data, runs[group:group + fan_in], block_rows):
+                        out.write(block.tobytes())
+                        offset += len(block)
+                    merged.append([first, offset])
+            del data
+            os.remove(paths.pop(0))
+            runs, path = merged, out_path
+            data = np.memmap(path, dtype=FRAME_DTYPE, mode='r', shape=(total,))
+        if len(runs) == 1:
+            for start in range(0, total, block_rows):
+                yield np.array(data[start:start + block_rows])
+            return
+        yield from _merge_runs(data, runs, block_rows)
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+def _sorted(blocks):
+    block = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+    ts = block['timestamp']
+    if (ts[1:] < ts[:-1]).any():
+        block = block[np.argsort(ts, kind='stable')]
+    return block
+
+def _append_run(f, runs, total, last, run):
+    """Spills a sorted run; one that starts where the previous run ended just extends it."""
+    if runs and last <= run['timestamp'][0]:
+        runs[-1][1] += len(run)
+    else:
+        runs.append([total, total + len(run)])
+    f.write(run.tobytes())
+    return runs, total + len(run), run['timestamp'][-1]
+
+def _merge_runs(data, runs, block_rows):
+    """
+    k-way merge of at most fan_in sorted runs, one window of
+    block_rows // k records per run at a time. Every record up to the
+    smallest window end is final: no unread record can be earlier.
+    """
+    window  = max(1, block_rows // len(runs))
+    cursors = [start for start, _ in runs]
+    while True:
+        heads = [(i, data[c:min(c + window, stop)])
+                 for i, (c, (_, stop)) in enumerate(zip(cursors, runs)) if c < stop]
+        if not heads:
+            return
+        cutoff = min(head['timestamp'][-1] for _, head in heads)
+        parts = []
+        for i, head in heads:
+            n = int(np.searchsorted(head['timestamp'], cutoff, side='right'))
+            parts.append(head[:n])
+            cursors[i] += n
+        merged = np.concatenate(parts)
+        yield merged[np.argsort(merged['timestamp'], kind='stable')]
+
+class _Window:
+    """The records of one sorted stream that can still match the reference."""
+
+    def __init__(self, blocks):
+        self.blocks    = iter(blocks)
+        self.records   = np.empty(0, dtype=FRAME_DTYPE)
+        self.exhausted = False
+
+    def extend_past(self, t, limit=None):
+        """Reads blocks until a record later than t is held, the stream ends, or limit records are held."""
+        pulled = [self.records]
+        held   = len(self.records)
+        while (not self.exhausted and (not len(pulled[-1]) or pulled[-1]['timestamp'][-1] <= t)
+               and (limit is None or held < limit)):
+            block = next(self.blocks, None)
+            if block is None:
+                self.exhausted = True
+            elif len(block):
+                pulled.append(block)
+                held += len(block)
+        if len(pulled) > 1:
+            self.records = np.concatenate(pulled)
+
+    def covers(self, t):
+        """Whether every record that can match up to t is held."""
+        return self.exhausted or (len(self.records) and self.records['timestamp'][-1] > t)
+
+    def drop_before(self, t):
+        """Drops records before t, keeping the last one (a backward match for t)."""
+        cut = int(np.searchsorted(self.records['timestamp'], t, side='left')) - 1
+        if cut > 0:
+            self.records = self.records[cut:]
+
+    def match(self, ts, tolerance, direction):
+        """(matched records, delta ns = matched - reference, valid mask) for sorted timestamps ts."""
+        held = self.records['timestamp']
+        n    = len(held)
+        if not n:
+            return np.zeros(len(ts), dtype=FRAME_DTYPE), np.zeros(len(ts), dtype=np.int64), np.zeros(len(ts), dtype=bool)
+        if direction == 'backward':
+            cand = np.searchsorted(held, ts, side='right') - 1
+        elif direction == 'forward':
+            cand = np.searchsorted(held, ts, side='left')
+        else:
+            right = np.searchsorted(held, ts, side='left')
+            left  = right - 1
+            far   = np.iinfo(np.int64).max
+            d_left  = np.where(left >= 0, ts - held[np.maximum(left, 0)], far)
+            d_right = np.where(right < n, held[np.minimum(right, n - 1)] - ts, far)
+            cand = np.where(d_right < d_left, right, left)   # ties go to the earlier record
+        valid = (cand >= 0) & (cand < n)
+        cand  = np.clip(cand, 0, n - 1)
+        delta = held[cand] - ts
+        if tolerance is not None:
+            valid &= np.abs(delta) <= tolerance
+        return self.records[cand], delta, valid
+
+def asof_align(reference, others, tolerance=None, direction='nearest', max_window=None):
+    """
+    Aligns sorted streams to a sorted reference stream. reference is an
+    iterable of FRAME_DTYPE blocks, others {name: iterable of blocks};
+    tolerance is in ns (None: unlimited). Yields, per reference block or
+    piece of one, (records, {name: (matched records, delta ns, valid mask)}).
+
+    With max_window, a window stops reading once it holds that many records
+    (plus the block that crossed it) and the reference block is cut where
+    that window runs out. Only records within the tolerance of a single
+    reference record can take a window past it.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}")
+    windows = {name: _Window(blocks) for name, blocks in others.items()}
+    slack   = tolerance or 0
+    for block in reference:
+        start = 0
+        while start < len(block):
+            ts  = block['timestamp'][start:]
+            end = len(ts)
+            for window in windows.values():
+                window.drop_before(ts[0] - slack)
+                window.extend_past(ts[-1] + slack, max_window)
+                if not window.covers(ts[-1] + slack):
+                    # Reference records whose tolerance ends before the last held record are final
+                    held_until = window.records['timestamp'][-1] if len(window.records) else ts[0]
+                    end = min(end, int(np.searchsorted(ts, held_until - slack, side='left')))
+            if end == 0:
+                # Records within the tolerance of ts[0] alone exceed max_window: read them all
+                end = 1
+                for window in windows.values():
+                    window.extend_past(ts[0] + slack)
+            piece = block[start:start + end]
+            matches = {name: window.match(piece['timestamp'], tolerance, direction)
+                       for name, window in windows.items()}
+            yield piece, matches
+            start += end
@@ -0,0 +1,323 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import posixpath
+import tempfile
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from azure.core.exceptions import ResourceNotFoundError
+from dotenv import load_dotenv
+from backend.processors.time_align import (FRAME_DTYPE, DIRECTIONS, asof_align, sort_stream,
+                                           timestamp_unit, to_nanoseconds)
+from backend.services.array_store import ArrayStoreReader
+from backend.services.silver_service import SilverService, _partition_prefix, _PartWriter
+
+load_dotenv()
+
+# Records per block, and per other stream's match window (FRAME_DTYPE: 28 bytes each)
+ALIGN_BLOCK_ROWS     = int(os.getenv('SILVER_ALIGN_BLOCK_ROWS', '1000000'))
+DEFAULT_TOLERANCE_MS = float(os.getenv('SILVER_ALIGN_TOLERANCE_MS', '50'))
+
+# Column names taken as a table's timestamp (case-insensitive), in order of preference
+TIMESTAMP_COLUMNS = ('timestamp', 'timestamps', 'time_stamp', 'ts', 'time', 'datetime', 'epoch')
+
+# wifi: timestamps_<x>.mat holds one timestamp per CSI snapshot of channels_<x>.mat
+TIMESTAMP_FILE     = re.compile(r'timestamps?', re.I)
+TIMESTAMP_VARIABLE = re.compile(r'time|^ts', re.I)
+
+# Filenames that are timestamps (1625091000.123456.pcd): the longest number in the name
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+# Earliest timestamp taken as real time rather than a frame counter (2001-09-09)
+_EPOCH_FLOOR_NS = 10**18
+
+class AlignService:
+    """
+    Aligns Silver aggregations of different modalities in time.
+
+    Each aggregation becomes a stream of (timestamp, source_file_id, frame,
+    row) records: one per frame for tabular data (the frame's earliest
+    timestamp column value) and for per-file catalogs (timestamped
+    filenames), one per snapshot for MAT workspaces (the timestamps_* file's
+    vector from the Silver array store, pointing at the rows of the matching
+    channels_* file). Streams are read block by block, sorted out of core
+    and as-of joined to a reference stream (time_align.asof_align), into
+
+        aligned/<reference modality>/researcher=<r>/dataset=<d>/streams=<set>/part-<build>-00000.parquet
+
+    with one row per reference record: its timestamp and location, and for
+    every other stream the nearest record within the tolerance (nulls if
+    there is none) and its offset in ms. <set> names the other streams, so
+    aligning one reference to different streams gives separate tables.
+    """
+
+    def __init__(self, silver=None, block_rows=None):
+        self.silver     = silver or SilverService()
+        self.block_rows = block_rows or ALIGN_BLOCK_ROWS
+
+    def align(self, reference, others, tolerance_ms=DEFAULT_TOLERANCE_MS, direction='nearest', ctx=None):
+        """
+        reference / others: (modality, aggregation_name) of built Silver
+        aggregations. Returns the manifest of the aligned table.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        if not others:
+            raise ValueError("Nothing to align the reference with")
+        start     = time.perf_counter()
+        streams   = [tuple(reference)] + [tuple(o) for o in others]
+        labels    = _labels(streams)
+        tolerance = int(tolerance_ms * 1e6) if tolerance_ms is not None else None
+        # Microseconds: builds of one stream set are ordered by start time (see _PART_BUILD)
+        build_id  = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f') + '-' + uuid.uuid4().hex[:6]
+        prefix    = f"aligned/{_partition_prefix(*reference)}/streams={_stream_set(labels[1:], streams[1:])}"
+        silver    = self.silver
+        writer    = _PartWriter(silver._container(), prefix, build_id, silver.compression,
+                                silver.row_group_rows, silver.max_rows_per_file)
+
+        ref_label = labels[0]
+        matched   = {label: {'rows': 0, 'abs_delta_sum_ms': 0.0, 'max_abs_delta_ms': 0.0} for label in labels[1:]}
+        rows      = 0
+        try:
+            if ctx:
+                ctx.progress(0.05, f"Aligning {', '.join(labels[1:])} to {ref_label}")
+            with tempfile.TemporaryDirectory(prefix='align_') as spill:
+                ref_blocks = sort_stream(self.frame_stream(*reference), self.block_rows, spill)
+                other_blocks = {label: sort_stream(self.frame_stream(*stream), self.block_rows, spill)
+                                for label, stream in zip(labels[1:], streams[1:])}
+                try:
+                    for block, matches in asof_align(ref_blocks, other_blocks, tolerance, direction,
+                                                      max_window=self.block_rows):
+                        if ctx:
+                            ctx.checkpoint()
+                        writer.write(_aligned_table(ref_label, block, matches))
+                        rows += len(block)
+                        for label, (_, delta, valid) in matches.items():
+                            offsets = np.abs(delta[valid]) / 1e6
+                            stats = matched[label]
+                            stats['rows'] += int(valid.sum())
+                            stats['abs_delta_sum_ms'] += float(offsets.sum())
+                            if offsets.size:
+                                stats['max_abs_delta_ms'] = max(stats['max_abs_delta_ms'], float(offsets.max()))
+                finally:
+                    # Streams the reference outlived: drop their spill files before the directory goes
+                    for blocks in [ref_blocks, *other_blocks.values()]:
+                        blocks.close()
+            parts = writer.close()
+        except Exception:
+            writer.abort()
+            raise
+
+        for stats in matched.values():
+            stats['share'] = round(stats['rows'] / rows, 4) if rows else 0.0
+            stats['mean_abs_delta_ms'] = round(stats.pop('abs_delta_sum_ms') / stats['rows'], 3) if stats['rows'] else None
+        manifest = {
+            'reference': {'modality': reference[0], 'aggregation_name': reference[1], 'label': ref_label},
+            'others': [{'modality': m, 'aggregation_name': n, 'label': l} for (m, n), l in zip(streams[1:], labels[1:])],
+            'tolerance_ms': tolerance_ms, 'direction': direction, 'build_id': build_id,
+            'total_records': rows, 'matched': matched, 'parts': parts,
+            'schema': writer.schema.to_string() if writer.schema else None,
+            'processing_duration_seconds': round(time.perf_counter() - start, 3),
+        }
+        manifest_path = f"{prefix}/_manifest.json"
+        container = silver._container()
+        current = _manifest_build(container, manifest_path)
+        if current is not None and current > build_id:
+            # A later build of the same streams finished first; it is the one to keep
+            for part in parts:
+                container.delete_blob(part['path'])
+            print(f"⏱️  Aligned {ref_label} {reference[1]}: superseded by build {current}, discarded")
+            return manifest
+        container.get_blob_client(manifest_path).upload_blob(json.dumps(manifest, indent=2), overwrite=True)
+
+        # Only earlier builds of this stream set: a concurrent later build keeps its parts
+        for blob in container.list_blobs(name_starts_with=prefix + '/part-'):
+            match = _PART_BUILD.search(blob.name)
+            if match and match.group(1) < build_id:
+                container.delete_blob(blob.name)
+        print(f"⏱️  Aligned {ref_label} {reference[1]}: {rows:,} records, "
+              + ', '.join(f"{l} {s['share']:.0%}" for l, s in matched.items())
+              + f" within {tolerance_ms} ms in {manifest['processing_duration_seconds']}s")
+        return manifest
+
+    # ── Streams ──
+    def frame_stream(self, modality, aggregation_name):
+        """FRAME_DTYPE blocks (in any order) of one built Silver aggregation."""
+        prefix = _partition_prefix(modality, aggregation_name)
+        try:
+            raw = self.silver._container().get_blob_client(f"{prefix}/_manifest.json").download_blob().readall()
+        except ResourceNotFoundError:
+            raise ValueError(f"{modality}/{aggregation_name} has no Silver build yet")
+        parts = self._iter_parts(json.loads(raw)['parts'])
+        first = next(parts, None)
+        if first is None:
+            return
+        names = first.schema_arrow.names
+        parts = _chain(first, parts)
+        if 'variable' in names and 'store_path' in names:
+            yield from self._array_frames(parts, aggregation_name)
+        elif 'metadata_json' in names:
+            yield from self._filename_frames(parts, aggregation_name)
+        else:
+            column = next((n for want in TIMESTAMP_COLUMNS for n in names if n.lower() == want), None)
+            if column is None:
+                raise ValueError(f"{aggregation_name}: no timestamp column among {names}")
+            yield from self._table_frames(parts, column)
+
+    def _iter_parts(self, parts):
+        """Each Parquet part as a local ParquetFile, one at a time (the previous one is deleted)."""
+        container = self.silver._container()
+        for part in parts:
+            fd, local_path = tempfile.mkstemp(suffix='.parquet', prefix='align_part_')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    container.get_blob_client(part['path']).download_blob(max_concurrency=4).readinto(f)
+                yield pq.ParquetFile(local_path)
+            finally:
+                os.remove(local_path)
+
+    def _table_frames(self, parts, column):
+        """One record per frame: the frame's earliest timestamp. Frames are contiguous in the parts."""
+        clock = _Clock()
+        carry = None   # earliest timestamp so far of the last frame, which may continue in the next batch
+        for pf in parts:
+            for batch in pf.iter_batches(batch_size=self.block_rows, columns=[column, 'source_file_id', 'frame']):
+                ns, valid = clock.nanoseconds(batch.column(0))
+                fid   = batch.column(1).to_numpy(zero_copy_only=False)[valid]
+                frame = batch.column(2).to_numpy(zero_copy_only=False)[valid]
+                ns    = ns[valid]
+                if carry is not None:
+                    ns, fid, frame = (np.concatenate([c, v]) for c, v in zip(carry, (ns, fid, frame)))
+                if not len(ns):
+                    continue
+                starts = np.flatnonzero(np.r_[True, (frame[1:] != frame[:-1]) | (fid[1:] != fid[:-1])])
+                earliest = np.minimum.reduceat(ns, starts)
+                last = starts[-1]
+                carry = (earliest[-1:], fid[last:last + 1], frame[last:last + 1])
+                yield _frames(earliest[:-1], fid[starts[:-1]], frame[starts[:-1]])
+        if carry is not None:
+            yield _frames(*carry)
+
+    def _filename_frames(self, parts, aggregation_name):
+        """One record per file, timestamped by its name (1625091000.123456.pcd)."""
+        clock = _Clock()
+        for pf in parts:
+            for batch in pf.iter_batches(batch_size=self.block_rows, columns=['filename', 'source_file_id', 'frame']):
+                names = batch.column(0).to_pylist()
+                stamps = np.array([max(_NUMBER.findall(n) or ['nan'], key=len) for n in names], dtype=np.float64)
+                ns, valid = clock.nanoseconds(stamps)
+                if valid.any() and ns[valid].min() < _EPOCH_FLOOR_NS:
+                    raise ValueError(f"{aggregation_name}: filenames are not timestamps (e.g. {names[0]})")
+                yield _frames(ns[valid], batch.column(1).to_numpy()[valid], batch.column(2).to_numpy()[valid])
+
+    def _array_frames(self, parts, aggregation_name):
+        """
+        One record per snapshot: the timestamp vector of each timestamps_*
+        file, read from its array store in blocks. Records point at the
+        channels_* file of the same name, whose rows they timestamp.
+        """
+        catalog   = pd.concat([pf.read(columns=['filename', 'source_file_id', 'frame', 'variable',
+                                                'shape', 'store_path']).to_pandas() for pf in parts])
+        files     = catalog.drop_duplicates('filename').set_index('filename')
+        stamped   = catalog[catalog['filename'].str.contains(TIMESTAMP_FILE) & catalog['store_path'].notna()]
+        if stamped.empty:
+            raise ValueError(f"{aggregation_name}: no timestamps files to align")
+        container = self.silver._container()
+        for filename, variables in stamped.groupby('filename', sort=False):
+            shapes = [json.loads(s) for s in variables['shape']]
+            vectors = [(v, s) for v, s in zip(variables['variable'], shapes) if sum(n > 1 for n in s) == 1]
+            if not vectors:
+                print(f"⚠️  No timestamp vector in {filename}")
+                continue
+            variable, shape = next((vs for vs in vectors if TIMESTAMP_VARIABLE.search(vs[0])), vectors[0])
+            target = files.loc[TIMESTAMP_FILE.sub('channels', filename)] \
+                if TIMESTAMP_FILE.sub('channels', filename) in files.index else files.loc[filename]
+            reader = ArrayStoreReader(container, variables['store_path'].iloc[0])
+            clock  = _Clock()
+            axis   = int(np.argmax(shape))
+            for begin in range(0, shape[axis], self.block_rows):
+                end = min(begin + self.block_rows, shape[axis])
+                selection = [(begin, end, 1) if a == axis else 0 for a in range(len(shape))]
+                ns, valid = clock.nanoseconds(reader.read(variable, selection).ravel())
+                rows = np.arange(begin, end, dtype=np.int64)
+                yield _frames(ns[valid], np.full(int(valid.sum()), target['source_file_id']),
+                              np.full(int(valid.sum()), target['frame']), rows[valid])
+
+class _Clock:
+    """Converts a stream's timestamps to ns; the unit is fixed by the first block that has any."""
+
+    def __init__(self):
+        self.unit = None
+
+    def nanoseconds(self, values):
+        if isinstance(values, (pa.Array, pa.ChunkedArray)):
+            if pa.types.is_timestamp(values.type) or pa.types.is_date(values.type):
+                values = values.cast(pa.timestamp('ns')).to_numpy(zero_copy_only=False)
+            elif pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+                parsed = pd.to_datetime(values.to_pandas(), utc=True, errors='coerce')
+                values = parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+            else:
+                values = values.to_numpy(zero_copy_only=False)
+        values = np.asarray(values)
+        if self.unit is None and values.dtype.kind in 'iuf':
+            if values.dtype.kind == 'f' and not np.isfinite(values).any():
+                return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+            self.unit = timestamp_unit(values[:10000])
+        return to_nanoseconds(values, self.unit or 's')
+
+def _frames(timestamps, source_file_ids, frames, rows=None):
+    out = np.empty(len(timestamps), dtype=FRAME_DTYPE)
+    out['timestamp']      = timestamps
+    out['source_file_id'] = source_file_ids
+    out['frame']          = frames
+    out['row']            = 0 if rows is None else rows
+    return out
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+# part-<build id>-<n>.parquet; build ids start with a UTC timestamp, so they sort by start time
+_PART_BUILD = re.compile(r'/part-(\d{8}T\d{12}-[0-9a-f]+)-\d+\.parquet$')
+
+def _stream_set(labels, streams):
+    """Path segment for the set of aligned streams: readable labels plus a hash of the exact aggregations."""
+    digest = hashlib.sha1(json.dumps(sorted(map(list, streams))).encode()).hexdigest()[:10]
+    return '+'.join(sorted(labels)) + '-' + digest
+
+def _manifest_build(container, manifest_path):
+    """build_id of the manifest currently recorded at manifest_path, or None."""
+    try:
+        return json.loads(container.get_blob_client(manifest_path).download_blob().readall())['build_id']
+    except ResourceNotFoundError:
+        return None
+
+def _labels(streams):
+    """Column prefix per stream: the modality, or modality_dataset where a modality repeats."""
+    modalities = [m for m, _ in streams]
+    labels = [m if modalities.count(m) == 1 else f"{m}_{re.sub(r'[^0-9A-Za-z]+', '_', posixpath.basename(n))}"
+              for m, n in streams]
+    if len(set(labels)) != len(labels):
+        raise ValueError("Each aggregation can only be aligned once")
+    return labels
+
+def _aligned_table(ref_label, block, matches):
+    columns = {
+        'timestamp':                   pa.array(block['timestamp'].view('datetime64[ns]'), pa.timestamp('ns', tz='UTC')),
+        f'{ref_label}_source_file_id': block['source_file_id'],
+        f'{ref_label}_frame':          block['frame'],
+        f'{ref_label}_row':            block['row'],
+    }
+    for label, (records, delta, valid) in matches.items():
+        missing = ~valid
+        columns[f'{label}_source_file_id'] = pa.array(records['source_file_id'], mask=missing)
+        columns[f'{label}_frame']          = pa.array(records['frame'], mask=missing)
+        columns[f'{label}_row']            = pa.array(records['row'], mask=missing)
+        columns[f'{label}_delta_ms']       = pa.array(delta / 1e6, mask=missing)
+    return pa.table(columns)
@@ -0,0 +1,330 @@
+"""
+Chunked, compressed array store for Silver MAT / HDF5 workspaces.
+
+Every variable of a workspace becomes an N-d array split into fixed-shape
+chunks, each compressed on its own and stored as one blob, so a slice reads
+only the chunks it overlaps. The layout is Zarr v2 (consolidated metadata,
+zstd chunks), which zarr / xarray can open directly:
+
+    <store>/.zgroup, .zattrs
+    <store>/<variable>/.zarray, .zattrs
+    <store>/<variable>/<i>.<j>.<k>     chunk (i, j, k), C order, padded at the edges
+    <store>/.zmetadata                 every .z* document; written last
+
+.zmetadata only exists for a complete store, so readers and rebuilds treat
+a store without it as absent.
+
+Chunks follow channel_chunks(): CSI arrays are time x antenna x subcarrier,
+and reads are "a few antennas / subcarriers over a time range", so the
+small axes are split finely and the time axis fills each chunk.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pyarrow as pa
+from azure.core.exceptions import ResourceNotFoundError
+from dotenv import load_dotenv
+from backend.processors.array_stats import iter_blocks
+
+load_dotenv()
+
+# Uncompressed bytes per chunk: small enough that a narrow slice reads
+# kilobytes, large enough that a full scan is not dominated by request overhead
+CHUNK_TARGET_BYTES = int(os.getenv('SILVER_ARRAY_CHUNK_KB', '64')) * 1024
+
+COMPRESSION_LEVEL = 3
+COMPRESSOR        = {'id': 'zstd', 'level': COMPRESSION_LEVEL}
+
+# Axes up to this length are antennas / streams (read one at a time); longer
+# non-time axes are subcarriers, read in runs of SUBCARRIER_CHUNK
+ANTENNA_AXIS_MAX  = 16
+SUBCARRIER_CHUNK  = 32
+
+def channel_chunks(shape, itemsize, target_bytes=CHUNK_TARGET_BYTES):
+    """
+    Chunk shape for a channel array. The longest axis is taken as time; an
+    array that fits in one chunk is stored whole.
+    """
+    shape = tuple(int(n) for n in shape)
+    if not shape:
+        return ()
+    if int(np.prod(shape, dtype=np.int64)) * itemsize <= target_bytes:
+        return tuple(max(n, 1) for n in shape)
+    time_axis = int(np.argmax(shape))
+    chunks = [1 if n <= ANTENNA_AXIS_MAX else min(n, SUBCARRIER_CHUNK) for n in shape]
+    others = int(np.prod(chunks[:time_axis] + chunks[time_axis + 1:], dtype=np.int64))
+    chunks[time_axis] = int(min(shape[time_axis], max(1, target_bytes // (itemsize * others))))
+    return tuple(chunks)
+
+def store_dtype(dtype):
+    """The little-endian dtype an array is stored as (MATLAB {real, imag} compounds become complex)."""
+    dtype = np.dtype(dtype)
+    if dtype.names and {'real', 'imag'} <= set(dtype.names):
+        dtype = np.dtype(np.complex64 if dtype['real'].itemsize <= 4 else np.complex128)
+    return dtype.newbyteorder('<') if dtype.itemsize > 1 else dtype
+
+def chunk_key(index):
+    return '.'.join(str(i) for i in index) if index else '0'
+
+def _codec():
+    return pa.Codec('zstd', compression_level=COMPRESSION_LEVEL)
+
+class ArrayStoreWriter:
+    """
+    Writes the variables of one workspace into a store. write_array() reads
+    the source in chunk-aligned blocks within the memory budget and uploads
+    the compressed chunks on a bounded thread pool; close() writes the
+    consolidated metadata that marks the store complete.
+    """
+
+    def __init__(self, container, store_path, concurrency=8):
+        self.container   = container
+        self.store_path  = store_path.rstrip('/')
+        self.concurrency = concurrency
+        self.metadata    = {'.zgroup': {'zarr_format': 2}}
+        self.arrays      = {}
+
+    def _put(self, key, data):
+        self.container.get_blob_client(f"{self.store_path}/{key}").upload_blob(data, overwrite=True)
+
+    def write_array(self, name, shape, dtype, read_block, memory_budget, chunks=None, attrs=None):
+        """
+        Stores one variable. read_block(selection) returns the array's values
+        for a tuple of slices. Returns {shape, dtype, chunks, stored_bytes}.
+        """
+        shape  = tuple(int(n) for n in shape)
+        dtype  = store_dtype(dtype)
+        chunks = tuple(chunks or channel_chunks(shape, dtype.itemsize))
+        codec  = _codec()
+        limit  = max(int(np.prod(chunks, dtype=np.int64)),
+                     memory_budget // (2 * dtype.itemsize))   # the block plus one chunk copy each
+
+        stored = 0
+        lock   = threading.Lock()
+
+        def upload(key, chunk):
+            nonlocal stored
+            data = codec.compress(pa.py_buffer(np.ascontiguousarray(chunk)), asbytes=True)
+            self._put(f"{name}/{key}", data)
+            with lock:
+                stored += len(data)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = set()
+            for block_sel in iter_blocks(shape, chunks, limit):
+                block = _to_store(read_block(block_sel), dtype)
+                for key, chunk in _split_block(block, block_sel, chunks):
+                    pending.add(pool.submit(upload, key, chunk))
+                    if len(pending) >= self.concurrency * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                del block
+            for future in pending:
+                future.result()
+
+        zarray = {
+            'zarr_format': 2, 'shape': list(shape), 'chunks': list(chunks), 'dtype': dtype.str,
+            'compressor': COMPRESSOR, 'fill_value': None, 'order': 'C', 'filters': None,
+            'dimension_separator': '.',
+        }
+        zattrs = dict(attrs or {}, stored_bytes=stored)
+        self._put(f"{name}/.zarray", json.dumps(zarray))
+        self._put(f"{name}/.zattrs", json.dumps(zattrs))
+        self.metadata[f"{name}/.zarray"] = zarray
+        self.metadata[f"{name}/.zattrs"] = zattrs
+        self.arrays[name] = {'shape': list(shape), 'dtype': dtype.str, 'chunks': list(chunks),
+                             'stored_bytes': stored}
+        return self.arrays[name]
+
+    def close(self, attrs=None):
+        """Group documents, then .zmetadata: the store is complete from here on."""
+        self.metadata['.zattrs'] = dict(attrs or {})
+        self._put('.zgroup', json.dumps(self.metadata['.zgroup']))
+        self._put('.zattrs', json.dumps(self.metadata['.zattrs']))
+        self._put('.zmetadata', json.dumps({'zarr_consolidated_format': 1, 'metadata': self.metadata}))
+        return self.arrays
+
+def _to_store(block, dtype):
+    block = np.asarray(block)
+    if block.dtype.names:
+        values = np.empty(block.shape, dtype=dtype)
+        values.real, values.imag = block['real'], block['imag']
+        return values
+    return block.astype(dtype, copy=False)
+
+def _split_block(block, block_sel, chunks):
+    """(chunk key, full-shape chunk) for each chunk in a chunk-aligned block; edge chunks are zero-padded."""
+    starts = [s.start for s in block_sel]
+    ranges = [range(0, n, c) for n, c in zip(block.shape, chunks)]
+    for offsets in np.ndindex(*(len(r) for r in ranges)):
+        local = tuple(slice(r[o], r[o] + c) for r, o, c in zip(ranges, offsets, chunks))
+        piece = block[local]
+        if piece.shape != tuple(chunks):
+            padded = np.zeros(chunks, dtype=block.dtype)
+            padded[tuple(slice(0, n) for n in piece.shape)] = piece
+            piece = padded
+        yield chunk_key([(st + r[o]) // c for st, r, o, c in zip(starts, ranges, offsets, chunks)]), piece
+
+# ── Reading ──
+# Stores are content-addressed (file hash in the path), so metadata never goes stale
+_metadata_cache = OrderedDict()
+_metadata_lock  = threading.Lock()
+_METADATA_CACHE_SIZE = 256
+
+def load_metadata(container, store_path):
+    """The store's consolidated metadata, or None if the store is missing or incomplete."""
+    with _metadata_lock:
+        if store_path in _metadata_cache:
+            _metadata_cache.move_to_end(store_path)
+            return _metadata_cache[store_path]
+    try:
+        raw = container.get_blob_client(f"{store_path}/.zmetadata").download_blob().readall()
+    except ResourceNotFoundError:
+        return None
+    metadata = json.loads(raw)['metadata']
+    with _metadata_lock:
+        _metadata_cache[store_path] = metadata
+        while len(_metadata_cache) > _METADATA_CACHE_SIZE:
+            _metadata_cache.popitem(last=False)
+    return metadata
+
+def parse_selection(text, shape):
+    """
+    NumPy-style selection string -> one int or (start, stop, step) per axis:
+    '100:200,0,:' or '::10,3'. Missing trailing axes are taken whole.
+    Raises ValueError on bad syntax, out-of-range indices or steps < 1.
+    """
+    parts = [p.strip() for p in text.split(',')] if text and text.strip() else []
+    if len(parts) > len(shape):
+        raise ValueError(f"{len(parts)} indices for a {len(shape)}-d array")
+    selection = []
+    for axis, n in enumerate(shape):
+        part = parts[axis] if axis < len(parts) else ':'
+        if ':' not in part:
+            index = int(part)
+            if not -n <= index < n:
+                raise ValueError(f"index {index} is out of range for axis {axis} with size {n}")
+            selection.append(index % n)
+            continue
+        fields = part.split(':')
+        if len(fields) > 3:
+            raise ValueError(f"bad slice '{part}'")
+        start, stop, step = (int(f) if f.strip() else None for f in fields + [''] * (3 - len(fields)))
+        if step is not None and step < 1:
+            raise ValueError("slice steps must be positive")
+        selection.append(slice(start, stop, step).indices(n))
+    return selection
+
+def selection_shape(selection):
+    return tuple(len(range(*s)) for s in selection if not isinstance(s, int))
+
+class ArrayStoreReader:
+    """Reads hyperslabs of a store, fetching only the chunks they overlap (in parallel)."""
+
+    def __init__(self, container, store_path, concurrency=8):
+        self.container   = container
+        self.store_path  = store_path.rstrip('/')
+        self.concurrency = concurrency
+        self.metadata    = load_metadata(container, self.store_path)
+        self.last_read   = {'chunks': 0, 'bytes': 0}
+
+    @property
+    def exists(self):
+        return self.metadata is not None
+
+    def variables(self):
+        """{name: {shape, dtype, chunks, attrs}} from the consolidated metadata."""
+        out = {}
+        for key, zarray in (self.metadata or {}).items():
+            if key.endswith('/.zarray'):
+                name = key[:-len('/.zarray')]
+                out[name] = {'shape': zarray['shape'], 'dtype': zarray['dtype'], 'chunks': zarray['chunks'],
+                             'attrs': self.metadata.get(f"{name}/.zattrs", {})}
+        return out
+
+    def skipped(self):
+        """{name: {shape, dtype, reason}} of variables the conversion left out."""
+        return (self.metadata or {}).get('.zattrs', {}).get('skipped', {})
+
+    def array_info(self, name):
+        zarray = (self.metadata or {}).get(f"{name}/.zarray")
+        if zarray is None:
+            raise KeyError(name)
+        return zarray
+
+    def touched_chunks(self, name, selection):
+        """How many chunks read(name, selection) fetches, without fetching any."""
+        zarray = self.array_info(name)
+        count = 1
+        for s, c in zip(selection, zarray['chunks']):
+            start, stop, step = (s, s + 1, 1) if isinstance(s, int) else s
+            n = len(range(start, stop, step))
+            if n == 0:
+                return 0
+            last = start + (n - 1) * step
+            # A step shorter than a chunk touches every chunk in between; a longer one, one chunk per index
+            count *= n if step >= c else last // c - start // c + 1
+        return count
+
+    def read(self, name, selection):
+        """
+        The values at a parse_selection() selection, as a NumPy array (int
+        axes dropped). Each touched chunk is fetched and decoded on its own
+        and only its selected elements are copied into the output, so memory
+        is the output plus one chunk per worker.
+        """
+        zarray = self.array_info(name)
+        chunks, dtype = zarray['chunks'], np.dtype(zarray['dtype'])
+        plans = [_axis_plan((s, s + 1, 1) if isinstance(s, int) else s, c) for s, c in zip(selection, chunks)]
+        out = np.empty([sum(p[1].stop - p[1].start for p in plan) for plan in plans], dtype=dtype)
+        if out.size == 0:
+            self.last_read = {'chunks': 0, 'bytes': 0}
+            return out.reshape(selection_shape(selection))
+
+        codec  = _codec()
+        nbytes = int(np.prod(chunks, dtype=np.int64)) * dtype.itemsize
+        index  = list(np.ndindex(*(len(plan) for plan in plans)))
+
+        def fetch(offsets):
+            parts = [plan[o] for plan, o in zip(plans, offsets)]
+            key   = chunk_key([chunk for chunk, _, _ in parts])
+            dest  = tuple(d for _, d, _ in parts)
+            try:
+                data = self.container.get_blob_client(f"{self.store_path}/{name}/{key}").download_blob().readall()
+            except ResourceNotFoundError:
+                out[dest] = 0   # never written: the fill value
+                return 0
+            raw = codec.decompress(data, decompressed_size=nbytes, asbytes=True)
+            out[dest] = np.frombuffer(raw, dtype=dtype).reshape(chunks)[tuple(src for _, _, src in parts)]
+            return len(data)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(index))) as pool:
+            fetched = sum(pool.map(fetch, index))
+        self.last_read = {'chunks': len(index), 'bytes': fetched}
+        return out.reshape(selection_shape(selection))
+
+def _axis_plan(selection, chunk):
+    """
+    One axis of a read: for each chunk its (start, stop, step) touches,
+    (chunk index, slice of the output, slice within the chunk). A regular
+    step stays regular inside a chunk, so both are plain slices.
+    """
+    start, stop, step = selection
+    n = len(range(start, stop, step))
+    if n == 0:
+        return []
+    plan, i = [], 0
+    while i < n:
+        index = start + i * step
+        owner = index // chunk
+        # Selected indices left in this chunk: up to its end, or the selection's
+        count = min((((owner + 1) * chunk - 1 - index) // step) + 1, n - i)
+        first = index - owner * chunk
+        plan.append((owner, slice(i, i + count), slice(first, first + (count - 1) * step + 1, step)))
+        i += count
+    return plan
@@ -1,28 +1,55 @@
 import os
+import json
+import base64
+import time
 import pymssql
+import posixpath
+from backend.utils.db_pool import get_connection
 import hashlib
-from azure.storage.blob import BlobServiceClient
+import hmac
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from werkzeug.utils import secure_filename
 from datetime import datetime, timezone  # <--import with standard datetime
 from dotenv import load_dotenv
+from backend.processors.stream_analyzers import AnalyzerTee
+from backend.services.metadata_cache import MetadataCache
+from backend.services.gold_service import GoldService
+from backend.utils.blob_io import get_blob_client, get_service_client, read_range, upload_blocks
 
 load_dotenv()
 
+def encode_cursor(upload_time, row_id):
+    """Opaque listing cursor pointing just past (upload_time, id)."""
+    raw = json.dumps({'t': upload_time.isoformat(), 'id': row_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(upload_time, id) or None; ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(raw['t']), int(raw['id'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
 class BronzeService:
 
     def __init__(self, db_source, upload_root):
         self.upload_root        = upload_root
         self.connection_string  = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
         self.container_name     = os.getenv('BRONZE_CONTAINER_NAME', 'bronze-layer')
+        # Blocks staged concurrently per upload (scripts/bench_blob_upload.py compares 1/4/16)
+        self.upload_concurrency = int(os.getenv('BRONZE_UPLOAD_CONCURRENCY', '8'))
+        # Batch uploads: files in flight x blocks in flight per file
+        self.batch_file_concurrency  = int(os.getenv('BRONZE_BATCH_FILE_CONCURRENCY', '8'))
+        self.batch_block_concurrency = int(os.getenv('BRONZE_BATCH_BLOCK_CONCURRENCY', '4'))
+        # Gold aggregates move in the same transaction as every bronze insert / soft delete
+        self.gold = GoldService()
 
     def get_db_connection(self):
-        return pymssql.connect(
-            server   = os.getenv("AZURE_SQL_SERVER"),
-            user     = os.getenv("AZURE_SQL_USER"),
-            password = os.getenv("AZURE_SQL_PASSWORD"),
-            database = os.getenv("AZURE_SQL_DATABASE"),
-            as_dict  = True
-        )
+        # Pooled: close() returns the connection instead of disconnecting
+        return get_connection()
 
     def _get_researcher_name(self, user_email, user_full_name):
         """
@@ -37,142 +64,204 @@ class BronzeService:
         # Fallback: use email prefix
         return user_email.split('@')[0].lower().replace('.', '_')
 
+    def _blob_location(self, filename, dataset_name, researcher):
+        """Blob path: pratyusha/radar0/0001.csv (or pratyusha/0001.csv without a dataset)."""
+        if dataset_name in ('Default_Dataset', '', None):
+            return f"{researcher}/{filename}", None
+        safe_folder = secure_filename(dataset_name)
+        return f"{researcher}/{safe_folder}/{filename}", safe_folder
+
+    def _hash_spool(self, file_obj):
+        """
+        SHA-256 of an upload that is already on this server. Werkzeug spools
+        request files to local disk, so this costs a local read, not a transfer.
+        """
+        sha256_hash = hashlib.sha256()
+        size = 0
+        file_obj.seek(0)
+        while True:
+            chunk = file_obj.read(4 * 1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            sha256_hash.update(chunk)
+        file_obj.seek(0)
+        return sha256_hash.hexdigest(), size
+
+    def find_existing(self, file_hash, user_id=None, blob_path=None):
+        """
+        The live bronze record already holding this content, or None. A record
+        of this user at this exact path is preferred, so re-uploads are skipped.
+        """
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT TOP 1 id, filename, file_path, file_size, file_hash,
+                       user_id, dataset_folder, metadata_json
+                FROM bronze_files
+                WHERE file_hash = %s
+                  AND is_deleted = 0
+                ORDER BY CASE WHEN user_id = %s AND dataset_folder = %s THEN 0 ELSE 1 END, id
+            """, (file_hash, user_id, blob_path))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def paths_in_use(self, blob_paths):
+        """The given blob paths that a live bronze record points at (its own upload, or links to it)."""
+        paths  = list(dict.fromkeys(blob_paths))
+        in_use = set()
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        # Seeks IX_bronze_files_path_hash; file_path is compared too, in case of a collision
+        path_hash = "CAST(HASHBYTES('SHA2_256', CAST(%s AS NVARCHAR(MAX))) AS BINARY(32))"
+        try:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                cursor.execute(f"""
+                    SELECT DISTINCT file_path
+                    FROM bronze_files
+                    WHERE file_path_hash IN ({', '.join([path_hash] * len(chunk))})
+                      AND file_path IN ({', '.join(['%s'] * len(chunk))})
+                      AND is_deleted = 0
+                """, tuple(chunk) + tuple(chunk))
+                in_use.update(row['file_path'] for row in cursor.fetchall())
+            return in_use
+        finally:
+            conn.close()
+
+    def _upload_path(self, blob_path, file_hash, in_use):
+        """
+        Where new content for blob_path is written. Records (and links to them)
+        rely on their file_path holding file_hash, so a blob a live record
+        points at is never overwritten: changed content gets a path of its own,
+        pratyusha/radar0/_versions/<hash[:16]>/0001.csv.
+        """
+        if blob_path not in in_use:
+            return blob_path
+        return posixpath.join(posixpath.dirname(blob_path), '_versions', file_hash[:16],
+                              posixpath.basename(blob_path))
+
+    def _supersede(self, cursor, user_id, dataset_folders, upload_time, user_full_name, user_email):
+        """
+        Soft-deletes the user's live records at the given locations before new
+        content is recorded there (in the caller's transaction). Their blobs stay,
+        so links to them keep serving the bytes they were hashed from.
+        """
+        superseded = []
+        folders = list(dict.fromkeys(dataset_folders))
+        for start in range(0, len(folders), 1000):
+            chunk = folders[start:start + 1000]
+            cursor.execute(f"""
+                UPDATE bronze_files
+                SET is_deleted = 1
+                OUTPUT INSERTED.id, INSERTED.dataset_name, INSERTED.file_path
+                WHERE user_id = %s
+                  AND is_deleted = 0
+                  AND dataset_folder IN ({', '.join(['%s'] * len(chunk))})
+            """, (user_id, *chunk))
+            superseded += cursor.fetchall()
+        if superseded:
+            self._insert_lineage_many(cursor, [
+                (row['id'], row['dataset_name'] or 'root', row['file_path'],
+                 user_full_name, user_email, upload_time, 'superseded')
+                for row in superseded
+            ])
+            self.gold.apply(cursor, [row['id'] for row in superseded], sign=-1)
+            print(f"♻️  Superseded {len(superseded)} earlier version(s)")
+        return superseded
+
     def process_upload(self, file_obj, dataset_name, user_email,
                        user_id, user_full_name):
         """
-        Process a single file upload.
+        Process a single file upload, hash first.
 
         BLOB PATH:  pratyusha/radar0/0001.csv
         SQL RECORD: filename=0001.csv, researcher=Pratyusha Adibhatla,
                     blob_path=pratyusha/radar0/0001.csv, upload_time=UTC
+
+        Content we already hold is never sent to Blob Storage again: the new
+        record points at the existing blob (see _link_duplicate). New content
+        never overwrites a blob that live records point at (see _upload_path),
+        and the user's earlier record at the same location is superseded.
         """
         filename      = secure_filename(file_obj.filename)
-        # Capture the exact, raw UTC time of ingestion
-        upload_time   = datetime.now(timezone.utc) 
         ext           = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'unknown'
         researcher    = self._get_researcher_name(user_email, user_full_name)
+        blob_path, display_folder = self._blob_location(filename, dataset_name, researcher)
 
-        # ── Blob path: pratyusha/radar0/0001.csv
-        if dataset_name in ('Default_Dataset', '', None):
-            blob_path    = f"{researcher}/{filename}"
-            display_folder = None
-        else:
-            safe_folder  = secure_filename(dataset_name)
-            blob_path    = f"{researcher}/{safe_folder}/{filename}"
-            display_folder = safe_folder
-
-        # ── 1. Stream to Azure Blob 
-        sha256_hash = hashlib.sha256()
-        file_size   = 0
+        # ── 1. Hash the local spool and check for the content before any transfer
+        spool_hash, spool_size = self._hash_spool(file_obj)
+        existing = self.find_existing(spool_hash, user_id, blob_path)
+        if existing:
+            return self._link_duplicate(existing, filename, ext, blob_path, display_folder,
+                                        user_id, user_email, user_full_name)
+
+        # Capture the exact, raw UTC time of ingestion
+        upload_time   = datetime.now(timezone.utc) 
+
+        # ── 2. Block-parallel upload to Azure Blob (hash + metadata analyzers see the blocks in order)
+        analyzers   = AnalyzerTee(filename, ext)
+        upload_path = self._upload_path(blob_path, spool_hash, self.paths_in_use([blob_path]))
 
         try:
-            bsc         = BlobServiceClient.from_connection_string(self.connection_string)
-            blob_client = bsc.get_blob_client(
+            blob_client = get_service_client().get_blob_client(
                 container = self.container_name,
-                blob      = blob_path
+                blob      = upload_path
             )
 
-            print(f"🚀 Uploading → {blob_path}")
+            print(f"🚀 Uploading → {upload_path} ({self.upload_concurrency} blocks in flight)")
             file_obj.seek(0)
+            start = time.perf_counter()
+            final_hash, file_size = upload_blocks(
+                blob_client, file_obj,
+                concurrency = self.upload_concurrency,
+                on_chunk    = analyzers.feed
+            )
+            elapsed = time.perf_counter() - start
+            if final_hash != spool_hash:
+                raise ValueError(f"{filename} changed between hashing and upload")
 
-            def stream_generator():
-                nonlocal file_size
-                while True:
-                    chunk = file_obj.read(4 * 1024 * 1024)  # 4MB chunks
-                    if not chunk:
-                        break
-                    file_size += len(chunk)
-                    sha256_hash.update(chunk)
-                    yield chunk
-
-            blob_client.upload_blob(stream_generator(), overwrite=True)
-            final_hash = sha256_hash.hexdigest()
-
-            print(f"✅ Blob saved: {blob_path} ({file_size/(1024**2):.2f} MB)")
+            print(f"✅ Blob saved: {upload_path} ({file_size/(1024**2):.2f} MB, "
+                  f"{file_size/(1024**2)/max(elapsed, 1e-6):.1f} MB/s)")
 
         except Exception as e:
             print(f"❌ Blob upload failed: {e}")
             raise
 
-        # ── 2. Record in Azure SQL 
+        metadata, analyses = analyzers.finish(file_size)
+        if analyzers.analyzers or analyzers.errors:
+            print(f"🔬 Upload-time analysis: {', '.join(k for k in metadata if k != 'errors') or 'none'} "
+                  f"in {analyzers.seconds:.2f}s"
+                  + (f" (skipped: {analyzers.errors})" if analyzers.errors else ""))
+
+        # ── 3. Record in Azure SQL 
         conn   = self.get_db_connection()
         cursor = conn.cursor()
 
         try:
-            # Check duplicate
-            cursor.execute(
-                "SELECT id, filename FROM bronze_files WHERE file_hash = %s",
-                (final_hash,)
+            self._supersede(cursor, user_id, [blob_path], upload_time, user_full_name, user_email)
+            bronze_id = self._insert_bronze(
+                cursor, filename, upload_path, file_size, final_hash, ext, user_id,
+                display_folder, blob_path, upload_time, user_full_name, user_email,
+                json.dumps(metadata, default=str) if metadata else None
             )
-            existing = cursor.fetchone()
-            if existing:
-                print(f"⚠️  Duplicate: {filename} matches {existing['filename']}")
-                return True, f"Skipped duplicate: {filename}"
-
-            # Insert bronze record using UTC
-            cursor.execute("""
-                INSERT INTO bronze_files (
-                    filename,
-                    file_path,
-                    file_size,
-                    file_hash,
-                    file_extension,
-                    modality,
-                    user_id,
-                    dataset_name,
-                    dataset_folder,
-                    upload_time_utc,
-                    upload_timezone,
-                    processing_status,
-                    researcher_name,
-                    researcher_email
-                ) VALUES (
-                    %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s,
-                    'UTC', 'raw', %s, %s
-                )
-            """, (
-                filename,
-                blob_path,
-                file_size,
-                final_hash,
-                ext,
-                ext,             
-                user_id,
-                display_folder or 'root',
-                blob_path,
-                upload_time,
-                user_full_name,  
-                user_email       
-            ))
-
-            # Get new ID
-            cursor.execute("SELECT SCOPE_IDENTITY() AS id")
-            bronze_id = cursor.fetchone()['id']
-
-            # Insert lineage using UTC
-            cursor.execute("""
-                INSERT INTO data_lineage (
-                    bronze_file_id,
-                    source_dataset,
-                    source_file_path,
-                    source_researcher,
-                    source_researcher_email,
-                    upload_time_utc,
-                    transformation_type,
-                    status
-                ) VALUES (%s, %s, %s, %s, %s, %s, 'ingestion', 'success')
-            """, (
-                bronze_id,
-                display_folder or 'root',
-                blob_path,
-                user_full_name,
-                user_email,
-                upload_time
-            ))
+            self._insert_lineage(
+                cursor, bronze_id, display_folder, upload_path, user_full_name,
+                user_email, upload_time, 'ingestion'
+            )
+            self.gold.apply(cursor, [bronze_id])
 
             conn.commit()
             print(f"✅ SQL recorded: id={bronze_id}, researcher={user_full_name}")
+
+            # Seed the /api/analyze cache so the first analysis is already a hit
+            for version, analysis in analyses:
+                try:
+                    MetadataCache().store(final_hash, version, ext, analysis)
+                except Exception as e:
+                    print(f"⚠️  Could not cache upload-time analysis: {e}")
             return True, f"Uploaded {filename} ({file_size/(1024**2):.2f} MB)"
 
         except Exception as e:
@@ -182,50 +271,510 @@ class BronzeService:
         finally:
             conn.close()
 
-    def get_user_files(self, user_id):
-        """Get files grouped by folder for the current user"""
+    def link_verified(self, file_hash, filename, dataset_name, user_email,
+                      user_id, user_full_name):
+        """
+        Records a file whose bytes never reached the server: the client sent
+        its SHA-256 and passed verify_possession() against the existing blob.
+        """
+        filename   = secure_filename(filename)
+        ext        = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'unknown'
+        researcher = self._get_researcher_name(user_email, user_full_name)
+        blob_path, display_folder = self._blob_location(filename, dataset_name, researcher)
+        existing = self.find_existing(file_hash, user_id, blob_path)
+        if not existing:
+            return False, f"{filename}: content is no longer held, upload it instead"
+        return self._link_duplicate(existing, filename, ext, blob_path, display_folder,
+                                    user_id, user_email, user_full_name)
+
+    def verify_possession(self, blob_path, offset, length, nonce, proof):
+        """
+        Proof that a client holds the content behind a claimed hash: it must
+        return sha256(nonce + bytes[offset:offset+length]) for a range the
+        server picked. The server checks it with one ranged read of the blob.
+        """
+        data, _ = read_range(get_blob_client(blob_path), offset, length)
+        expected = hashlib.sha256(bytes.fromhex(nonce) + data).hexdigest()
+        return hmac.compare_digest(expected, str(proof).lower())
+
+    def _link_duplicate(self, existing, filename, ext, blob_path, display_folder,
+                        user_id, user_email, user_full_name):
+        """
+        New bronze record for content that is already in the bronze container.
+        file_path points at the existing blob; dataset_folder keeps the path
+        the file would have had, so the researcher's folder view is unchanged.
+        """
+        if existing['user_id'] == user_id and existing['dataset_folder'] == blob_path:
+            print(f"⚠️  Duplicate: {filename} is already recorded at {blob_path}")
+            return True, f"Skipped duplicate: {filename}"
+
+        upload_time = datetime.now(timezone.utc)
         conn   = self.get_db_connection()
         cursor = conn.cursor()
+        try:
+            self._supersede(cursor, user_id, [blob_path], upload_time, user_full_name, user_email)
+            bronze_id = self._insert_bronze(
+                cursor, filename, existing['file_path'], existing['file_size'],
+                existing['file_hash'], ext, user_id, display_folder,
+                blob_path, upload_time, user_full_name, user_email,
+                existing['metadata_json']
+            )
+            self._insert_lineage(
+                cursor, bronze_id, display_folder, existing['file_path'], user_full_name,
+                user_email, upload_time, 'dedupe_link'
+            )
+            self.gold.apply(cursor, [bronze_id])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ SQL insert failed: {e}")
+            raise
+        finally:
+            conn.close()
+
+        print(f"🔗 Duplicate: {filename} linked to existing blob {existing['file_path']} (id={bronze_id})")
+        return True, f"Linked duplicate: {filename} (no upload needed)"
+
+    def _insert_bronze(self, cursor, filename, file_path, file_size, file_hash, ext,
+                       user_id, display_folder, dataset_folder, upload_time,
+                       user_full_name, user_email, metadata_json):
+        # Insert bronze record using UTC
         cursor.execute("""
-            SELECT
+            INSERT INTO bronze_files (
                 filename,
+                file_path,
                 file_size,
+                file_hash,
                 file_extension,
-                file_path,
+                modality,
+                user_id,
                 dataset_name,
+                dataset_folder,
                 upload_time_utc,
+                upload_timezone,
+                processing_status,
                 researcher_name,
-                researcher_email
-            FROM bronze_files
-            WHERE user_id = %s
-              AND is_deleted = 0
-            ORDER BY upload_time_utc DESC
-        """, (user_id,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
-
-    def get_all_files_for_admin(self):
-        """Admin view - all researchers' files with full lineage"""
+                researcher_email,
+                metadata_json
+            ) VALUES (
+                %s, %s, %s, %s, %s,
+                %s, %s, %s, %s, %s,
+                'UTC', 'raw', %s, %s, %s
+            )
+        """, (
+            filename,
+            file_path,
+            file_size,
+            file_hash,
+            ext,
+            ext,             
+            user_id,
+            display_folder or 'root',
+            dataset_folder,
+            upload_time,
+            user_full_name,  
+            user_email,
+            metadata_json
+        ))
+
+        # Get new ID
+        cursor.execute("SELECT SCOPE_IDENTITY() AS id")
+        return cursor.fetchone()['id']
+
+    def _insert_lineage(self, cursor, bronze_id, display_folder, source_path,
+                        user_full_name, user_email, upload_time, transformation_type):
+        # Insert lineage using UTC
+        cursor.execute("""
+            INSERT INTO data_lineage (
+                bronze_file_id,
+                source_dataset,
+                source_file_path,
+                source_researcher,
+                source_researcher_email,
+                upload_time_utc,
+                transformation_type,
+                status
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, 'success')
+        """, (
+            bronze_id,
+            display_folder or 'root',
+            source_path,
+            user_full_name,
+            user_email,
+            upload_time,
+            transformation_type
+        ))
+
+    def process_batch(self, file_objs, dataset_name, user_email,
+                      user_id, user_full_name, ctx=None):
+        """
+        Ingest a whole dataset upload at once.
+
+        1. hash every request spool (in parallel) and look all hashes up in one query
+        2. upload only new content, several files at a time
+        3. write every bronze + lineage row in one transaction with multi-row
+           INSERTs; bronze ids come back through OUTPUT instead of one
+           SCOPE_IDENTITY() round trip per file
+
+        ctx is an optional job context (see job_service.JobContext): it gets
+        per-file progress, and cancelling it stops files that have not started.
+        Files already uploaded are still recorded, so no blob is orphaned.
+
+        Returns (succeeded, messages, errors).
+        """
+        researcher  = self._get_researcher_name(user_email, user_full_name)
+        upload_time = datetime.now(timezone.utc)
+        started     = time.perf_counter()
+
+        # Later files with the same name replace earlier ones, as sequential uploads did
+        items = {}
+        for file_obj in file_objs:
+            if not file_obj.filename:
+                continue
+            filename = secure_filename(file_obj.filename)
+            blob_path, display_folder = self._blob_location(filename, dataset_name, researcher)
+            items[blob_path] = {
+                'file_obj': file_obj, 'filename': filename, 'blob_path': blob_path,
+                'display_folder': display_folder,
+                'ext': filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'unknown',
+            }
+        items = list(items.values())
+        if not items:
+            return 0, [], []
+
+        # ── 1. Hash first, all files, one lookup
+        with ThreadPoolExecutor(max_workers=self.batch_file_concurrency) as pool:
+            for item, (digest, size) in zip(items, pool.map(lambda i: self._hash_spool(i['file_obj']), items)):
+                item['hash'], item['size'] = digest, size
+        existing, placements = self.find_existing_many([i['hash'] for i in items])
+
+        messages, errors = [], []
+        to_upload, to_link, first_seen = [], [], {}
+        for item in items:
+            known = existing.get(item['hash'])
+            if (item['hash'], user_id, item['blob_path']) in placements:
+                messages.append(f"Skipped duplicate: {item['filename']}")
+            elif known:
+                to_link.append((item, known))
+            elif item['hash'] in first_seen:
+                # Same content twice in this batch: upload once, link the rest to it
+                to_link.append((item, first_seen[item['hash']]))
+            else:
+                first_seen[item['hash']] = item
+                to_upload.append(item)
+
+        # ── 2. New content to Azure Blob, several files concurrently
+        in_use = self.paths_in_use([i['blob_path'] for i in to_upload])
+        for item in to_upload:
+            item['upload_path'] = self._upload_path(item['blob_path'], item['hash'], in_use)
+        print(f"🚀 Batch upload: {len(to_upload)} new, {len(to_link)} linked, "
+              f"{len(items) - len(to_upload) - len(to_link)} skipped")
+        uploaded = []
+        with ThreadPoolExecutor(max_workers=self.batch_file_concurrency) as pool:
+            futures = {pool.submit(self._upload_item, item): item for item in to_upload}
+            for done, future in enumerate(as_completed(futures), start=1):
+                item = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    future.result()
+                    uploaded.append(item)
+                except Exception as e:
+                    print(f"❌ Blob upload failed for {item['filename']}: {e}")
+                    errors.append(f"{item['filename']}: {e}")
+                if ctx:
+                    ctx.progress(done / len(futures), f"Uploaded {done}/{len(futures)} files")
+                    if ctx.cancelled():
+                        for pending in futures:
+                            pending.cancel()
+        # Content a link can point at: already held, or uploaded just now
+        available = set(existing) | {i['hash'] for i in uploaded}
+        to_link = [(item, self._as_source(source)) for item, source in to_link]
+        skipped = len(items) - len(to_upload) - len(to_link)
+
+        # ── 3. All bronze + lineage rows in one transaction
+        bronze_rows, lineage_rows = [], []
+        for item in uploaded:
+            bronze_rows.append(self._bronze_row(
+                item, item['upload_path'], item['size'], item.get('metadata'),
+                user_id, upload_time, user_full_name, user_email))
+            lineage_rows.append((item, item['upload_path'], 'ingestion'))
+        for item, source in to_link:
+            if source['file_hash'] not in available:
+                errors.append(f"{item['filename']}: its duplicate in this batch failed to upload")
+                continue
+            bronze_rows.append(self._bronze_row(
+                item, source['file_path'], source['file_size'], source.get('metadata_json'),
+                user_id, upload_time, user_full_name, user_email))
+            lineage_rows.append((item, source['file_path'], 'dedupe_link'))
+
+        if bronze_rows:
+            conn   = self.get_db_connection()
+            cursor = conn.cursor()
+            try:
+                self._supersede(cursor, user_id, [item['blob_path'] for item, _, _ in lineage_rows],
+                                upload_time, user_full_name, user_email)
+                ids = self._insert_bronze_many(cursor, bronze_rows)
+                self._insert_lineage_many(cursor, [
+                    (ids[item['blob_path']], item['display_folder'] or 'root', source_path,
+                     user_full_name, user_email, upload_time, transformation_type)
+                    for item, source_path, transformation_type in lineage_rows
+                ])
+                self.gold.apply(cursor, ids.values())
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ SQL batch insert failed: {e}")
+                raise
+            finally:
+                conn.close()
+
+        for item in uploaded:
+            messages.append(f"Uploaded {item['filename']} ({item['size']/(1024**2):.2f} MB)")
+            for version, analysis in item.get('analyses', []):
+                try:
+                    MetadataCache().store(item['hash'], version, item['ext'], analysis)
+                except Exception as e:
+                    print(f"⚠️  Could not cache upload-time analysis: {e}")
+        messages += [f"Linked duplicate: {item['filename']} (no upload needed)"
+                     for item, source in to_link if source['file_hash'] in available]
+
+        print(f"✅ Batch recorded: {len(bronze_rows)} files in "
+              f"{time.perf_counter() - started:.2f}s, researcher={user_full_name}")
+        if ctx:
+            ctx.checkpoint()   # report a cancelled batch as cancelled, after recording what landed
+        return len(bronze_rows) + skipped, messages, errors
+
+    def find_existing_many(self, file_hashes):
+        """
+        Bulk find_existing, one query per 1,000 hashes. Returns
+        ({file_hash: oldest live record}, {(file_hash, user_id, dataset_folder)}).
+        """
+        found, placements = {}, set()
+        hashes = list(dict.fromkeys(file_hashes))
         conn   = self.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT
-                b.filename,
-                b.file_size,
-                b.file_path,
-                b.file_extension,
-                b.dataset_name,
-                b.upload_time_utc,
-                b.researcher_name,
-                b.researcher_email,
-                l.transformation_type,
-                l.status
-            FROM bronze_files b
-            LEFT JOIN data_lineage l ON b.id = l.bronze_file_id
-            WHERE b.is_deleted = 0
-            ORDER BY b.upload_time_utc DESC
-        """)
-        results = cursor.fetchall()
-        conn.close()
-        return results
\ No newline at end of file
+        try:
+            for start in range(0, len(hashes), 1000):
+                chunk = hashes[start:start + 1000]
+                cursor.execute(f"""
+                    SELECT id, filename, file_path, file_size, file_hash,
+                           user_id, dataset_folder, metadata_json
+                    FROM bronze_files
+                    WHERE file_hash IN ({', '.join(['%s'] * len(chunk))})
+                      AND is_deleted = 0
+                    ORDER BY id DESC
+                """, tuple(chunk))
+                for row in cursor.fetchall():
+                    found[row['file_hash']] = row   # ids descend, so the oldest record is kept
+                    placements.add((row['file_hash'], row['user_id'], row['dataset_folder']))
+            return found, placements
+        finally:
+            conn.close()
+
+    def _as_source(self, source):
+        """A link target as a bronze row, whether it was already held or uploaded in this batch."""
+        if 'file_hash' in source:
+            return source
+        return {'file_hash': source['hash'], 'file_path': source['upload_path'],
+                'file_size': source['size'], 'metadata_json': source.get('metadata')}
+
+    def _upload_item(self, item):
+        """Uploads one batch file; runs on a batch worker thread."""
+        analyzers   = AnalyzerTee(item['filename'], item['ext'])
+        blob_client = get_service_client().get_blob_client(
+            container = self.container_name,
+            blob      = item['upload_path']
+        )
+        item['file_obj'].seek(0)
+        final_hash, file_size = upload_blocks(
+            blob_client, item['file_obj'],
+            concurrency = self.batch_block_concurrency,
+            on_chunk    = analyzers.feed
+        )
+        if final_hash != item['hash']:
+            raise ValueError(f"{item['filename']} changed between hashing and upload")
+        metadata, item['analyses'] = analyzers.finish(file_size)
+        item['metadata'] = json.dumps(metadata, default=str) if metadata else None
+
+    def _bronze_row(self, item, file_path, file_size, metadata_json,
+                    user_id, upload_time, user_full_name, user_email):
+        return (
+            item['filename'], file_path, file_size, item['hash'], item['ext'], item['ext'],
+            user_id, item['display_folder'] or 'root', item['blob_path'], upload_time,
+            user_full_name, user_email, metadata_json
+        )
+
+    def _insert_bronze_many(self, cursor, rows, rows_per_statement=150):
+        """
+        Multi-row INSERT ... OUTPUT. 13 parameters per row keeps each statement
+        under SQL Server's 2,100-parameter limit. Returns {dataset_folder: id};
+        dataset_folder is the file's own blob path, unique within a batch.
+        """
+        ids = {}
+        for start in range(0, len(rows), rows_per_statement):
+            chunk = rows[start:start + rows_per_statement]
+            values = ",\n".join(
+                ["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'UTC', 'raw', %s, %s, %s)"] * len(chunk))
+            cursor.execute(f"""
+                INSERT INTO bronze_files (
+                    filename, file_path, file_size, file_hash, file_extension,
+                    modality, user_id, dataset_name, dataset_folder, upload_time_utc,
+                    upload_timezone, processing_status, researcher_name, researcher_email,
+                    metadata_json
+                )
+                OUTPUT INSERTED.id, INSERTED.dataset_folder
+                VALUES {values}
+            """, tuple(v for row in chunk for v in row))
+            for row in cursor.fetchall():
+                ids[row['dataset_folder']] = row['id']
+        return ids
+
+    def _insert_lineage_many(self, cursor, rows, rows_per_statement=250):
+        for start in range(0, len(rows), rows_per_statement):
+            chunk = rows[start:start + rows_per_statement]
+            values = ",\n".join(["(%s, %s, %s, %s, %s, %s, %s, 'success')"] * len(chunk))
+            cursor.execute(f"""
+                INSERT INTO data_lineage (
+                    bronze_file_id, source_dataset, source_file_path, source_researcher,
+                    source_researcher_email, upload_time_utc, transformation_type, status
+                ) VALUES {values}
+            """, tuple(v for row in chunk for v in row))
+
+    def soft_delete(self, user_id, file_ids, user_email=None, user_full_name=None):
+        """
+        Marks the user's bronze records deleted (the blobs stay: other records
+        may link to the same content). Returns the number of records deleted.
+        """
+        file_ids = [int(i) for i in file_ids][:1000]
+        if not file_ids:
+            return 0
+        deleted_at = datetime.now(timezone.utc)
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                UPDATE bronze_files
+                SET is_deleted = 1
+                OUTPUT INSERTED.id, INSERTED.dataset_name, INSERTED.file_path
+                WHERE user_id = %s
+                  AND is_deleted = 0
+                  AND id IN ({', '.join(['%s'] * len(file_ids))})
+            """, (user_id, *file_ids))
+            deleted = cursor.fetchall()
+            if deleted:
+                self._insert_lineage_many(cursor, [
+                    (row['id'], row['dataset_name'] or 'root', row['file_path'],
+                     user_full_name, user_email, deleted_at, 'soft_delete')
+                    for row in deleted
+                ])
+                self.gold.apply(cursor, [row['id'] for row in deleted], sign=-1)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Soft delete failed: {e}")
+            raise
+        finally:
+            conn.close()
+
+        print(f"🗑️  Soft-deleted {len(deleted)} file(s) for user {user_id}")
+        return len(deleted)
+
+    # ── File listings ──
+    # Keyset pagination on (upload_time_utc, id): each page seeks straight to
+    # the cursor in IX_bronze_files_user_time / IX_bronze_files_time, so a page
+    # costs the same on page 1 and page 10,000. Filters match stored values.
+    LISTING_FILTERS = ('dataset_name', 'modality', 'file_extension')
+
+    def _listing_where(self, filters, cursor_key, alias=''):
+        clauses, params = [], []
+        for column in self.LISTING_FILTERS:
+            value = filters.get(column)
+            if value:
+                clauses.append(f"{alias}{column} = %s")
+                params.append(value)
+        if cursor_key:
+            upload_time, last_id = cursor_key
+            clauses.append(f"({alias}upload_time_utc < %s OR ({alias}upload_time_utc = %s AND {alias}id < %s))")
+            params += [upload_time, upload_time, last_id]
+        return "".join(f"\n                  AND {c}" for c in clauses), params
+
+    def _page(self, rows, limit):
+        """Trims the look-ahead row -> (rows, next_cursor or None)"""
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['upload_time_utc'], rows[-1]['id'])
+        for row in rows:
+            if row['upload_time_utc']:
+                row['upload_time_utc'] = row['upload_time_utc'].isoformat()
+        return rows, next_cursor
+
+    def get_user_files(self, user_id, limit=100, cursor=None, **filters):
+        """One page of the user's files, newest first -> (rows, next_cursor)"""
+        where, params = self._listing_where(filters, decode_cursor(cursor))
+        conn      = self.get_db_connection()
+        db_cursor = conn.cursor()
+        try:
+            db_cursor.execute(f"""
+                SELECT TOP (%s)
+                    id,
+                    filename,
+                    file_size,
+                    file_extension,
+                    modality,
+                    file_path,
+                    dataset_name,
+                    upload_time_utc,
+                    researcher_name,
+                    researcher_email
+                FROM bronze_files
+                WHERE user_id = %s
+                  AND is_deleted = 0{where}
+                ORDER BY upload_time_utc DESC, id DESC
+            """, (limit + 1, user_id, *params))
+            rows = db_cursor.fetchall()
+        finally:
+            conn.close()
+        return self._page(rows, limit)
+
+    def get_all_files_for_admin(self, limit=100, cursor=None, **filters):
+        """Admin view - one page of all researchers' files with their latest lineage step"""
+        where, params = self._listing_where(filters, decode_cursor(cursor), alias='b.')
+        conn      = self.get_db_connection()
+        db_cursor = conn.cursor()
+        try:
+            # Page first, then one lineage seek per row on the page
+            db_cursor.execute(f"""
+                SELECT
+                    p.*,
+                    l.transformation_type,
+                    l.status
+                FROM (
+                    SELECT TOP (%s)
+                        b.id,
+                        b.filename,
+                        b.file_size,
+                        b.file_path,
+                        b.file_extension,
+                        b.modality,
+                        b.dataset_name,
+                        b.upload_time_utc,
+                        b.researcher_name,
+                        b.researcher_email
+                    FROM bronze_files b
+                    WHERE b.is_deleted = 0{where}
+                    ORDER BY b.upload_time_utc DESC, b.id DESC
+                ) p
+                OUTER APPLY (
+                    SELECT TOP 1 transformation_type, status
+                    FROM data_lineage
+                    WHERE bronze_file_id = p.id
+                    ORDER BY id DESC
+                ) l
+                ORDER BY p.upload_time_utc DESC, p.id DESC
+            """, (limit + 1, *params))
+            rows = db_cursor.fetchall()
+        finally:
+            conn.close()
+        return self._page(rows, limit)
@@ -0,0 +1,319 @@
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from backend.services.silver_service import MODALITY_EXTENSIONS
+from backend.utils.db_pool import get_connection
+
+load_dotenv()
+
+class GoldService:
+    """
+    Keeps the Gold tables current without ever scanning bronze_files.
+
+    apply() runs inside the transaction that inserts or soft-deletes bronze
+    rows and folds just those rows into:
+
+      gold_daily_uploads     (user_id, date, modality) -> files, bytes, unique datasets
+      gold_daily_datasets    (user_id, date, modality, dataset) -> files; backs the distinct counts
+      gold_quality_metrics   (date, modality) -> total / valid / invalid / duplicate files, nulls
+      gold_researcher_stats  user_id -> totals, per-modality counts, first/last day, active days
+
+    Daily and quality rows change by delta. Researcher rows are re-derived
+    from that user's gold_daily_* rows (one per active day and modality), so
+    distinct counts such as active days stay exact under deletes.
+
+    reconcile() recomputes everything from bronze and reports the drift.
+    Dashboards read one primary-key row from these tables.
+    """
+
+    def get_db_connection(self):
+        # Pooled: close() returns the connection instead of disconnecting
+        return get_connection()
+
+    # ── Incremental ──
+    def apply(self, cursor, bronze_ids, sign=1, chunk_size=1000):
+        """
+        Adds (sign=1) or removes (sign=-1) the given bronze rows from every
+        Gold table, using the caller's cursor so it commits or rolls back
+        with the bronze change itself.
+        """
+        bronze_ids = list(bronze_ids)
+        now = datetime.now(timezone.utc)
+        for start in range(0, len(bronze_ids), chunk_size):
+            chunk = bronze_ids[start:start + chunk_size]
+            cursor.execute(f"""
+                SET NOCOUNT ON;
+                DECLARE @sign INT = %s;
+                DECLARE @now DATETIME2 = %s;
+                {_DELTA_TABLE}
+                INSERT INTO @d
+                {_bronze_projection(f"b.id IN ({', '.join(['%s'] * len(chunk))})")};
+                {_APPLY_DELTAS}
+                {_researcher_merge("SELECT DISTINCT user_id FROM @d")}
+                SET NOCOUNT OFF;
+            """, (sign, now, *chunk))
+
+    # ── Reconcile ──
+    def reconcile(self):
+        """
+        Rebuilds every Gold table from live bronze rows in one transaction.
+        Returns {table: {action: rows}}; anything other than an empty dict
+        means the incremental path drifted (or rows were edited by hand).
+        """
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SET NOCOUNT ON;
+                DECLARE @now DATETIME2 = %s;
+                DECLARE @changes TABLE (tbl NVARCHAR(40), action NVARCHAR(10));
+                {_DELTA_TABLE}
+                INSERT INTO @d
+                {_bronze_projection("b.is_deleted = 0")};
+                {_RECONCILE}
+                {_researcher_merge(
+                    "SELECT user_id FROM gold_daily_uploads UNION SELECT user_id FROM gold_researcher_stats",
+                    output="OUTPUT 'gold_researcher_stats', $action INTO @changes")}
+                SELECT tbl, action, COUNT(*) AS n FROM @changes GROUP BY tbl, action;
+                SET NOCOUNT OFF;
+            """, (datetime.now(timezone.utc),))
+            rows = cursor.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        drift = {}
+        for row in rows:
+            drift.setdefault(row['tbl'], {})[row['action'].lower()] = row['n']
+        print(f"🧹 Gold reconcile: {drift or 'no drift'}")
+        return drift
+
+    # ── Dashboard lookups ──
+    def researcher_stats(self, user_id):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT * FROM gold_researcher_stats WHERE user_id = %s", (user_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return _stringify_dates(row) if row else None
+
+    def daily_uploads(self, user_id, day):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT [date], modality, file_count, total_size_bytes, unique_datasets
+                FROM gold_daily_uploads
+                WHERE user_id = %s AND [date] = %s
+            """, (user_id, day))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        return [_stringify_dates(r) for r in rows]
+
+    def quality(self, modality, day):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT * FROM gold_quality_metrics WHERE [date] = %s AND modality = %s",
+                           (day, modality))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return _stringify_dates(row) if row else None
+
+def _stringify_dates(row):
+    return {k: (v.isoformat() if hasattr(v, 'isoformat') else v) for k, v in row.items()}
+
+def _modality_case(alias='b'):
+    """SQL for the Gold modality of a bronze row: the hub modality, with channel matrices split from wifi."""
+    whens = []
+    for modality, extensions in MODALITY_EXTENSIONS.items():
+        exts = ', '.join(f"'{e}'" for e in extensions)
+        if modality == 'wifi':
+            whens.append(f"WHEN {alias}.file_extension IN ({exts}) THEN "
+                         f"CASE WHEN {alias}.filename LIKE '%%channel%%' THEN 'channels' ELSE 'wifi' END")
+        else:
+            whens.append(f"WHEN {alias}.file_extension IN ({exts}) THEN '{modality}'")
+    return f"CASE {' '.join(whens)} ELSE 'other' END"
+
+def _bronze_projection(where):
+    # Duplicates are the records _link_duplicate wrote: their lineage step is a dedupe_link
+    # (file_path alone can't tell, _versions/ uploads also differ from dataset_folder)
+    return f"""
+        SELECT
+            b.user_id,
+            CAST(b.upload_time_utc AS DATE),
+            {_modality_case('b')},
+            ISNULL(b.dataset_name, 'root'),
+            ISNULL(b.file_size, 0),
+            CASE WHEN EXISTS (SELECT 1 FROM data_lineage l
+                              WHERE l.bronze_file_id = b.id AND l.transformation_type = 'dedupe_link')
+                 THEN 1 ELSE 0 END,
+            CASE WHEN ISJSON(b.metadata_json) = 1 AND JSON_QUERY(b.metadata_json, '$.errors') IS NOT NULL
+                 THEN 1 ELSE 0 END,
+            CASE WHEN ISJSON(b.metadata_json) = 1
+                 THEN ISNULL(TRY_CAST(JSON_VALUE(b.metadata_json, '$.csv_profile.result.total_null_cells') AS BIGINT), 0)
+                 ELSE 0 END
+        FROM bronze_files b
+        WHERE {where}"""
+
+_DELTA_TABLE = """
+    DECLARE @d TABLE (
+        user_id INT, [date] DATE, modality NVARCHAR(50), dataset_name NVARCHAR(255),
+        file_size BIGINT, is_link INT, format_error INT, null_cells BIGINT
+    );"""
+
+_APPLY_DELTAS = """
+    MERGE gold_daily_datasets WITH (HOLDLOCK) AS t
+    USING (SELECT user_id, [date], modality, dataset_name, COUNT(*) * @sign AS files
+           FROM @d GROUP BY user_id, [date], modality, dataset_name) AS s
+       ON t.user_id = s.user_id AND t.[date] = s.[date]
+      AND t.modality = s.modality AND t.dataset_name = s.dataset_name
+    WHEN MATCHED THEN UPDATE SET file_count = t.file_count + s.files
+    WHEN NOT MATCHED THEN INSERT (user_id, [date], modality, dataset_name, file_count)
+         VALUES (s.user_id, s.[date], s.modality, s.dataset_name, s.files);
+
+    DELETE g FROM gold_daily_datasets g
+    JOIN (SELECT DISTINCT user_id, [date], modality FROM @d) k
+      ON g.user_id = k.user_id AND g.[date] = k.[date] AND g.modality = k.modality
+    WHERE g.file_count <= 0;
+
+    MERGE gold_daily_uploads WITH (HOLDLOCK) AS t
+    USING (SELECT d.user_id, d.[date], d.modality,
+                  COUNT(*) * @sign AS files, SUM(d.file_size) * @sign AS bytes,
+                  MAX(ds.datasets) AS datasets
+           FROM @d d
+           CROSS APPLY (SELECT COUNT(*) AS datasets FROM gold_daily_datasets x
+                        WHERE x.user_id = d.user_id AND x.[date] = d.[date]
+                          AND x.modality = d.modality) ds
+           GROUP BY d.user_id, d.[date], d.modality) AS s
+       ON t.user_id = s.user_id AND t.[date] = s.[date] AND t.modality = s.modality
+    WHEN MATCHED THEN UPDATE SET file_count = t.file_count + s.files,
+                                 total_size_bytes = t.total_size_bytes + s.bytes,
+                                 unique_datasets = s.datasets, updated_at_utc = @now
+    WHEN NOT MATCHED THEN INSERT (user_id, [date], modality, file_count, total_size_bytes,
+                                  unique_datasets, updated_at_utc)
+         VALUES (s.user_id, s.[date], s.modality, s.files, s.bytes, s.datasets, @now);
+
+    DELETE g FROM gold_daily_uploads g
+    JOIN (SELECT DISTINCT user_id, [date], modality FROM @d) k
+      ON g.user_id = k.user_id AND g.[date] = k.[date] AND g.modality = k.modality
+    WHERE g.file_count <= 0;
+
+    MERGE gold_quality_metrics WITH (HOLDLOCK) AS t
+    USING (SELECT [date], modality, COUNT(*) * @sign AS files,
+                  SUM(1 - format_error) * @sign AS valid, SUM(format_error) * @sign AS invalid,
+                  SUM(is_link) * @sign AS duplicates, SUM(null_cells) * @sign AS nulls
+           FROM @d GROUP BY [date], modality) AS s
+       ON t.[date] = s.[date] AND t.modality = s.modality
+    WHEN MATCHED THEN UPDATE SET total_files = t.total_files + s.files,
+                                 valid_files = t.valid_files + s.valid,
+                                 invalid_files = t.invalid_files + s.invalid,
+                                 duplicate_files = t.duplicate_files + s.duplicates,
+                                 null_value_count = t.null_value_count + s.nulls,
+                                 format_error_count = t.format_error_count + s.invalid,
+                                 calculated_at_utc = @now
+    WHEN NOT MATCHED THEN INSERT ([date], modality, total_files, valid_files, invalid_files,
+                                  duplicate_files, null_value_count, format_error_count, calculated_at_utc)
+         VALUES (s.[date], s.modality, s.files, s.valid, s.invalid, s.duplicates, s.nulls, s.invalid, @now);
+
+    DELETE g FROM gold_quality_metrics g
+    JOIN (SELECT DISTINCT [date], modality FROM @d) k
+      ON g.[date] = k.[date] AND g.modality = k.modality
+    WHERE g.total_files <= 0;
+"""
+
+_RECONCILE = """
+    MERGE gold_daily_datasets WITH (HOLDLOCK) AS t
+    USING (SELECT user_id, [date], modality, dataset_name, COUNT(*) AS files
+           FROM @d GROUP BY user_id, [date], modality, dataset_name) AS s
+       ON t.user_id = s.user_id AND t.[date] = s.[date]
+      AND t.modality = s.modality AND t.dataset_name = s.dataset_name
+    WHEN MATCHED AND t.file_count <> s.files THEN UPDATE SET file_count = s.files
+    WHEN NOT MATCHED THEN INSERT (user_id, [date], modality, dataset_name, file_count)
+         VALUES (s.user_id, s.[date], s.modality, s.dataset_name, s.files)
+    WHEN NOT MATCHED BY SOURCE THEN DELETE
+    OUTPUT 'gold_daily_datasets', $action INTO @changes;
+
+    MERGE gold_daily_uploads WITH (HOLDLOCK) AS t
+    USING (SELECT user_id, [date], modality, COUNT(*) AS files, SUM(file_size) AS bytes,
+                  COUNT(DISTINCT dataset_name) AS datasets
+           FROM @d GROUP BY user_id, [date], modality) AS s
+       ON t.user_id = s.user_id AND t.[date] = s.[date] AND t.modality = s.modality
+    WHEN MATCHED AND (t.file_count <> s.files OR t.total_size_bytes <> s.bytes
+                      OR t.unique_datasets <> s.datasets)
+         THEN UPDATE SET file_count = s.files, total_size_bytes = s.bytes,
+                         unique_datasets = s.datasets, updated_at_utc = @now
+    WHEN NOT MATCHED THEN INSERT (user_id, [date], modality, file_count, total_size_bytes,
+                                  unique_datasets, updated_at_utc)
+         VALUES (s.user_id, s.[date], s.modality, s.files, s.bytes, s.datasets, @now)
+    WHEN NOT MATCHED BY SOURCE THEN DELETE
+    OUTPUT 'gold_daily_uploads', $action INTO @changes;
+
+    MERGE gold_quality_metrics WITH (HOLDLOCK) AS t
+    USING (SELECT [date], modality, COUNT(*) AS files,
+                  SUM(1 - format_error) AS valid, SUM(format_error) AS invalid,
+                  SUM(is_link) AS duplicates, SUM(null_cells) AS nulls
+           FROM @d GROUP BY [date], modality) AS s
+       ON t.[date] = s.[date] AND t.modality = s.modality
+    WHEN MATCHED AND (t.total_files <> s.files OR t.valid_files <> s.valid
+                      OR t.invalid_files <> s.invalid OR t.duplicate_files <> s.duplicates
+                      OR t.null_value_count <> s.nulls)
+         THEN UPDATE SET total_files = s.files, valid_files = s.valid, invalid_files = s.invalid,
+                         duplicate_files = s.duplicates, null_value_count = s.nulls,
+                         format_error_count = s.invalid, calculated_at_utc = @now
+    WHEN NOT MATCHED THEN INSERT ([date], modality, total_files, valid_files, invalid_files,
+                                  duplicate_files, null_value_count, format_error_count, calculated_at_utc)
+         VALUES (s.[date], s.modality, s.files, s.valid, s.invalid, s.duplicates, s.nulls, s.invalid, @now)
+    WHEN NOT MATCHED BY SOURCE THEN DELETE
+    OUTPUT 'gold_quality_metrics', $action INTO @changes;
+"""
+
+def _researcher_merge(users_sql, output=''):
+    """Re-derives gold_researcher_stats for the users selected by users_sql from their gold_daily_* rows."""
+    counts = ',\n'.join(
+        f"                      SUM(CASE WHEN modality = '{m}' THEN file_count ELSE 0 END) AS {m}"
+        for m in ('lidar', 'radar', 'wifi', 'channels'))
+    return f"""
+    MERGE gold_researcher_stats WITH (HOLDLOCK) AS t
+    USING (SELECT u.user_id,
+                  ISNULL(a.files, 0) AS files, ISNULL(a.bytes, 0) AS bytes,
+                  ISNULL(ds.datasets, 0) AS datasets,
+                  ISNULL(a.lidar, 0) AS lidar, ISNULL(a.radar, 0) AS radar,
+                  ISNULL(a.wifi, 0) AS wifi, ISNULL(a.channels, 0) AS channels,
+                  a.first_date, a.last_date, ISNULL(a.days, 0) AS days
+           FROM ({users_sql}) u
+           OUTER APPLY (
+               SELECT SUM(file_count) AS files, SUM(total_size_bytes) AS bytes,
+{counts},
+                      MIN([date]) AS first_date, MAX([date]) AS last_date,
+                      COUNT(DISTINCT [date]) AS days
+               FROM gold_daily_uploads g WHERE g.user_id = u.user_id
+           ) a
+           OUTER APPLY (
+               SELECT COUNT(DISTINCT dataset_name) AS datasets
+               FROM gold_daily_datasets x WHERE x.user_id = u.user_id
+           ) ds) AS s
+       ON t.user_id = s.user_id
+    WHEN MATCHED AND (t.total_uploads <> s.files OR t.total_storage_bytes <> s.bytes
+                      OR t.total_datasets <> s.datasets OR t.active_days <> s.days
+                      OR t.lidar_count <> s.lidar OR t.radar_count <> s.radar
+                      OR t.wifi_count <> s.wifi OR t.channels_count <> s.channels
+                      OR ISNULL(t.first_upload_date, '19000101') <> ISNULL(s.first_date, '19000101')
+                      OR ISNULL(t.last_upload_date, '19000101') <> ISNULL(s.last_date, '19000101'))
+         THEN UPDATE SET total_uploads = s.files, total_storage_bytes = s.bytes,
+                         total_datasets = s.datasets, lidar_count = s.lidar, radar_count = s.radar,
+                         wifi_count = s.wifi, channels_count = s.channels,
+                         first_upload_date = s.first_date, last_upload_date = s.last_date,
+                         active_days = s.days, last_calculated_utc = @now
+    WHEN NOT MATCHED THEN INSERT (user_id, total_uploads, total_storage_bytes, total_datasets,
+                                  lidar_count, radar_count, wifi_count, channels_count,
+                                  first_upload_date, last_upload_date, active_days, last_calculated_utc)
+         VALUES (s.user_id, s.files, s.bytes, s.datasets, s.lidar, s.radar, s.wifi, s.channels,
+                 s.first_date, s.last_date, s.days, @now)
+    {output};"""
@@ -0,0 +1,290 @@
+import os
+import io
+import json
+import uuid
+import time
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from backend.utils.db_pool import get_connection
+
+load_dotenv()
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """Handed to a job function: report progress, and stop at checkpoints once cancelled."""
+
+    def __init__(self, service, job_id):
+        self.service = service
+        self.job_id  = job_id
+        self._last   = -1.0
+
+    def progress(self, fraction, message=None):
+        # Throttle: one UPDATE per percent is plenty for a polling UI
+        if fraction - self._last < 0.01 and fraction < 1.0:
+            return
+        self._last = fraction
+        self.service._update(self.job_id, progress=round(min(max(fraction, 0.0), 1.0), 4), message=message)
+
+    def cancelled(self):
+        return self.job_id in self.service._cancel_requested
+
+    def checkpoint(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+class JobService:
+    """
+    Background jobs for work too slow for a request thread (blob uploads,
+    analysis). Jobs are rows in the `jobs` table, so status survives the
+    request and any web worker can answer /api/jobs/<id>; the work itself
+    runs on this process's worker pool.
+
+    Status: queued -> running -> succeeded | failed | cancelled
+
+    Cancellation requests are held in memory, so with several web processes
+    a cancel only reaches jobs running in the process that receives it.
+
+    Each row records the process that owns it, and that process refreshes
+    heartbeat_at_utc while it lives. A queued or running row whose heartbeat
+    is older than JOB_STALE_SECONDS belongs to a process that stopped.
+    """
+
+    def __init__(self, workers=None, spool_root=None):
+        self.workers           = workers or int(os.getenv('JOB_WORKERS', '4'))
+        self.spool_root        = spool_root or os.path.join(tempfile.gettempdir(), 'wireless_job_spool')
+        self._pool             = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        self._cancel_requested = set()
+        self._lock             = threading.Lock()
+        self.owner             = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stale_seconds     = int(os.getenv('JOB_STALE_SECONDS', '300'))
+        self._heartbeat        = None
+        os.makedirs(self.spool_root, exist_ok=True)
+
+    def get_db_connection(self):
+        return get_connection()
+
+    def recover(self):
+        """
+        Jobs whose process stopped while they were queued or running can never
+        finish: fails other owners' rows with a stale heartbeat. Live processes,
+        including other web workers, keep their heartbeats fresh. Starts this
+        process's heartbeat, which repeats the check.
+        """
+        now    = datetime.now(timezone.utc)
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'failed', error = 'Interrupted: its server process stopped',
+                    finished_at_utc = %s
+                WHERE status IN ('queued', 'running')
+                  AND (owner IS NULL OR owner <> %s)
+                  AND COALESCE(heartbeat_at_utc, started_at_utc, created_at_utc) < DATEADD(second, -%s, %s)
+            """, (now, self.owner, self.stale_seconds, now))
+            conn.commit()
+            if cursor.rowcount:
+                print(f"⚠️  Marked {cursor.rowcount} interrupted job(s) as failed")
+        finally:
+            conn.close()
+        self._start_heartbeat()
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self):
+        # Several beats per stale window, so one slow UPDATE does not make live jobs look dead
+        while True:
+            time.sleep(max(self.stale_seconds / 5, 1))
+            try:
+                conn   = self.get_db_connection()
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("""
+                        UPDATE jobs SET heartbeat_at_utc = %s
+                        WHERE owner = %s AND status IN ('queued', 'running')
+                    """, (datetime.now(timezone.utc), self.owner))
+                    conn.commit()
+                finally:
+                    conn.close()
+                self.recover()
+            except Exception as e:
+                print(f"⚠️  Job heartbeat failed: {e}")
+
+    def submit(self, job_type, user_id, fn, params=None, cleanup=None):
+        """
+        Records a queued job and schedules fn(ctx, **params) on the worker pool.
+        fn's return value is stored as the job result. cleanup() runs when
+        the job ends, however it ends.
+        """
+        job_id = str(uuid.uuid4())
+        params = params or {}
+        now    = datetime.now(timezone.utc)
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO jobs (id, job_type, user_id, status, progress, params_json, created_at_utc,
+                                  owner, heartbeat_at_utc)
+                VALUES (%s, %s, %s, 'queued', 0, %s, %s, %s, %s)
+            """, (job_id, job_type, user_id, json.dumps(params, default=str), now, self.owner, now))
+            conn.commit()
+        finally:
+            conn.close()
+        self._start_heartbeat()
+
+        self._pool.submit(self._run, job_id, fn, params, cleanup)
+        print(f"🧵 Job {job_id} queued ({job_type})")
+        return job_id
+
+    def _run(self, job_id, fn, params, cleanup):
+        ctx = JobContext(self, job_id)
+        try:
+            ctx.checkpoint()
+            # A row another process already failed (recover) stays failed
+            if not self._update(job_id, expect=('queued',), status='running',
+                                started_at_utc=datetime.now(timezone.utc)):
+                print(f"⚠️  Job {job_id} is no longer queued; skipped")
+                return
+            result = fn(ctx, **params)
+            if self._update(job_id, expect=('running',), status='succeeded', progress=1.0,
+                            result_json=json.dumps(result, default=str),
+                            finished_at_utc=datetime.now(timezone.utc)):
+                print(f"✅ Job {job_id} finished")
+            else:
+                print(f"⚠️  Job {job_id} finished after it was marked failed; result dropped")
+        except JobCancelled:
+            self._update(job_id, expect=('queued', 'running'), status='cancelled',
+                         finished_at_utc=datetime.now(timezone.utc))
+            print(f"🛑 Job {job_id} cancelled")
+        except Exception as e:
+            self._update(job_id, expect=('queued', 'running'), status='failed', error=str(e)[:4000],
+                         finished_at_utc=datetime.now(timezone.utc))
+            print(f"❌ Job {job_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._cancel_requested.discard(job_id)
+            if cleanup:
+                cleanup()
+
+    def _update(self, job_id, expect=None, **fields):
+        """Sets fields on the job row, only while its status is in expect (if given). True if a row changed."""
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if not fields:
+            return False
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            assignments = ', '.join(f"{k} = %s" for k in fields)
+            where, args = "id = %s", (job_id,)
+            if expect:
+                where += f" AND status IN ({', '.join(['%s'] * len(expect))})"
+                args  += tuple(expect)
+            cursor.execute(f"UPDATE jobs SET {assignments} WHERE {where}",
+                           tuple(fields.values()) + args)
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def active(self, job_type, **params):
+        """Id of a queued or running job of job_type whose params include these values, or None."""
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            matches = ''.join(f" AND JSON_VALUE(params_json, '$.{key}') = %s" for key in params)
+            cursor.execute(f"""
+                SELECT TOP 1 id FROM jobs
+                WHERE job_type = %s AND status IN ('queued', 'running'){matches}
+                ORDER BY created_at_utc
+            """, (job_type, *map(str, params.values())))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return row['id'] if row else None
+
+    def get(self, job_id, user_id):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT id, job_type, status, progress, message, result_json, error,
+                       created_at_utc, started_at_utc, finished_at_utc
+                FROM jobs
+                WHERE id = %s AND user_id = %s
+            """, (job_id, user_id))
+            job = cursor.fetchone()
+        finally:
+            conn.close()
+        if job:
+            raw = job.pop('result_json')
+            job['result'] = json.loads(raw) if raw else None
+            for key in ('created_at_utc', 'started_at_utc', 'finished_at_utc'):
+                job[key] = str(job[key]) if job[key] else None
+        return job
+
+    def list_recent(self, user_id, limit=20):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT TOP (%s) id, job_type, status, progress, message, error, created_at_utc
+                FROM jobs
+                WHERE user_id = %s
+                ORDER BY created_at_utc DESC
+            """, (limit, user_id))
+            jobs = cursor.fetchall()
+        finally:
+            conn.close()
+        for job in jobs:
+            job['created_at_utc'] = str(job['created_at_utc'])
+        return jobs
+
+    def cancel(self, job_id, user_id):
+        """
+        Requests cancellation. A queued job never starts; a running job stops
+        at its next checkpoint (work already done, e.g. uploaded blobs, stays).
+        """
+        job = self.get(job_id, user_id)
+        if not job or job['status'] not in ('queued', 'running'):
+            return False
+        with self._lock:
+            self._cancel_requested.add(job_id)
+        self._update(job_id, message='Cancellation requested')
+        return True
+
+    # ── Upload spools ──
+    # Werkzeug deletes a request's temp files when the request ends, so
+    # background uploads copy them into a per-job directory first.
+    def spool_files(self, file_storages):
+        spool_dir = os.path.join(self.spool_root, uuid.uuid4().hex)
+        os.makedirs(spool_dir)
+        spooled = []
+        for i, fs in enumerate(file_storages):
+            if not fs.filename:
+                continue
+            path = os.path.join(spool_dir, f"{i:06d}")
+            fs.save(path)
+            spooled.append({'path': path, 'filename': fs.filename})
+        return spool_dir, spooled
+
+    def remove_spool(self, spool_dir):
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+class SpooledFile(io.FileIO):
+    """A spooled upload reopened in a job, with the .filename BronzeService expects."""
+
+    def __init__(self, path, filename):
+        super().__init__(path, 'rb')
+        self.filename = filename
@@ -0,0 +1,103 @@
+import json
+import pymssql
+from backend.utils.db_pool import get_connection
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class MetadataCache:
+    """
+    Analysis results keyed by (file_hash, processor_version).
+
+    file_hash is the SHA-256 recorded in bronze_files at upload, so duplicate
+    uploads share one entry. processor_version is the processor's
+    PROCESSOR_VERSION; bumping it makes every older entry unreachable, and
+    purge_stale() deletes them.
+    """
+
+    def get_db_connection(self):
+        # Pooled: close() returns the connection instead of disconnecting
+        return get_connection()
+
+    def lookup(self, blob_path, processor_version):
+        """
+        One round trip: the file's hash plus any cached analysis for it.
+        Returns (file_hash, metadata) - metadata is None on a miss, and
+        file_hash is None if the blob is not a live bronze file.
+        """
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT TOP 1 b.file_hash, c.metadata_json
+                FROM bronze_files b
+                LEFT JOIN analysis_cache c
+                       ON c.file_hash = b.file_hash
+                      AND c.processor_version = %s
+                WHERE b.file_path_hash = CAST(HASHBYTES('SHA2_256', CAST(%s AS NVARCHAR(MAX))) AS BINARY(32))
+                  AND b.file_path = %s
+                  AND b.is_deleted = 0
+                ORDER BY b.id DESC
+            """, (processor_version, blob_path, blob_path))
+            row = cursor.fetchone()
+            if not row:
+                return None, None
+            if row['metadata_json'] is None:
+                return row['file_hash'], None
+            cursor.execute("""
+                UPDATE analysis_cache
+                SET hit_count = hit_count + 1, last_hit_utc = %s
+                WHERE file_hash = %s AND processor_version = %s
+            """, (datetime.now(timezone.utc), row['file_hash'], processor_version))
+            conn.commit()
+            return row['file_hash'], json.loads(row['metadata_json'])
+        finally:
+            conn.close()
+
+    def store(self, file_hash, processor_version, file_extension, metadata):
+        """Saves an analysis. Losing a race with a concurrent analyze of the same content is fine."""
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                IF NOT EXISTS (SELECT 1 FROM analysis_cache
+                               WHERE file_hash = %s AND processor_version = %s)
+                INSERT INTO analysis_cache (
+                    file_hash, processor_version, file_extension,
+                    metadata_json, created_at_utc, hit_count
+                ) VALUES (%s, %s, %s, %s, %s, 0)
+            """, (
+                file_hash, processor_version,
+                file_hash, processor_version, file_extension,
+                json.dumps(metadata, default=str), datetime.now(timezone.utc)
+            ))
+            conn.commit()
+        except pymssql.IntegrityError:
+            conn.rollback()
+        finally:
+            conn.close()
+
+    def purge_stale(self, current_versions):
+        """
+        Deletes entries written by older processor versions.
+        current_versions: {'csv': ['csv-4'], 'mat': ['mat-4', 'mat-5'], ...}
+        (every version a processor still serves, e.g. its STATS_VERSION too)
+        """
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            deleted = 0
+            for ext, versions in current_versions.items():
+                placeholders = ', '.join(['%s'] * len(versions))
+                cursor.execute(f"""
+                    DELETE FROM analysis_cache
+                    WHERE file_extension = %s AND processor_version NOT IN ({placeholders})
+                """, (ext, *versions))
+                deleted += cursor.rowcount
+            conn.commit()
+            if deleted:
+                print(f"🧹 Purged {deleted} stale analysis cache entries")
+            return deleted
+        finally:
+            conn.close()
@@ -0,0 +1,85 @@
+import os
+import json
+import posixpath
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+from dotenv import load_dotenv
+from backend.processors.pcd_processor import PCDProcessor
+from backend.utils.blob_io import get_blob_client
+from backend.utils.db_pool import get_connection
+
+load_dotenv()
+
+# Point budgets of the levels of detail the viewer can ask for
+PREVIEW_LODS = tuple(int(n) for n in os.getenv('PREVIEW_LODS', '10000,100000,1000000').split(','))
+
+# Bump when the voxelization or the binary format changes; old previews are then rebuilt
+PREVIEW_VERSION = 'pcpv-1'
+
+class PreviewService:
+    """
+    Point cloud previews, cached next to the bronze blob they were built from:
+
+        <bronze folder>/_previews/<file_hash>/<PREVIEW_VERSION>/lod-<N>.bin
+        <bronze folder>/_previews/<file_hash>/<PREVIEW_VERSION>/manifest.json
+
+    Keyed by content hash, so a re-upload of the same bytes under the same
+    folder reuses them. Serving a cached preview is one SQL lookup and one
+    blob GET streamed straight through; a miss builds every LOD in one job.
+    """
+
+    def get_db_connection(self):
+        # Pooled: close() returns the connection instead of disconnecting
+        return get_connection()
+
+    def file_hash(self, blob_path):
+        """SHA-256 of a live bronze file, or None."""
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT TOP 1 file_hash
+                FROM bronze_files
+                WHERE file_path_hash = CAST(HASHBYTES('SHA2_256', CAST(%s AS NVARCHAR(MAX))) AS BINARY(32))
+                  AND file_path = %s
+                  AND is_deleted = 0
+                ORDER BY id DESC
+            """, (blob_path, blob_path))
+            row = cursor.fetchone()
+            return row['file_hash'] if row else None
+        finally:
+            conn.close()
+
+    def preview_prefix(self, blob_path, file_hash):
+        return posixpath.join(posixpath.dirname(blob_path), '_previews', file_hash, PREVIEW_VERSION)
+
+    def open(self, blob_path, file_hash, lod):
+        """A streaming downloader for a cached preview, or None if it has not been built."""
+        blob = get_blob_client(f"{self.preview_prefix(blob_path, file_hash)}/lod-{lod}.bin")
+        try:
+            return blob.download_blob(max_concurrency=4)
+        except ResourceNotFoundError:
+            return None
+
+    def build(self, blob_path, file_hash, ctx=None):
+        """Builds and uploads every LOD; the manifest goes last, so it only exists for a complete set."""
+        processor = PCDProcessor(blob_path)
+        progress  = ctx.progress if ctx else None
+        previews, manifest = processor.build_previews(PREVIEW_LODS, progress=progress)
+
+        prefix   = self.preview_prefix(blob_path, file_hash)
+        settings = ContentSettings(content_type='application/octet-stream',
+                                   cache_control='private, max-age=31536000, immutable')
+        for lod, data in previews.items():
+            if ctx:
+                ctx.checkpoint()
+            get_blob_client(f"{prefix}/lod-{lod}.bin").upload_blob(
+                data, overwrite=True, content_settings=settings)
+
+        manifest.update({'file_hash': file_hash, 'preview_version': PREVIEW_VERSION})
+        get_blob_client(f"{prefix}/manifest.json").upload_blob(
+            json.dumps(manifest), overwrite=True,
+            content_settings=ContentSettings(content_type='application/json'))
+        print(f"🧊 Built {len(previews)} previews for {blob_path}: "
+              + ', '.join(f"{l['points']:,} pts / {l['bytes'] / 1024:.0f} KB" for l in manifest['lods']))
+        return manifest
@@ -0,0 +1,673 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import posixpath
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from backend.processors.csv_processor import sniff_dialect, iter_arrow_batches
+from backend.processors.mat_processor import mat_arrays
+from backend.services.array_store import ArrayStoreWriter, ArrayStoreReader, load_metadata
+from backend.utils.blob_io import get_blob_client, get_silver_container_client, upload_blocks
+from backend.utils.db_pool import get_connection
+
+load_dotenv()
+
+# Hub modality -> the bronze file extensions it consolidates
+# (bronze_files.modality holds the extension, so sources are selected by extension)
+MODALITY_EXTENSIONS = {
+    'lidar': ('pcd', 'ply', 'las', 'laz'),
+    'radar': ('csv',),
+    'wifi':  ('mat', 'h5', 'hdf5'),
+}
+
+# Read row by row into the Silver table; other extensions get a per-file catalog
+TABULAR_EXTENSIONS = ('csv',)
+
+# Rewritten variable by variable into chunked array stores (see array_store)
+ARRAY_EXTENSIONS = ('mat', 'h5', 'hdf5')
+
+# Working memory for one block of a variable while it is rechunked
+ARRAY_MEMORY_BUDGET = int(os.getenv('SILVER_ARRAY_BUDGET_MB', '256')) * 1024 * 1024
+
+# v5 MAT variables have no chunks and load whole: converted when twice their size fits this
+MAT5_LOAD_BUDGET = int(os.getenv('SILVER_MAT5_LOAD_MB', '2048')) * 1024 * 1024
+
+# One catalog row per (file, variable) of an array aggregation; shape and chunks are JSON lists
+ARRAY_CATALOG_SCHEMA = pa.schema([
+    ('source_file_id', pa.int64()), ('frame', pa.int32()), ('filename', pa.string()),
+    ('file_hash', pa.string()), ('variable', pa.string()), ('shape', pa.string()),
+    ('dtype', pa.string()), ('chunks', pa.string()), ('store_path', pa.string()),
+    ('stored_bytes', pa.int64()), ('skipped', pa.string()), ('upload_time_utc', pa.timestamp('us')),
+])
+
+class BuildInProgress(Exception):
+    pass
+
+class SilverService:
+    """
+    Builds the Silver layer from bronze.
+
+    Every bronze dataset folder of a modality (e.g. pratyusha/radar0, a folder
+    of per-frame CSVs) becomes one partition of a zstd-compressed Parquet
+    dataset in the silver container:
+
+        <modality>/researcher=<name>/dataset=<folder>/part-<build>-00000.parquet
+
+    Tabular files are consolidated row by row, with source_file_id and frame
+    (file order in the folder) added. MAT / HDF5 workspaces are rewritten
+    into chunked array stores next to the partition,
+
+        <partition>/arrays/<file_hash>.zarr
+
+    with one catalog row per variable. Other formats (PCD) get a per-file
+    catalog built from the upload-time metadata.
+
+    A partition is only rebuilt when its set of bronze files changed
+    (source_fingerprint). Results go to silver_aggregated, one data_lineage
+    row per bronze file links it to its aggregation, and /api/silver/hub
+    reads those tables instead of touching the Parquet.
+    """
+
+    def __init__(self, row_group_rows=None, max_rows_per_file=None, compression=None):
+        self.row_group_rows    = row_group_rows or int(os.getenv('SILVER_ROW_GROUP_ROWS', '1000000'))
+        self.max_rows_per_file = max_rows_per_file or int(os.getenv('SILVER_MAX_ROWS_PER_FILE', '20000000'))
+        self.compression       = compression or os.getenv('SILVER_COMPRESSION', 'zstd')
+        self._container_ready  = False
+
+    def get_db_connection(self):
+        # Pooled: close() returns the connection instead of disconnecting
+        return get_connection()
+
+    def _container(self):
+        container = get_silver_container_client()
+        if not self._container_ready:
+            if not container.exists():
+                container.create_container()
+            self._container_ready = True
+        return container
+
+    # ── Build ──
+    def build(self, modality, ctx=None, force=False):
+        """
+        Rebuilds every changed partition of a modality. Returns a summary of
+        built / unchanged / failed aggregations. One build per modality at a
+        time (its cleanup would delete a concurrent build's parts); raises
+        BuildInProgress if another one holds the modality.
+        """
+        conn = self._build_lock(modality)
+        try:
+            return self._build(modality, ctx, force)
+        finally:
+            # Rolling back the lock's transaction releases it
+            conn.rollback()
+            conn.close()
+
+    def _build_lock(self, modality):
+        """Takes the modality's app lock, owned by a transaction the caller keeps open on the returned connection."""
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                DECLARE @result INT;
+                EXEC @result = sp_getapplock @Resource = %s, @LockMode = 'Exclusive',
+                                             @LockOwner = 'Transaction', @LockTimeout = 0;
+                SELECT @result AS result;
+            """, (f"silver_build:{modality}",))
+            granted = cursor.fetchone()['result'] >= 0
+        except Exception:
+            conn.rollback()
+            conn.close()
+            raise
+        if not granted:
+            conn.rollback()
+            conn.close()
+            raise BuildInProgress(f"A {modality} Silver build is already running")
+        return conn
+
+    def _build(self, modality, ctx, force):
+        extensions = MODALITY_EXTENSIONS[modality]
+        groups     = self._group_sources(self._bronze_sources(extensions))
+        existing   = self._existing_fingerprints(modality)
+
+        summary = {'modality': modality, 'built': [], 'unchanged': [], 'failed': []}
+        for i, (name, sources) in enumerate(groups.items()):
+            if ctx:
+                ctx.checkpoint()
+                ctx.progress(i / max(len(groups), 1), f"Building {name}")
+            fingerprint = _fingerprint(sources)
+            if not force and existing.get(name) == fingerprint:
+                summary['unchanged'].append(name)
+                continue
+            try:
+                result = self._build_aggregation(modality, name, sources, fingerprint)
+                summary['built'].append(result)
+                print(f"🥈 Silver {modality}/{name}: {result['source_file_count']} files, "
+                      f"{result['total_records']} records in {result['processing_duration_seconds']}s")
+            except Exception as e:
+                summary['failed'].append({'aggregation_name': name, 'error': str(e)})
+                print(f"❌ Silver {modality}/{name} failed: {e}")
+        return summary
+
+    def _bronze_sources(self, extensions):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT id, filename, file_path, file_size, file_hash, file_extension,
+                       dataset_name, dataset_folder, upload_time_utc,
+                       researcher_name, researcher_email, metadata_json
+                FROM bronze_files
+                WHERE is_deleted = 0
+                  AND file_extension IN ({', '.join(['%s'] * len(extensions))})
+            """, tuple(extensions))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def _group_sources(self, rows):
+        """
+        {aggregation_name: rows in frame order}. The aggregation is the folder
+        of the file's own blob path (dataset_folder), so linked duplicates land
+        in the uploader's dataset even though their bytes live elsewhere.
+        """
+        groups = {}
+        for row in rows:
+            name = posixpath.dirname(row['dataset_folder'] or row['file_path'])
+            groups.setdefault(name, []).append(row)
+        for sources in groups.values():
+            sources.sort(key=lambda r: (r['filename'], r['id']))
+        return OrderedDict(sorted(groups.items()))
+
+    def _existing_fingerprints(self, modality):
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT aggregation_name, source_fingerprint
+                FROM silver_aggregated
+                WHERE modality = %s
+            """, (modality,))
+            return {r['aggregation_name']: r['source_fingerprint'] for r in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    def _build_aggregation(self, modality, name, sources, fingerprint):
+        start    = time.perf_counter()
+        build_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        prefix   = _partition_prefix(modality, name)
+        writer   = _PartWriter(self._container(), prefix, build_id, self.compression,
+                               self.row_group_rows, self.max_rows_per_file)
+        stats    = _BuildStats()
+        stores   = set()
+        try:
+            if sources[0]['file_extension'] in TABULAR_EXTENSIONS:
+                self._consolidate_tables(sources, writer, stats)
+            elif sources[0]['file_extension'] in ARRAY_EXTENSIONS:
+                stores = self._convert_arrays(sources, prefix, writer, stats)
+            else:
+                self._write_catalog(sources, writer, stats)
+            parts = writer.close()
+        except Exception:
+            writer.abort()
+            raise
+
+        manifest_path = f"{prefix}/_manifest.json"
+        manifest = {
+            'modality': modality, 'aggregation_name': name, 'build_id': build_id,
+            'parts': parts, 'schema': writer.schema.to_string() if writer.schema else None,
+            'total_records': stats.rows, 'source_file_count': len(sources),
+        }
+        self._container().get_blob_client(manifest_path).upload_blob(
+            json.dumps(manifest, indent=2), overwrite=True)
+
+        result = {
+            'aggregation_name': name,
+            'data_path': prefix,
+            'metadata_path': manifest_path,
+            'source_file_count': len(sources),
+            'total_records': stats.rows,
+            'data_size_bytes': sum(p['size'] for p in parts) + stats.array_bytes,
+            'duplicate_count': stats.duplicate_rows(),
+            'null_count': stats.null_cells,
+            'quality_score': stats.quality_score(len(sources)),
+            'processing_duration_seconds': round(time.perf_counter() - start, 3),
+            'source_fingerprint': fingerprint,
+            'build_id': build_id,
+        }
+        self._record(modality, result, stats.file_status, sources, prefix)
+
+        # Previous builds' parts (and stores of files no longer in the folder)
+        # are only dropped once the new build is recorded
+        keep = {p['path'] for p in parts} | {manifest_path}
+        keep_prefixes = tuple(store + '/' for store in stores)
+        for blob in self._container().list_blobs(name_starts_with=prefix + '/'):
+            if blob.name not in keep and not blob.name.startswith(keep_prefixes):
+                self._container().delete_blob(blob.name)
+        return result
+
+    def _consolidate_tables(self, sources, writer, stats):
+        seen_hashes = {}
+        with tempfile.TemporaryDirectory(prefix='silver_') as tmp:
+            for frame, src in enumerate(sources):
+                if src['file_hash'] in seen_hashes:
+                    # Same bytes already consolidated under another frame
+                    stats.file_status[src['id']] = 'duplicate'
+                    stats.duplicate_file_rows += seen_hashes[src['file_hash']]
+                    continue
+                local_path  = os.path.join(tmp, f"{frame:06d}.csv")
+                rows_before = stats.rows
+                try:
+                    with open(local_path, 'wb') as f:
+                        get_blob_client(src['file_path']).download_blob().readinto(f)
+                    dialect = sniff_dialect(local_path)
+                    for batch in iter_arrow_batches(local_path, dialect):
+                        table = pa.Table.from_batches([batch])
+                        table = table.append_column('source_file_id', pa.array(
+                            np.full(len(table), src['id'], dtype=np.int64)))
+                        table = table.append_column('frame', pa.array(
+                            np.full(len(table), frame, dtype=np.int32)))
+                        writer.write(table)
+                        stats.observe(batch, source_file_id=src['id'])
+                    seen_hashes[src['file_hash']] = stats.rows - rows_before
+                    stats.file_status[src['id']] = 'success'
+                except (pa.ArrowInvalid, pa.ArrowTypeError, UnicodeDecodeError) as e:
+                    # Unparseable, or a column whose type cannot be promoted to the folder's. A file
+                    # that breaks part-way keeps the blocks already written.
+                    stats.file_status[src['id']] = 'partial' if stats.rows > rows_before else 'failed'
+                    print(f"⚠️  Silver skipped {src['file_path']}: {e}")
+                finally:
+                    if os.path.exists(local_path):
+                        os.remove(local_path)
+
+    def _convert_arrays(self, sources, prefix, writer, stats):
+        """
+        Rewrites each workspace into <prefix>/arrays/<file_hash>.zarr and
+        catalogs its variables. A complete store from an earlier build is
+        reused as is. Returns the store paths in use.
+        """
+        container   = self._container()
+        seen_hashes = set()
+        stores      = set()
+        rows        = []
+        for frame, src in enumerate(sources):
+            store_path = f"{prefix}/arrays/{src['file_hash']}.zarr"
+            if src['file_hash'] in seen_hashes:
+                stats.file_status[src['id']] = 'duplicate'
+                stats.duplicate_file_rows += 1
+                continue
+            seen_hashes.add(src['file_hash'])
+            try:
+                if load_metadata(container, store_path) is None:
+                    self._write_array_store(src, store_path)
+                reader = ArrayStoreReader(container, store_path)
+            except Exception as e:
+                # The incomplete store has no .zmetadata; the cleanup below deletes it
+                stats.file_status[src['id']] = 'failed'
+                print(f"⚠️  Silver skipped {src['file_path']}: {e}")
+                continue
+            stores.add(store_path)
+            stats.file_status[src['id']] = 'success'
+            for name, info in reader.variables().items():
+                stats.array_bytes += info['attrs'].get('stored_bytes', 0)
+                rows.append(_array_catalog_row(src, frame, name, info, store_path))
+            for name, info in reader.skipped().items():
+                rows.append(_array_catalog_row(src, frame, name, info, None))
+
+        table = pa.Table.from_pylist(rows, schema=ARRAY_CATALOG_SCHEMA)
+        stats.observe(table)
+        writer.write(table)
+        return stores
+
+    def _write_array_store(self, src, store_path):
+        """Downloads one workspace and rechunks every numeric variable into its store."""
+        start = time.perf_counter()
+        fd, local_path = tempfile.mkstemp(suffix='.' + src['file_extension'], prefix='silver_array_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                get_blob_client(src['file_path']).download_blob(max_concurrency=4).readinto(f)
+            store   = ArrayStoreWriter(self._container(), store_path)
+            skipped = {}
+            with open(local_path, 'rb') as f:
+                for name, shape, dtype, read_block, attrs in mat_arrays(f, ARRAY_MEMORY_BUDGET, MAT5_LOAD_BUDGET):
+                    if read_block is None:
+                        skipped[name] = {'shape': shape, 'dtype': str(dtype), 'reason': attrs['skipped']}
+                        continue
+                    store.write_array(name, shape, dtype, read_block, ARRAY_MEMORY_BUDGET, attrs=attrs)
+            store.close({'source_file': src['filename'], 'file_hash': src['file_hash'], 'skipped': skipped})
+        finally:
+            os.remove(local_path)
+        stored = sum(a['stored_bytes'] for a in store.arrays.values())
+        print(f"🧊 Rechunked {src['filename']}: {len(store.arrays)} variables, "
+              f"{src['file_size'] / (1024 * 1024):.1f} MB -> {stored / (1024 * 1024):.1f} MB "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def array_store(self, blob_path):
+        """
+        Reader for the Silver array store of a bronze file, or None if the file
+        has not been converted. The store is found through the file's lineage.
+        """
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT TOP 1 b.file_hash, l.destination_path
+                FROM bronze_files b
+                JOIN data_lineage l
+                  ON l.bronze_file_id = b.id
+                 AND l.transformation_type = 'aggregation'
+                 AND l.status IN ('success', 'duplicate')
+                WHERE b.file_path_hash = CAST(HASHBYTES('SHA2_256', CAST(%s AS NVARCHAR(MAX))) AS BINARY(32))
+                  AND b.file_path = %s
+                  AND b.is_deleted = 0
+                  AND b.file_extension IN ({', '.join(['%s'] * len(ARRAY_EXTENSIONS))})
+                ORDER BY l.id DESC
+            """, (blob_path, blob_path) + ARRAY_EXTENSIONS)
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        reader = ArrayStoreReader(self._container(), f"{row['destination_path']}/arrays/{row['file_hash']}.zarr")
+        return reader if reader.exists else None
+
+    def _write_catalog(self, sources, writer, stats):
+        seen_hashes = set()
+        rows = []
+        for frame, src in enumerate(sources):
+            duplicate = src['file_hash'] in seen_hashes
+            seen_hashes.add(src['file_hash'])
+            stats.file_status[src['id']] = 'duplicate' if duplicate else 'success'
+            if duplicate:
+                stats.duplicate_file_rows += 1
+            rows.append({
+                'source_file_id':  src['id'],
+                'frame':           frame,
+                'filename':        src['filename'],
+                'file_extension':  src['file_extension'],
+                'file_size':       src['file_size'],
+                'file_hash':       src['file_hash'],
+                'upload_time_utc': src['upload_time_utc'],
+                'metadata_json':   src['metadata_json'],
+            })
+        table = pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+        stats.observe(table)
+        writer.write(table)
+
+    def _record(self, modality, result, file_status, sources, prefix):
+        """silver_aggregated upsert and the per-file lineage, in one transaction."""
+        now    = datetime.now(timezone.utc)
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            values = (
+                result['data_path'], result['metadata_path'], result['source_file_count'],
+                result['total_records'], result['data_size_bytes'], result['duplicate_count'],
+                result['null_count'], result['quality_score'], now,
+                result['processing_duration_seconds'], result['source_fingerprint'],
+                result['build_id'], now,
+            )
+            cursor.execute("""
+                UPDATE silver_aggregated
+                SET data_path = %s, metadata_path = %s, source_file_count = %s,
+                    total_records = %s, data_size_bytes = %s, duplicate_count = %s,
+                    null_count = %s, quality_score = %s, processed_at_utc = %s,
+                    processing_duration_seconds = %s, source_fingerprint = %s,
+                    build_id = %s, last_updated_utc = %s
+                OUTPUT INSERTED.id
+                WHERE modality = %s AND aggregation_name = %s
+            """, values + (modality, result['aggregation_name']))
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute("""
+                    INSERT INTO silver_aggregated (
+                        data_path, metadata_path, source_file_count,
+                        total_records, data_size_bytes, duplicate_count,
+                        null_count, quality_score, processed_at_utc,
+                        processing_duration_seconds, source_fingerprint,
+                        build_id, last_updated_utc, modality, aggregation_name,
+                        timestamps_normalized, timezone_standard, created_at_utc
+                    )
+                    OUTPUT INSERTED.id
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 0, 'UTC', %s)
+                """, values + (modality, result['aggregation_name'], now))
+                row = cursor.fetchone()
+            silver_id = row['id']
+
+            cursor.execute("""
+                DELETE FROM data_lineage
+                WHERE silver_aggregation_id = %s AND transformation_type = 'aggregation'
+            """, (silver_id,))
+            lineage = [
+                (src['id'], src['dataset_name'] or 'root', src['file_path'], src['researcher_name'],
+                 src['researcher_email'], src['upload_time_utc'], file_status.get(src['id'], 'failed'),
+                 silver_id, prefix)
+                for src in sources
+            ]
+            _insert_aggregation_lineage(cursor, lineage)
+            conn.commit()
+            result['id'] = silver_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ── Hub ──
+    def hub(self, modality, limit=500):
+        """The modality's aggregations and their newest source files, from the Silver tables only."""
+        conn   = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT id, aggregation_name, data_path, source_file_count, total_records,
+                       data_size_bytes, duplicate_count, null_count, quality_score,
+                       processed_at_utc, processing_duration_seconds
+                FROM silver_aggregated
+                WHERE modality = %s
+                ORDER BY aggregation_name
+            """, (modality,))
+            aggregations = cursor.fetchall()
+            cursor.execute("""
+                SELECT TOP (%s)
+                    b.filename,
+                    b.file_extension,
+                    b.file_size,
+                    b.file_path,
+                    b.dataset_name,
+                    b.upload_time_utc,
+                    b.researcher_name,
+                    s.aggregation_name
+                FROM silver_aggregated s
+                JOIN data_lineage l
+                  ON l.silver_aggregation_id = s.id
+                 AND l.transformation_type = 'aggregation'
+                 AND l.status = 'success'
+                JOIN bronze_files b
+                  ON b.id = l.bronze_file_id
+                 AND b.is_deleted = 0
+                WHERE s.modality = %s
+                ORDER BY b.upload_time_utc DESC, b.id DESC
+            """, (limit, modality))
+            files = cursor.fetchall()
+        finally:
+            conn.close()
+        for row in aggregations:
+            row['processed_at_utc'] = str(row['processed_at_utc']) if row['processed_at_utc'] else None
+        for row in files:
+            row['upload_time_utc'] = row['upload_time_utc'].isoformat() if row['upload_time_utc'] else None
+        return aggregations, files
+
+def _insert_aggregation_lineage(cursor, rows, rows_per_statement=200):
+    # 9 parameters per row keeps each statement under SQL Server's 2,100-parameter limit
+    for start in range(0, len(rows), rows_per_statement):
+        chunk = rows[start:start + rows_per_statement]
+        values = ",\n".join(["(%s, %s, %s, %s, %s, %s, 'aggregation', %s, %s, %s)"] * len(chunk))
+        cursor.execute(f"""
+            INSERT INTO data_lineage (
+                bronze_file_id, source_dataset, source_file_path, source_researcher,
+                source_researcher_email, upload_time_utc, transformation_type, status,
+                silver_aggregation_id, destination_path
+            ) VALUES {values}
+        """, tuple(v for row in chunk for v in row))
+
+def _fingerprint(sources):
+    """Changes whenever a file is added, removed or replaced in the aggregation."""
+    sha256_hash = hashlib.sha256()
+    for src in sources:
+        sha256_hash.update(f"{src['id']}:{src['file_hash']}\n".encode())
+    return sha256_hash.hexdigest()
+
+def _array_catalog_row(src, frame, name, info, store_path):
+    return {
+        'source_file_id':  src['id'],
+        'frame':           frame,
+        'filename':        src['filename'],
+        'file_hash':       src['file_hash'],
+        'variable':        name,
+        'shape':           json.dumps(info['shape']),
+        'dtype':           info['dtype'],
+        'chunks':          json.dumps(info['chunks']) if info.get('chunks') else None,
+        'store_path':      store_path,
+        'stored_bytes':    info.get('attrs', {}).get('stored_bytes'),
+        'skipped':         info.get('reason'),
+        'upload_time_utc': src['upload_time_utc'],
+    }
+
+def _partition_prefix(modality, aggregation_name):
+    """pratyusha/radar0 -> radar/researcher=pratyusha/dataset=radar0 (files at a researcher's root: dataset=_root)"""
+    researcher, _, dataset = aggregation_name.partition('/')
+    return f"{modality}/researcher={researcher}/dataset={dataset.replace('/', '_') or '_root'}"
+
+class _BuildStats:
+    """Record, null and duplicate-row counts gathered while the partition is written."""
+
+    def __init__(self):
+        self.rows                = 0
+        self.cells               = 0
+        self.null_cells          = 0
+        self.duplicate_file_rows = 0
+        self.array_bytes         = 0
+        self.file_status         = {}
+        self._row_hashes         = []   # 8 bytes per row
+
+    def observe(self, batch, source_file_id=None):
+        """Counts a written batch. Rows only count as duplicates of rows from the same source file."""
+        self.rows  += batch.num_rows
+        self.cells += batch.num_rows * batch.num_columns
+        self.null_cells += sum(col.null_count for col in batch.columns)
+        df = batch.to_pandas()
+        if source_file_id is not None:
+            df['__source_file_id'] = source_file_id
+        self._row_hashes.append(pd.util.hash_pandas_object(df, index=False).to_numpy())
+
+    def duplicate_rows(self):
+        """Repeated rows within the partition, plus the rows of skipped duplicate files."""
+        if not self._row_hashes:
+            return self.duplicate_file_rows
+        hashes = np.concatenate(self._row_hashes)
+        return int(len(hashes) - len(np.unique(hashes))) + self.duplicate_file_rows
+
+    def quality_score(self, file_count):
+        """Share of files read x share of non-null cells x share of distinct rows (0.0 - 1.0)."""
+        if not file_count:
+            return 0.0
+        readable = sum(1 for s in self.file_status.values() if s in ('success', 'duplicate')) / file_count
+        non_null = 1 - self.null_cells / self.cells if self.cells else 1.0
+        total    = self.rows + self.duplicate_file_rows
+        distinct = 1 - self.duplicate_rows() / total if total else 1.0
+        return round(readable * non_null * distinct, 4)
+
+def _conform(table, schema):
+    """table with exactly schema's columns, in order: missing ones are null, the rest cast up."""
+    columns = [table.column(field.name).cast(field.type) if field.name in table.column_names
+               else pa.nulls(len(table), field.type) for field in schema]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+class _PartWriter:
+    """
+    Streams tables into Parquet part files: row groups of `row_group_rows`,
+    a new part every `max_rows_per_file`. Each finished part is uploaded as
+    staged blocks and its local spool deleted, so disk use stays at one part.
+
+    Files of a folder need not share a schema: a later table may widen it
+    (int -> double, an all-null column getting a type, new columns). The
+    rows written so far keep their part's schema and a new part starts, so
+    every part casts safely to the final `schema` recorded in the manifest.
+    """
+
+    def __init__(self, container, prefix, build_id, compression, row_group_rows, max_rows_per_file):
+        self.container         = container
+        self.prefix            = prefix
+        self.build_id          = build_id
+        self.compression       = compression
+        self.row_group_rows    = row_group_rows
+        self.max_rows_per_file = max_rows_per_file
+        self.schema            = None
+        self.parts             = []
+        self._writer           = None
+        self._local            = None
+        self._part_rows        = 0
+        self._buffer           = []
+        self._buffered_rows    = 0
+
+    def write(self, table):
+        if self.schema is None:
+            self.schema = table.schema
+        elif not table.schema.equals(self.schema):
+            # ArrowTypeError if a column's types cannot be promoted (e.g. int64 vs string)
+            merged = pa.unify_schemas([self.schema, table.schema], promote_options='permissive')
+            if not merged.equals(self.schema):
+                self._flush()
+                if self._writer is not None:
+                    self._finish_part()
+                self.schema = merged
+            table = _conform(table, self.schema)
+        self._buffer.append(table)
+        self._buffered_rows += len(table)
+        if self._buffered_rows >= self.row_group_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffered_rows:
+            return
+        table = pa.concat_tables(self._buffer)
+        self._buffer, self._buffered_rows = [], 0
+        if self._writer is None:
+            fd, self._local = tempfile.mkstemp(suffix='.parquet', prefix='silver_part_')
+            os.close(fd)
+            self._writer = pq.ParquetWriter(self._local, self.schema, compression=self.compression)
+        self._writer.write_table(table, row_group_size=self.row_group_rows)
+        self._part_rows += len(table)
+        if self._part_rows >= self.max_rows_per_file:
+            self._finish_part()
+
+    def _finish_part(self):
+        self._writer.close()
+        path = f"{self.prefix}/part-{self.build_id}-{len(self.parts):05d}.parquet"
+        with open(self._local, 'rb') as f:
+            _, size = upload_blocks(self.container.get_blob_client(path), f)
+        os.remove(self._local)
+        self.parts.append({'path': path, 'rows': self._part_rows, 'size': size})
+        self._writer, self._local, self._part_rows = None, None, 0
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._finish_part()
+        return self.parts
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._local and os.path.exists(self._local):
+            os.remove(self._local)
+        for part in self.parts:
+            self.container.delete_blob(part['path'])
@@ -0,0 +1,219 @@
+import io
+import os
+import uuid
+import base64
+import hashlib
+import threading
+from itertools import chain
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from azure.storage.blob import BlobServiceClient, BlobBlock
+from dotenv import load_dotenv
+from backend.utils.metrics import timings
+
+load_dotenv()
+
+_service_client = None
+_service_lock   = threading.Lock()
+
+def get_service_client():
+    """
+    One BlobServiceClient per process. It is thread-safe and keeps its HTTP
+    connection pool, so requests reuse warm TLS connections instead of each
+    building a client (and a handshake) of their own.
+    """
+    global _service_client
+    with _service_lock:
+        if _service_client is None:
+            with timings.timer('blob.client_setup'):
+                _service_client = BlobServiceClient.from_connection_string(
+                    os.getenv('AZURE_STORAGE_CONNECTION_STRING'))
+        return _service_client
+
+def get_container_client():
+    """Client for the bronze container."""
+    return get_service_client().get_container_client(os.getenv('BRONZE_CONTAINER_NAME', 'bronze-layer'))
+
+def get_blob_client(blob_path):
+    """Blob client for a path in the bronze container."""
+    return get_container_client().get_blob_client(blob_path)
+
+def get_silver_container_client():
+    """Client for the silver container (consolidated Parquet datasets)."""
+    return get_service_client().get_container_client(os.getenv('SILVER_CONTAINER_NAME', 'silver-layer'))
+
+def read_range(blob_client, offset, length):
+    """
+    One ranged GET. Returns (bytes, total_blob_size).
+    The total size comes from the Content-Range header, so no extra
+    get_blob_properties() round trip is needed.
+    """
+    downloader = blob_client.download_blob(offset=offset, length=length)
+    data = downloader.readall()
+    content_range = downloader.properties.content_range
+    if content_range and '/' in content_range:
+        total = int(content_range.rsplit('/', 1)[-1])
+    else:
+        total = offset + len(data)
+    return data, total
+
+def read_prefix_until(blob_client, is_complete, initial_bytes=8 * 1024, max_bytes=4 * 1024 * 1024):
+    """
+    Reads the start of a blob in growing ranged GETs until is_complete(prefix)
+    is true, the blob ends, or max_bytes is reached. Each round only fetches
+    the bytes not already held. Returns (prefix, total_blob_size).
+    """
+    prefix, total = read_range(blob_client, 0, initial_bytes)
+    want = initial_bytes
+    while not is_complete(prefix) and len(prefix) < total and len(prefix) < max_bytes:
+        want = min(want * 4, max_bytes)
+        chunk, total = read_range(blob_client, len(prefix), want - len(prefix))
+        if not chunk:
+            break
+        prefix += chunk
+    return prefix, total
+
+def upload_blocks(blob_client, file_obj, block_size=4 * 1024 * 1024, concurrency=8, on_chunk=None):
+    """
+    Block-parallel upload: blocks are read and hashed in order on the calling
+    thread, staged concurrently by up to `concurrency` workers, and committed
+    as one block list at the end, so nothing is visible until the whole file
+    has landed. At most 2 x concurrency blocks are held in memory.
+
+    on_chunk(chunk) is called for every block in file order (e.g. the
+    upload-time analyzers). Returns (sha256_hex, size).
+    """
+    sha256_hash = hashlib.sha256()
+    first  = file_obj.read(block_size)
+    second = file_obj.read(block_size)
+    if not second:
+        # Fits in one block: a single Put Blob is cheaper than stage + commit
+        sha256_hash.update(first)
+        if on_chunk:
+            on_chunk(first)
+        blob_client.upload_blob(first, overwrite=True)
+        return sha256_hash.hexdigest(), len(first)
+
+    prefix    = uuid.uuid4().hex[:16]
+    block_ids = []
+    size      = 0
+    in_flight = set()
+    chunks    = chain([first, second], iter(lambda: file_obj.read(block_size), b''))
+
+    def stage(block_id, data):
+        blob_client.stage_block(block_id, data, length=len(data))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, chunk in enumerate(chunks):
+            sha256_hash.update(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+            size += len(chunk)
+
+            if len(in_flight) >= 2 * concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()   # surface a failed stage_block immediately
+            block_id = base64.b64encode(f"{prefix}{index:08d}".encode()).decode()
+            block_ids.append(block_id)
+            in_flight.add(pool.submit(stage, block_id, chunk))
+
+        for future in in_flight:
+            future.result()
+
+    blob_client.commit_block_list([BlobBlock(block_id=b) for b in block_ids])
+    return sha256_hash.hexdigest(), size
+
+class BlobFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over a blob for libraries that expect a
+    real file (h5py, scipy.io). Bytes are fetched on demand in fixed-size
+    blocks and kept in a small LRU cache; a read spanning several missing
+    blocks is served by one ranged GET per contiguous run.
+    """
+
+    def __init__(self, blob_client, block_size=256 * 1024, cache_blocks=64):
+        super().__init__()
+        self.blob_client   = blob_client
+        self.block_size    = block_size
+        self.cache_blocks  = cache_blocks
+        self.bytes_fetched = 0
+        self.requests      = 0
+        self._blocks       = OrderedDict()
+        self._pos          = 0
+        # The first block is always needed (file signatures) and tells us the size
+        first, self.size = read_range(blob_client, 0, block_size)
+        self._count(first)
+        self._remember(0, first)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return self._pos
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        n = max(0, min(len(view), self.size - self._pos))
+        if n == 0:
+            return 0
+        first = self._pos // self.block_size
+        last  = (self._pos + n - 1) // self.block_size
+        self._fetch_missing(first, last)
+
+        written = 0
+        for i in range(first, last + 1):
+            block = self._blocks[i]
+            self._blocks.move_to_end(i)
+            start = (self._pos + written) - i * self.block_size
+            take  = min(len(block) - start, n - written)
+            view[written:written + take] = block[start:start + take]
+            written += take
+        self._pos += written
+        # Evict only after copying, so one large read never loses its own blocks
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return written
+
+    def _fetch_missing(self, first, last):
+        i = first
+        while i <= last:
+            if i in self._blocks:
+                i += 1
+                continue
+            run_end = i
+            while run_end + 1 <= last and run_end + 1 not in self._blocks:
+                run_end += 1
+            offset = i * self.block_size
+            length = min((run_end + 1) * self.block_size, self.size) - offset
+            data, _ = read_range(self.blob_client, offset, length)
+            self._count(data)
+            for j in range(i, run_end + 1):
+                lo = (j - i) * self.block_size
+                self._remember(j, data[lo:lo + self.block_size])
+            i = run_end + 1
+
+    def _remember(self, index, block):
+        self._blocks[index] = block
+        self._blocks.move_to_end(index)
+
+    def _count(self, data):
+        self.bytes_fetched += len(data)
+        self.requests += 1
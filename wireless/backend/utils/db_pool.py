@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+import pymssql
+from dotenv import load_dotenv
+from backend.utils.metrics import timings
+
+load_dotenv()
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pymssql connections.
+
+    - at most max_size connections exist; callers wait up to `timeout` seconds
+    - a connection idle for more than check_after seconds is pinged (SELECT 1)
+      before it is handed out; a dead one is replaced
+    - a connection older than recycle_after seconds is closed and replaced
+      (Azure SQL drops long-lived idle sessions)
+    """
+
+    def __init__(self, connect, max_size=10, timeout=30, check_after=30, recycle_after=1800):
+        self._connect      = connect
+        self.max_size      = max_size
+        self.timeout       = timeout
+        self.check_after   = check_after
+        self.recycle_after = recycle_after
+        self._idle         = []      # (conn, created_at, returned_at), most recent last
+        self._open         = 0
+        self._cond         = threading.Condition()
+        self.stats         = {'created': 0, 'reused': 0, 'recycled': 0, 'failed_checks': 0, 'waits': 0}
+
+    def get(self):
+        """A PooledConnection; calling .close() on it returns it to the pool."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No SQL connection free after {self.timeout}s (pool size {self.max_size})")
+                self.stats['waits'] += 1
+                self._cond.wait(remaining)
+
+        if conn is not None:
+            conn = self._checked(conn, created_at, returned_at)
+            if conn is not None:
+                self._bump('reused')
+                return PooledConnection(self, *conn)
+        try:
+            return PooledConnection(self, self._new(), time.monotonic())
+        except Exception:
+            self._forget()
+            raise
+
+    def _checked(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if now - created_at > self.recycle_after:
+            self._bump('recycled')
+            self._close_quietly(conn)
+            return None
+        if now - returned_at > self.check_after:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            except Exception:
+                self._bump('failed_checks')
+                self._close_quietly(conn)
+                return None
+        return conn, created_at
+
+    def _new(self):
+        with timings.timer('sql.connect'):
+            conn = self._connect()
+        self._bump('created')
+        return conn
+
+    def release(self, conn, created_at, broken=False):
+        if not broken:
+            try:
+                conn.rollback()   # never hand an open transaction to the next caller
+            except Exception:
+                broken = True
+        if broken:
+            self._close_quietly(conn)
+            self._forget()
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def _bump(self, key):
+        with self._cond:
+            self.stats[key] += 1
+
+    def _forget(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def snapshot(self):
+        """Pool counters plus the connect time the reused connections did not pay."""
+        connect = timings.snapshot().get('sql.connect')
+        mean_connect_s = connect['mean_ms'] / 1000 if connect else 0.0
+        with self._cond:
+            return {
+                **self.stats,
+                'open': self._open,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'mean_connect_ms': round(mean_connect_s * 1000, 2),
+                'estimated_seconds_saved': round(self.stats['reused'] * mean_connect_s, 3),
+            }
+
+class PooledConnection:
+    """Drop-in for a pymssql connection: close() hands it back instead of disconnecting."""
+
+    def __init__(self, pool, conn, created_at):
+        self._pool       = pool
+        self._conn       = conn
+        self._created_at = created_at
+        self._broken     = False
+
+    def cursor(self, *args, **kwargs):
+        return self._conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except Exception:
+            self._broken = True
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn, self._created_at, self._broken)
+            self._conn = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __del__(self):
+        # A caller that forgot close() must not leak a pool slot
+        self.close()
+
+def _connect_azure_sql():
+    return pymssql.connect(
+        server   = os.getenv("AZURE_SQL_SERVER"),
+        user     = os.getenv("AZURE_SQL_USER"),
+        password = os.getenv("AZURE_SQL_PASSWORD"),
+        database = os.getenv("AZURE_SQL_DATABASE"),
+        as_dict  = True
+    )
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """The process-wide Azure SQL pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                _connect_azure_sql,
+                max_size      = int(os.getenv('SQL_POOL_SIZE', '10')),
+                timeout       = float(os.getenv('SQL_POOL_TIMEOUT', '30')),
+                check_after   = float(os.getenv('SQL_POOL_CHECK_AFTER', '30')),
+                recycle_after = float(os.getenv('SQL_POOL_RECYCLE', '1800')),
+            )
+        return _pool
+
+def get_connection():
+    return get_pool().get()
@@ -0,0 +1,74 @@
+"""
+LZF decompression for PCD `DATA binary_compressed` payloads.
+
+Uses the python-lzf C extension when it is installed (pip install python-lzf);
+otherwise falls back to a pure-Python decoder that is correct but roughly two
+orders of magnitude slower.
+"""
+
+try:
+    import lzf as _lzf
+except ImportError:
+    _lzf = None
+
+def native_available():
+    return _lzf is not None
+
+def decompress(data, out_size):
+    """Decompresses one LZF block whose uncompressed size is known up front."""
+    if out_size == 0:
+        return b''
+    if _lzf is not None:
+        out = _lzf.decompress(bytes(data), out_size)
+        if out is None or len(out) != out_size:
+            raise ValueError(f"corrupt LZF data: does not decompress to {out_size} bytes")
+        return out
+    return decompress_python(data, out_size)
+
+def decompress_python(data, out_size):
+    """
+    Reference LZF decoder. Each control byte is either a literal run
+    (ctrl < 32: copy ctrl + 1 bytes) or a back-reference (length in the top
+    3 bits, extended by one byte when 7; 13-bit distance) into the output.
+    Truncated or corrupt input raises ValueError('corrupt LZF data').
+    """
+    data = memoryview(data).cast('B')
+    out  = bytearray(out_size)
+    ip = op = 0
+    end = len(data)
+    while ip < end:
+        ctrl = data[ip]
+        ip += 1
+        if ctrl < 32:
+            run = ctrl + 1
+            if ip + run > end or op + run > out_size:
+                raise ValueError("corrupt LZF data")
+            out[op:op + run] = data[ip:ip + run]
+            ip += run
+            op += run
+            continue
+
+        length = ctrl >> 5
+        # The length extension (when 7) and the distance low byte must both be present
+        if ip + (length == 7) >= end:
+            raise ValueError("corrupt LZF data")
+        if length == 7:
+            length += data[ip]
+            ip += 1
+        length += 2
+        ref = op - ((ctrl & 0x1f) << 8) - data[ip] - 1
+        ip += 1
+        if ref < 0 or op + length > out_size:
+            raise ValueError("corrupt LZF data")
+        distance = op - ref
+        if distance >= length:
+            out[op:op + length] = out[ref:ref + length]
+        else:
+            # Overlapping copy repeats the last `distance` bytes
+            pattern = bytes(out[ref:op])
+            out[op:op + length] = (pattern * (length // distance + 1))[:length]
+        op += length
+
+    if op != out_size:
+        raise ValueError(f"corrupt LZF data: decompressed to {op} bytes, expected {out_size}")
+    return out
@@ -0,0 +1,51 @@
+import time
+import threading
+from collections import defaultdict, deque
+
+class Timings:
+    """Thread-safe per-name timing stats (count, total, mean, p95 over the last `window` samples)."""
+
+    def __init__(self, window=500):
+        self.window  = window
+        self._lock   = threading.Lock()
+        self._count  = defaultdict(int)
+        self._total  = defaultdict(float)
+        self._recent = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._count[name] += 1
+            self._total[name] += seconds
+            self._recent[name].append(seconds)
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for name, count in self._count.items():
+                recent = sorted(self._recent[name])
+                out[name] = {
+                    'count':   count,
+                    'total_s': round(self._total[name], 4),
+                    'mean_ms': round(self._total[name] / count * 1000, 2),
+                    'p95_ms':  round(recent[int(0.95 * (len(recent) - 1))] * 1000, 2),
+                }
+            return out
+
+class _Timer:
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name    = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.record(self.name, time.perf_counter() - self.start)
+        return False
+
+# Process-wide registry: routes, SQL connection setup, blob client setup
+timings = Timings()
@@ -1,4 +1,6 @@
-from backend.app import app
+from backend.app import app, ANALYZERS
+from backend.services.metadata_cache import MetadataCache
+from backend.services.gold_service import GoldService
 from backend.models.db import db
 from sqlalchemy import text
 
@@ -42,6 +44,206 @@ def init_medallion_tables():
         );
         """
 
+        # 3. Create ANALYSIS_CACHE Table
+        # /api/analyze results keyed by content hash + processor version
+        create_analysis_cache = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='analysis_cache' AND xtype='U')
+        CREATE TABLE analysis_cache (
+            file_hash NVARCHAR(64) NOT NULL,
+            processor_version NVARCHAR(32) NOT NULL,
+            file_extension NVARCHAR(20),
+            metadata_json NVARCHAR(MAX) NOT NULL,
+            created_at_utc DATETIME2 NOT NULL,
+            last_hit_utc DATETIME2 NULL,
+            hit_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (file_hash, processor_version)
+        );
+        """
+
+        # Upload-time analyzer output (see backend/processors/stream_analyzers.py)
+        add_bronze_metadata = """
+        IF COL_LENGTH('bronze_files', 'metadata_json') IS NULL
+            ALTER TABLE bronze_files ADD metadata_json NVARCHAR(MAX) NULL;
+        """
+
+        # The analyze lookup resolves blob path -> hash; file_path is NVARCHAR(MAX), so index a hash of it
+        create_bronze_path_index = """
+        IF COL_LENGTH('bronze_files', 'file_path_hash') IS NULL
+            ALTER TABLE bronze_files ADD file_path_hash AS CAST(HASHBYTES('SHA2_256', file_path) AS BINARY(32));
+        """
+        create_bronze_path_index_2 = """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_bronze_files_path_hash')
+            CREATE INDEX IX_bronze_files_path_hash ON bronze_files (file_path_hash) INCLUDE (file_hash, is_deleted);
+        """
+
+        # File listings page by keyset on (upload_time_utc, id); see BronzeService.get_user_files.
+        # Each index covers its query, so a page is one seek plus `limit` rows read.
+        # modality / file_extension filters are residual predicates on these same ranges.
+        listing_columns = ("filename, file_size, file_extension, modality, file_path, "
+                           "researcher_name, researcher_email")
+        create_listing_indexes = [
+            f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_bronze_files_user_time')
+                CREATE INDEX IX_bronze_files_user_time
+                ON bronze_files (user_id, is_deleted, upload_time_utc DESC, id DESC)
+                INCLUDE (dataset_name, {listing_columns});
+            """,
+            f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_bronze_files_user_dataset_time')
+                CREATE INDEX IX_bronze_files_user_dataset_time
+                ON bronze_files (user_id, is_deleted, dataset_name, upload_time_utc DESC, id DESC)
+                INCLUDE ({listing_columns});
+            """,
+            f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_bronze_files_time')
+                CREATE INDEX IX_bronze_files_time
+                ON bronze_files (is_deleted, upload_time_utc DESC, id DESC)
+                INCLUDE (user_id, dataset_name, {listing_columns});
+            """,
+            # Admin listing: latest lineage step per bronze file on the page
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_data_lineage_bronze_file')
+                CREATE INDEX IX_data_lineage_bronze_file
+                ON data_lineage (bronze_file_id, id DESC)
+                INCLUDE (transformation_type, status);
+            """,
+        ]
+
+        # 4. Create SILVER_AGGREGATED Table
+        # One row per Silver partition (backend/services/silver_service.py)
+        create_silver = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='silver_aggregated' AND xtype='U')
+        CREATE TABLE silver_aggregated (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            modality NVARCHAR(50) NOT NULL,
+            aggregation_name NVARCHAR(255) NOT NULL,
+            data_path NVARCHAR(1024) NOT NULL,
+            metadata_path NVARCHAR(1024) NULL,
+            lineage_path NVARCHAR(1024) NULL,
+            source_file_count INT,
+            total_records BIGINT,
+            data_size_bytes BIGINT,
+            duplicate_count BIGINT DEFAULT 0,
+            null_count BIGINT DEFAULT 0,
+            quality_score FLOAT,
+            processed_at_utc DATETIME2,
+            processing_duration_seconds FLOAT,
+            timestamps_normalized BIT DEFAULT 0,
+            timezone_standard NVARCHAR(10) DEFAULT 'UTC',
+            source_fingerprint NVARCHAR(64),
+            build_id NVARCHAR(40),
+            created_at_utc DATETIME2,
+            last_updated_utc DATETIME2,
+            CONSTRAINT UQ_silver_modality_name UNIQUE (modality, aggregation_name)
+        );
+        """
+
+        # Lineage rows from bronze files into their Silver aggregation
+        add_lineage_silver = """
+        IF COL_LENGTH('data_lineage', 'silver_aggregation_id') IS NULL
+            ALTER TABLE data_lineage ADD silver_aggregation_id INT NULL, destination_path NVARCHAR(1024) NULL;
+        """
+        create_lineage_silver_index = """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_data_lineage_silver')
+            CREATE INDEX IX_data_lineage_silver
+            ON data_lineage (silver_aggregation_id, transformation_type, status)
+            INCLUDE (bronze_file_id);
+        """
+
+        # 5. Create GOLD Tables
+        # Maintained in the bronze insert / soft-delete transaction (backend/services/gold_service.py)
+        create_gold = [
+            """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='gold_daily_uploads' AND xtype='U')
+            CREATE TABLE gold_daily_uploads (
+                user_id INT NOT NULL,
+                [date] DATE NOT NULL,
+                modality NVARCHAR(50) NOT NULL,
+                file_count INT NOT NULL DEFAULT 0,
+                total_size_bytes BIGINT NOT NULL DEFAULT 0,
+                unique_datasets INT NOT NULL DEFAULT 0,
+                updated_at_utc DATETIME2,
+                PRIMARY KEY (user_id, [date], modality)
+            );
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='gold_daily_datasets' AND xtype='U')
+            CREATE TABLE gold_daily_datasets (
+                user_id INT NOT NULL,
+                [date] DATE NOT NULL,
+                modality NVARCHAR(50) NOT NULL,
+                dataset_name NVARCHAR(255) NOT NULL,
+                file_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, [date], modality, dataset_name)
+            );
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='gold_researcher_stats' AND xtype='U')
+            CREATE TABLE gold_researcher_stats (
+                user_id INT PRIMARY KEY,
+                total_uploads INT NOT NULL DEFAULT 0,
+                total_storage_bytes BIGINT NOT NULL DEFAULT 0,
+                total_datasets INT NOT NULL DEFAULT 0,
+                lidar_count INT NOT NULL DEFAULT 0,
+                radar_count INT NOT NULL DEFAULT 0,
+                wifi_count INT NOT NULL DEFAULT 0,
+                channels_count INT NOT NULL DEFAULT 0,
+                first_upload_date DATE NULL,
+                last_upload_date DATE NULL,
+                active_days INT NOT NULL DEFAULT 0,
+                avg_quality_score FLOAT NULL,
+                last_calculated_utc DATETIME2
+            );
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='gold_quality_metrics' AND xtype='U')
+            CREATE TABLE gold_quality_metrics (
+                [date] DATE NOT NULL,
+                modality NVARCHAR(50) NOT NULL,
+                total_files INT NOT NULL DEFAULT 0,
+                valid_files INT NOT NULL DEFAULT 0,
+                invalid_files INT NOT NULL DEFAULT 0,
+                duplicate_files INT NOT NULL DEFAULT 0,
+                avg_quality_score FLOAT NULL,
+                min_quality_score FLOAT NULL,
+                max_quality_score FLOAT NULL,
+                null_value_count BIGINT NOT NULL DEFAULT 0,
+                format_error_count INT NOT NULL DEFAULT 0,
+                calculated_at_utc DATETIME2,
+                PRIMARY KEY ([date], modality)
+            );
+            """,
+        ]
+
+        # 6. Create JOBS Table
+        # Background uploads / analyses (backend/services/job_service.py)
+        create_jobs = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='jobs' AND xtype='U')
+        CREATE TABLE jobs (
+            id NVARCHAR(36) PRIMARY KEY,
+            job_type NVARCHAR(50) NOT NULL,
+            user_id INT NOT NULL,
+            status NVARCHAR(20) NOT NULL,
+            progress FLOAT NOT NULL DEFAULT 0,
+            message NVARCHAR(400) NULL,
+            params_json NVARCHAR(MAX) NULL,
+            result_json NVARCHAR(MAX) NULL,
+            error NVARCHAR(4000) NULL,
+            created_at_utc DATETIME2 NOT NULL,
+            started_at_utc DATETIME2 NULL,
+            finished_at_utc DATETIME2 NULL,
+            owner NVARCHAR(100) NULL,
+            heartbeat_at_utc DATETIME2 NULL,
+            INDEX IX_jobs_user_created (user_id, created_at_utc DESC)
+        );
+        """
+
+        # Owning process and its heartbeat, so a restart only fails jobs whose process stopped
+        add_job_owner = """
+        IF COL_LENGTH('jobs', 'owner') IS NULL
+            ALTER TABLE jobs ADD owner NVARCHAR(100) NULL, heartbeat_at_utc DATETIME2 NULL;
+        """
+
         try:
             print("⏳ Creating 'bronze_files' table...", end=" ")
             db.session.execute(text(create_bronze))
@@ -51,8 +253,45 @@ def init_medallion_tables():
             db.session.execute(text(create_lineage))
             print("✅ Done.")
 
+            print("⏳ Creating 'analysis_cache' table...", end=" ")
+            db.session.execute(text(create_analysis_cache))
+            db.session.execute(text(create_bronze_path_index))
+            db.session.execute(text(create_bronze_path_index_2))
+            db.session.execute(text(add_bronze_metadata))
+            print("✅ Done.")
+
+            print("⏳ Creating file listing indexes...", end=" ")
+            for ddl in create_listing_indexes:
+                db.session.execute(text(ddl))
+            print("✅ Done.")
+
+            print("⏳ Creating 'silver_aggregated' table...", end=" ")
+            db.session.execute(text(create_silver))
+            db.session.execute(text(add_lineage_silver))
+            db.session.execute(text(create_lineage_silver_index))
+            print("✅ Done.")
+
+            print("⏳ Creating gold tables...", end=" ")
+            for ddl in create_gold:
+                db.session.execute(text(ddl))
+            print("✅ Done.")
+
+            print("⏳ Creating 'jobs' table...", end=" ")
+            db.session.execute(text(create_jobs))
+            db.session.execute(text(add_job_owner))
+            print("✅ Done.")
+
             db.session.commit()
             print("\n🎉 ALL CLOUD TABLES CREATED SUCCESSFULLY!")
+
+            # Backfill (or re-check) the Gold aggregates from existing bronze rows
+            GoldService().reconcile()
+
+            # Entries from older processor versions can never be hit again
+            MetadataCache().purge_stale({
+                ext: [cls.PROCESSOR_VERSION] + ([cls.STATS_VERSION] if hasattr(cls, 'STATS_VERSION') else [])
+                for ext, cls in ANALYZERS.items()
+            })
             
         except Exception as e:
             print(f"\n❌ Error creating tables: {e}")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Align Silver aggregations of different modalities in time, outside the web app.
+
+Writes aligned/<modality>/researcher=<r>/dataset=<d>/streams=<set>/ in the silver container:
+one row per reference frame / snapshot, with the nearest frame of every other
+aggregation within the tolerance. The aggregations must be built first
+(scripts/build_silver.py).
+
+  python scripts/align_silver.py lidar:pratyusha/lidar0 wifi:pratyusha/csi radar:pratyusha/radar0
+  python scripts/align_silver.py wifi:pratyusha/csi lidar:pratyusha/lidar0 --tolerance-ms 20 --direction backward
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backend.processors.time_align import DIRECTIONS
+from backend.services.align_service import AlignService, DEFAULT_TOLERANCE_MS
+from backend.services.silver_service import MODALITY_EXTENSIONS
+
+def aggregation(text):
+    modality, _, name = text.partition(':')
+    if modality not in MODALITY_EXTENSIONS or not name:
+        raise argparse.ArgumentTypeError(f"expected <{'|'.join(sorted(MODALITY_EXTENSIONS))}>:<researcher>/<dataset>")
+    return modality, name
+
+def main():
+    parser = argparse.ArgumentParser(description="As-of join Silver aggregations to a reference one by timestamp.")
+    parser.add_argument('reference', type=aggregation, help="modality:aggregation giving one row per frame")
+    parser.add_argument('others', type=aggregation, nargs='+', help="modality:aggregation to match to it")
+    parser.add_argument('--tolerance-ms', type=float, default=DEFAULT_TOLERANCE_MS,
+                        help=f"largest time offset of a match (default {DEFAULT_TOLERANCE_MS:g})")
+    parser.add_argument('--direction', choices=DIRECTIONS, default='nearest')
+    args = parser.parse_args()
+
+    manifest = AlignService().align(args.reference, args.others, tolerance_ms=args.tolerance_ms,
+                                    direction=args.direction)
+    print(f"\n✅ {manifest['total_records']:,} {manifest['reference']['label']} records")
+    for label, stats in manifest['matched'].items():
+        print(f"   • {label}: {stats['rows']:,} matched ({stats['share']:.1%}), "
+              f"mean |Δt| {stats['mean_abs_delta_ms']} ms, max {stats['max_abs_delta_ms']:.3f} ms")
+
+if __name__ == '__main__':
+    main()
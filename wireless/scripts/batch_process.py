@@ -1,31 +1,60 @@
 #!/usr/bin/env python3
+"""
+Batch metadata extraction for .mat channel/timestamp files.
+
+Local files are opened in place; Azure blobs are read with ranged requests
+(only the MAT/HDF5 headers are fetched, never the whole workspace). --stats
+adds per-variable statistics, which stream every data chunk.
+
+  python scripts/batch_process.py                      # ./channels_release/*.mat
+  python scripts/batch_process.py --azure pratyusha/   # blobs under a prefix
+  python scripts/batch_process.py --stats              # + min/max/mean/std per variable
+"""
 import os
 import sys
+import argparse
 from pathlib import Path
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
-from mat_processor import WirelessDataProcessor
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backend.processors.mat_processor import WirelessDataProcessor
+
+def list_mat_files(data_dir, azure_prefix):
+    if azure_prefix is not None:
+        from backend.utils.blob_io import get_container_client
+        container = get_container_client()
+        return [b.name for b in container.list_blobs(name_starts_with=azure_prefix)
+                if b.name.lower().endswith('.mat')]
+    return [str(p) for p in Path(data_dir).glob('*.mat')]
 
-def process_directory():
-    data_dir = 'channels_release'
-    mat_files = list(Path(data_dir).glob('*.mat'))
+def process_directory(data_dir='channels_release', azure_prefix=None, stats=False):
+    mat_files = list_mat_files(data_dir, azure_prefix)
+    source = f"azure:{azure_prefix}" if azure_prefix is not None else f"{data_dir}/"
     
     print(f"\n{'='*70}")
-    print(f"🔄 Processing {len(mat_files)} files from {data_dir}/")
+    print(f"🔄 Processing {len(mat_files)} files from {source}")
     print(f"{'='*70}\n")
     
-    channels = [f for f in mat_files if 'channels' in f.name]
-    timestamps = [f for f in mat_files if 'timestamps' in f.name]
+    channels = [f for f in mat_files if 'channels' in os.path.basename(f)]
+    timestamps = [f for f in mat_files if 'timestamps' in os.path.basename(f)]
     
     print(f"📊 Channels files: {len(channels)}")
     print(f"📊 Timestamps files: {len(timestamps)}\n")
     
     for i, filepath in enumerate(mat_files, 1):
-        print(f"\n[{i}/{len(mat_files)}] {filepath.name}")
+        print(f"\n[{i}/{len(mat_files)}] {os.path.basename(filepath)}")
         try:
-            processor = WirelessDataProcessor(str(filepath))
-            data = processor.read_file()
-            print(f"   ✅ Processed ({len(data)} variables)")
+            if azure_prefix is not None:
+                processor = WirelessDataProcessor(filepath)
+            else:
+                processor = WirelessDataProcessor.from_local(filepath)
+            meta = processor.get_metadata(stats=stats)
+            if not meta.get('success'):
+                raise RuntimeError(meta.get('error'))
+            print(f"   ✅ Processed ({len(meta['variables'])} variables, {meta['file_size_mb']} MB)")
+            for name, var in meta['variables'].items():
+                print(f"      • {name}: {var['shape']} {var['dtype']}")
+                if 'stats' in var:
+                    print(f"        {var['stats']}")
         except Exception as e:
             print(f"   ❌ Error: {e}")
     
@@ -34,4 +63,9 @@ def process_directory():
     print(f"{'='*70}\n")
 
 if __name__ == "__main__":
-    process_directory()
+    parser = argparse.ArgumentParser(description="Extract metadata from .mat files")
+    parser.add_argument('--data-dir', default='channels_release', help="local folder of .mat files")
+    parser.add_argument('--azure', metavar='PREFIX', help="read blobs under this prefix instead")
+    parser.add_argument('--stats', action='store_true', help="also compute per-variable statistics (reads every chunk)")
+    args = parser.parse_args()
+    process_directory(args.data_dir, args.azure, args.stats)
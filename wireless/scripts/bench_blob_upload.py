@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential streaming upload vs block-parallel staged uploads.
+
+Runs against a local Azurite blob emulator by default, so it can be repeated
+without touching the real bronze container:
+
+  npx azurite-blob --location /tmp/azurite &
+  python scripts/bench_blob_upload.py                       # 256 MB, concurrency 1/4/16
+  python scripts/bench_blob_upload.py --size-mb 1024 --concurrency 1 4 8 16 32
+  python scripts/bench_blob_upload.py --connection-string "$AZURE_STORAGE_CONNECTION_STRING"
+
+Every uploaded blob is downloaded once and re-hashed to check it matches.
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from azure.storage.blob import BlobServiceClient
+from backend.utils.blob_io import upload_blocks
+
+# Well-known Azurite development account (not a secret)
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+def make_file(size_mb):
+    path = os.path.join(tempfile.gettempdir(), f"bench_upload_{size_mb}mb.bin")
+    if not os.path.exists(path) or os.path.getsize(path) != size_mb * 1024 * 1024:
+        print(f"🛠️  Writing {size_mb} MB of random bytes -> {path}")
+        with open(path, 'wb') as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+    return path
+
+def sequential_upload(blob_client, f, block_size):
+    """The previous path: one generator streamed over one connection."""
+    sha256_hash = hashlib.sha256()
+    size = 0
+
+    def stream_generator():
+        nonlocal size
+        while True:
+            chunk = f.read(block_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            sha256_hash.update(chunk)
+            yield chunk
+
+    blob_client.upload_blob(stream_generator(), overwrite=True)
+    return sha256_hash.hexdigest(), size
+
+def verify(blob_client, expected_hash):
+    sha256_hash = hashlib.sha256()
+    for chunk in blob_client.download_blob().chunks():
+        sha256_hash.update(chunk)
+    return sha256_hash.hexdigest() == expected_hash
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark staged-block blob uploads.")
+    parser.add_argument('--connection-string', default=AZURITE_CONNECTION_STRING)
+    parser.add_argument('--container', default='bench-uploads')
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--block-mb', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--repeats', type=int, default=2)
+    args = parser.parse_args()
+
+    path = make_file(args.size_mb)
+    block_size = args.block_mb * 1024 * 1024
+    container = BlobServiceClient.from_connection_string(args.connection_string) \
+                                 .get_container_client(args.container)
+    if not container.exists():
+        container.create_container()
+
+    cases = [('sequential upload_blob(generator)', None)]
+    cases += [(f'staged blocks, concurrency {c}', c) for c in args.concurrency]
+
+    print(f"\n📦 {args.size_mb} MB file, {args.block_mb} MB blocks, best of {args.repeats}\n")
+    print(f"{'approach':<36} {'seconds':>9} {'MB/s':>8} {'speedup':>8}  verified")
+    print('-' * 72)
+    baseline = None
+    for label, concurrency in cases:
+        blob_client = container.get_blob_client(f"bench/{concurrency or 'seq'}.bin")
+        best = None
+        for _ in range(args.repeats):
+            with open(path, 'rb') as f:
+                start = time.perf_counter()
+                if concurrency is None:
+                    digest, size = sequential_upload(blob_client, f, block_size)
+                else:
+                    digest, size = upload_blocks(blob_client, f, block_size=block_size,
+                                                 concurrency=concurrency)
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        baseline = baseline or best
+        ok = verify(blob_client, digest)
+        print(f"{label:<36} {best:>9.2f} {args.size_mb / best:>8.1f} {baseline / best:>7.1f}x  "
+              f"{'✅' if ok else '❌'}")
+        blob_client.delete_blob()
+
+if __name__ == '__main__':
+    main()
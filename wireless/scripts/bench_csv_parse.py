@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CSV dialect detection + parsing on large wireless CSVs.
+
+Compares the old approach (full python-engine parses, one per candidate
+separator, until one yields more than one column) with sniffing the dialect
+from a 64KB sample and parsing once with the C engine or pyarrow.
+
+  python scripts/bench_csv_parse.py                          # generated 2M-row file, ';' separated
+  python scripts/bench_csv_parse.py --rows 5000000 --sep '\\t'
+  python scripts/bench_csv_parse.py --file data/radar_log.csv
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backend.processors.csv_processor import CSVProcessor, sniff_dialect, iter_arrow_chunks
+
+def generate_wireless_csv(path, rows, sep):
+    """Radar/channel-log shaped CSV: timestamps, floats, ints, a flag and a few categoricals."""
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp('2025-01-01')
+    df = pd.DataFrame({
+        'timestamp':   (start + pd.to_timedelta(np.arange(rows) * 10, unit='ms')).strftime('%Y-%m-%d %H:%M:%S.%f'),
+        'frame_id':    np.arange(rows),
+        'antenna':     rng.integers(0, 4, rows),
+        'subcarrier':  rng.integers(0, 64, rows),
+        'rssi_dbm':    rng.normal(-60, 8, rows).round(2),
+        'snr_db':      rng.normal(20, 5, rows).round(2),
+        'doppler_hz':  rng.normal(0, 30, rows).round(3),
+        'range_m':     rng.uniform(0, 50, rows).round(3),
+        'los':         rng.choice(['true', 'false'], rows),
+        'scenario':    rng.choice(['indoor', 'outdoor', 'vehicular', 'urban'], rows),
+        'device':      rng.choice([f'node_{i:02d}' for i in range(24)], rows),
+    })
+    df.to_csv(path, sep=sep, index=False)
+
+def legacy_trial_parse(path):
+    """The previous read_file(): full python-engine parse per candidate separator."""
+    for sep in [',', ';', '\t', '|']:
+        try:
+            df = pd.read_csv(path, sep=sep, engine='python')
+            if len(df.columns) > 1:
+                return df, sep
+        except Exception:
+            continue
+    return None, None
+
+def sniffed_c_parse(path):
+    dialect = sniff_dialect(path)
+    return pd.read_csv(path, engine='c', **dialect.read_csv_kwargs()), dialect.sep
+
+def sniffed_arrow_parse(path):
+    dialect = sniff_dialect(path)
+    return pd.concat(list(iter_arrow_chunks(path, dialect)), ignore_index=True), dialect.sep
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV dialect sniffing and parse engines.")
+    parser.add_argument('--file', help="existing CSV to benchmark (skips generation)")
+    parser.add_argument('--rows', type=int, default=2_000_000, help="rows to generate")
+    parser.add_argument('--sep', default=';', help="separator for the generated file")
+    parser.add_argument('--skip-legacy', action='store_true', help="skip the slow trial-parse baseline")
+    args = parser.parse_args()
+
+    path = args.file
+    if not path:
+        sep = args.sep.encode().decode('unicode_escape')
+        path = os.path.join(tempfile.gettempdir(), f"bench_wireless_{args.rows}.csv")
+        if not os.path.exists(path):
+            print(f"🛠️  Generating {args.rows:,} rows -> {path}")
+            generate_wireless_csv(path, args.rows, sep)
+
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"\n📄 {path} ({size_mb:,.1f} MB)")
+
+    dialect, t = timed(sniff_dialect, path)
+    print(f"🔎 Sniffed in {t * 1000:.1f} ms: {vars(dialect)}\n")
+
+    cases = [] if args.skip_legacy else [("legacy: trial parses, python engine", legacy_trial_parse)]
+    cases += [
+        ("sniff + C engine", sniffed_c_parse),
+        ("sniff + pyarrow", sniffed_arrow_parse),
+    ]
+
+    results = []
+    for label, fn in cases:
+        try:
+            (df, sep), t = timed(fn, path)
+            results.append((label, t, len(df), len(df.columns), sep))
+        except Exception as e:
+            print(f"⚠️  {label} failed: {e}")
+
+    baseline = results[0][1] if results else None
+    print(f"{'approach':<38} {'seconds':>9} {'MB/s':>8} {'speedup':>8}  rows x cols")
+    print('-' * 80)
+    for label, t, rows, cols, sep in results:
+        print(f"{label:<38} {t:>9.2f} {size_mb / t:>8.1f} {baseline / t:>7.1f}x  {rows:,} x {cols} (sep {sep!r})")
+
+    _, t = timed(CSVProcessor.from_local(path).extract_metadata)
+    print(f"\n📊 Full extract_metadata (sniff + streaming profile): {t:.2f}s")
+
+if __name__ == '__main__':
+    main()
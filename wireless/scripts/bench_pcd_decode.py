@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reading points from DATA binary_compressed (LZF) PCD files.
+
+Writes the same synthetic LiDAR sweep as `binary` and `binary_compressed`,
+then times each stage of the compressed path (LZF decode, column-major ->
+structured transpose, PointStats) against the memory-mapped binary path,
+and checks both produce identical statistics.
+
+  python scripts/bench_pcd_decode.py                        # 5M points
+  python scripts/bench_pcd_decode.py --points 20000000
+  python scripts/bench_pcd_decode.py --file data/sweep.pcd  # existing binary_compressed file
+  python scripts/bench_pcd_decode.py --python               # also time the pure-Python LZF decoder
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backend.utils import lzf_codec
+from backend.processors.pcd_processor import parse_pcd_header
+from backend.processors.pcd_points import (COMPRESSED_PREFIX, pcd_dtype, point_count, read_compressed,
+                                           iter_columnar_chunks, iter_pcd_chunks, summarize_chunks)
+
+def generate_sweep(points):
+    """Spinning-LiDAR shaped cloud: 32 rings, mm-quantized ranges, 8-bit intensity."""
+    rng = np.random.default_rng(0)
+    azimuth = np.linspace(0, 2 * np.pi * (points // 50_000 + 1), points, dtype=np.float32)
+    ring    = np.tile(np.arange(32, dtype=np.uint16), points // 32 + 1)[:points]
+    rng_m   = np.round(rng.gamma(2.0, 8.0, points), 3).astype(np.float32)
+    elev    = np.deg2rad(-15 + ring.astype(np.float32))
+    cloud = np.empty(points, dtype=[('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                                    ('intensity', '<f4'), ('ring', '<u2')])
+    cloud['x'] = np.round(rng_m * np.cos(elev) * np.cos(azimuth), 3)
+    cloud['y'] = np.round(rng_m * np.cos(elev) * np.sin(azimuth), 3)
+    cloud['z'] = np.round(rng_m * np.sin(elev), 3)
+    cloud['intensity'] = rng.integers(0, 256, points).astype(np.float32)
+    cloud['ring'] = ring
+    return cloud
+
+def pcd_header(cloud, data):
+    names = cloud.dtype.names
+    sizes = [str(cloud.dtype[n].itemsize) for n in names]
+    types = ['F' if cloud.dtype[n].kind == 'f' else 'U' for n in names]
+    return (f"# .PCD v0.7 - Point Cloud Data file format\nVERSION 0.7\n"
+            f"FIELDS {' '.join(names)}\nSIZE {' '.join(sizes)}\nTYPE {' '.join(types)}\n"
+            f"COUNT {' '.join('1' for _ in names)}\nWIDTH {len(cloud)}\nHEIGHT 1\n"
+            f"VIEWPOINT 0 0 0 1 0 0 0\nPOINTS {len(cloud)}\nDATA {data}\n").encode()
+
+def write_pcds(cloud, directory):
+    import lzf
+    binary_path     = os.path.join(directory, f"bench_{len(cloud)}_binary.pcd")
+    compressed_path = os.path.join(directory, f"bench_{len(cloud)}_compressed.pcd")
+    with open(binary_path, 'wb') as f:
+        f.write(pcd_header(cloud, 'binary'))
+        f.write(cloud.tobytes())
+
+    columns = b''.join(np.ascontiguousarray(cloud[name]).tobytes() for name in cloud.dtype.names)
+    packed  = lzf.compress(columns, len(columns) + len(columns) // 16 + 64)
+    with open(compressed_path, 'wb') as f:
+        f.write(pcd_header(cloud, 'binary_compressed'))
+        f.write(COMPRESSED_PREFIX.pack(len(packed), len(columns)))
+        f.write(packed)
+    return binary_path, compressed_path
+
+def load_header(path):
+    with open(path, 'rb') as f:
+        return parse_pcd_header(f.read(64 * 1024))
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark binary_compressed PCD decoding.")
+    parser.add_argument('--file', help="existing binary_compressed PCD (skips generation)")
+    parser.add_argument('--points', type=int, default=5_000_000, help="points to generate")
+    parser.add_argument('--python', action='store_true', help="also time the pure-Python LZF decoder")
+    args = parser.parse_args()
+
+    binary_path = None
+    if args.file:
+        compressed_path = args.file
+    else:
+        if not lzf_codec.native_available():
+            sys.exit("❌ Generating a compressed file needs python-lzf: pip install python-lzf")
+        print(f"🛠️  Generating {args.points:,} points")
+        binary_path, compressed_path = write_pcds(generate_sweep(args.points), tempfile.gettempdir())
+
+    header_data, data_offset = load_header(compressed_path)
+    dtype, count = pcd_dtype(header_data), point_count(header_data)
+    raw_mb   = count * dtype.itemsize / 1e6
+    file_mb  = os.path.getsize(compressed_path) / 1e6
+    print(f"\n📄 {compressed_path}: {count:,} points, {file_mb:,.1f} MB compressed / {raw_mb:,.1f} MB raw "
+          f"({raw_mb / file_mb:.2f}x), LZF {'C extension' if lzf_codec.native_available() else 'pure Python'}\n")
+
+    buffer, t_decode = timed(read_compressed, compressed_path, header_data, data_offset)
+    chunks, t_transpose = timed(lambda: list(iter_columnar_chunks(buffer, dtype, count)))
+    stats, t_stats = timed(summarize_chunks, dtype, chunks)
+    del chunks
+    total = t_decode + t_transpose + t_stats
+
+    rows = [("read + LZF decode", t_decode), ("transpose to records", t_transpose),
+            ("PointStats", t_stats), ("binary_compressed total", total)]
+    if binary_path:
+        b_header, b_offset = load_header(binary_path)
+        b_stats, t_binary = timed(summarize_chunks, dtype, iter_pcd_chunks(binary_path, b_header, b_offset))
+        rows.append(("binary (memmap) total", t_binary))
+
+    print(f"{'stage':<28} {'seconds':>9} {'raw MB/s':>10} {'Mpts/s':>8}")
+    print('-' * 58)
+    for label, t in rows:
+        print(f"{label:<28} {t:>9.3f} {raw_mb / t:>10.1f} {count / t / 1e6:>8.1f}")
+
+    if args.python:
+        sample = min(count, 1_000_000)
+        if sample < count:
+            print(f"\n🐢 Pure-Python decoder timed on a {sample:,}-point file")
+            cloud = generate_sweep(sample)
+            _, compressed_path = write_pcds(cloud, tempfile.gettempdir())
+            header_data, data_offset = load_header(compressed_path)
+        with open(compressed_path, 'rb') as f:
+            f.seek(data_offset)
+            payload = f.read()
+        size, raw = COMPRESSED_PREFIX.unpack_from(payload)
+        block = payload[COMPRESSED_PREFIX.size:COMPRESSED_PREFIX.size + size]
+        _, t_c  = timed(lzf_codec.decompress, block, raw) if lzf_codec.native_available() else (None, None)
+        _, t_py = timed(lzf_codec.decompress_python, block, raw)
+        print(f"   pure Python: {t_py:.2f}s ({raw / 1e6 / t_py:.1f} MB/s)"
+              + (f", C: {t_c:.3f}s ({raw / 1e6 / t_c:.0f} MB/s)" if t_c else ""))
+
+    if binary_path:
+        stats.pop('seconds'), b_stats.pop('seconds')
+        print(f"\n{'✅' if stats == b_stats else '❌'} Statistics match the uncompressed file")
+
+if __name__ == '__main__':
+    main()
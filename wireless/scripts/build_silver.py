@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Build (or refresh) the Silver layer outside the web app.
+
+Only partitions whose bronze files changed since the last build are rewritten.
+
+  python scripts/build_silver.py                     # every modality
+  python scripts/build_silver.py --modality radar
+  python scripts/build_silver.py --modality lidar --force
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backend.services.silver_service import SilverService, MODALITY_EXTENSIONS
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate bronze files into Silver Parquet datasets.")
+    parser.add_argument('--modality', choices=sorted(MODALITY_EXTENSIONS), action='append',
+                        help="modality to build (repeatable; default: all)")
+    parser.add_argument('--force', action='store_true', help="rebuild unchanged partitions too")
+    args = parser.parse_args()
+
+    service = SilverService()
+    for modality in args.modality or sorted(MODALITY_EXTENSIONS):
+        print(f"\n🚀 Building Silver: {modality}")
+        summary = service.build(modality, force=args.force)
+        print(f"   ✅ built {len(summary['built'])}, unchanged {len(summary['unchanged'])}, "
+              f"failed {len(summary['failed'])}")
+        for failure in summary['failed']:
+            print(f"   ❌ {failure['aggregation_name']}: {failure['error']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Recompute the Gold tables from bronze_files and report any drift from the
+incrementally maintained values. Safe to run from cron at any time.
+
+  python scripts/reconcile_gold.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from backend.services.gold_service import GoldService
+
+if __name__ == '__main__':
+    drift = GoldService().reconcile()
+    for table, actions in sorted(drift.items()):
+        print(f"   ⚠️  {table}: " + ', '.join(f"{n} {action}" for action, n in sorted(actions.items())))
+    if not drift:
+        print("   ✅ Gold tables match bronze")